@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def sync_attribute_indexes(sender, using, **kwargs):
+    from .attributes import sync_attribute_indexes
+    sync_attribute_indexes(using)
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        import core.receivers
+        post_migrate.connect(sync_attribute_indexes, sender=self)
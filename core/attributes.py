@@ -0,0 +1,145 @@
+"""
+Filtering on custom attributes.
+
+Photos and albums carry free-form `custom_attributes` JSON. On Postgres a
+GIN index on the column serves containment lookups for any key. Keys listed in
+the INDEXED_CUSTOM_ATTRIBUTES setting also get an expression index on their
+value, on every database; those indexes are kept in line with the setting
+after each migrate, and lookups on those keys compare the indexed expression
+itself so the planner can use it.
+"""
+import hashlib
+import json
+import re
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, NotSupportedError, connections
+from django.db.models import F, Func, Index, JSONField, Q, TextField, Value
+
+
+ATTRIBUTES_FIELD = "custom_attributes"
+# Keys written into the index and query SQL as literals
+INDEXED_KEY_PATTERN = re.compile(r"^[\w-]+$")
+
+
+def indexed_attributes() -> list:
+    keys = list(getattr(settings, "INDEXED_CUSTOM_ATTRIBUTES", []))
+    for key in keys:
+        if not INDEXED_KEY_PATTERN.match(key):
+            raise ImproperlyConfigured(f"Invalid indexed custom attribute key: {key!r}")
+    return keys
+
+
+def _digest(key: str) -> str:
+    return hashlib.md5(key.encode()).hexdigest()[:10]
+
+
+class AttributeValue(Func):
+    """
+    The JSON value of one attribute: JSON text on SQLite, jsonb on Postgres.
+    Plain keys are written into the SQL rather than passed as parameters, so
+    the expression matches the expression indexes.
+    """
+
+    output_field = JSONField()
+
+    def __init__(self, key: str, field: str = ATTRIBUTES_FIELD):
+        self.key = key
+        super().__init__(F(field))
+
+    def _key_sql(self, path: str):
+        if INDEXED_KEY_PATTERN.match(self.key):
+            return f"'{path}'", []
+        return "%s", [path]
+
+    def as_sql(self, compiler, connection, **extra_context):
+        raise NotSupportedError("Custom attribute lookups need SQLite or Postgres.")
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        sql, params = compiler.compile(self.source_expressions[0])
+        key_sql, key_params = self._key_sql(f'$."{self.key}"')
+        return f"({sql} -> {key_sql})", [*params, *key_params]
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        sql, params = compiler.compile(self.source_expressions[0])
+        key_sql, key_params = self._key_sql(self.key)
+        return f"({sql} -> {key_sql})", [*params, *key_params]
+
+
+def parse_attribute_value(raw: str):
+    """
+    Read a filter value as JSON, so `true`, `42` and `null` match those JSON
+    values. Anything that isn't valid JSON is matched as a string; quote
+    values like `"42"` to match them as strings.
+    """
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return raw
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _json_texts(value) -> list:
+    """
+    The compact JSON texts SQLite may hold for `value`. Numbers are written
+    as Python writes ints and floats, so 1 also matches a stored 1.0.
+    """
+    if _is_number(value) and float(value).is_integer():
+        return list(dict.fromkeys(json.dumps(number) for number in (int(value), float(value))))
+    return [json.dumps(value, separators=(",", ":"))]
+
+
+def filter_attribute(queryset, key: str, values: list, field: str = ATTRIBUTES_FIELD):
+    """Restrict `queryset` to rows whose attribute `key` equals any of `values`."""
+    vendor = connections[queryset.db].vendor
+    alias = f"attribute_{_digest(key)}"
+    condition = Q()
+    for value in values:
+        if vendor == "sqlite":
+            # Compared as JSON text, against the text SQLite extracts
+            for text in _json_texts(value):
+                condition |= Q(**{alias: Value(text, output_field=TextField())})
+        elif key in indexed_attributes():
+            condition |= Q(**{alias: value})
+        else:
+            # Served by the GIN index; containment is only equality for scalars
+            contains = Q(**{f"{field}__contains": {key: value}})
+            if isinstance(value, (dict, list)):
+                contains &= Q(**{alias: value})
+            condition |= contains
+    return queryset.alias(**{alias: AttributeValue(key, field)}).filter(condition)
+
+
+def attribute_index_prefix(model) -> str:
+    return f"{model._meta.db_table}_attr_"
+
+
+def attribute_index(model, key: str) -> Index:
+    return Index(AttributeValue(key), name=f"{attribute_index_prefix(model)}{_digest(key)}")
+
+
+def sync_attribute_indexes(using: str = DEFAULT_DB_ALIAS):
+    """
+    Create the expression indexes for INDEXED_CUSTOM_ATTRIBUTES on photos and
+    albums, and drop those of keys no longer listed.
+    """
+    from .models import Album, Photo
+
+    db = connections[using]
+    keys = indexed_attributes()
+    with db.schema_editor() as schema_editor:
+        for model in (Photo, Album):
+            with db.cursor() as cursor:
+                existing = {
+                    name for name in db.introspection.get_constraints(cursor, model._meta.db_table)
+                    if name.startswith(attribute_index_prefix(model))
+                }
+            wanted = {index.name: index for index in (attribute_index(model, key) for key in keys)}
+            for name, index in wanted.items():
+                if name not in existing:
+                    schema_editor.add_index(model, index)
+            for name in existing - set(wanted):
+                schema_editor.remove_index(model, Index(fields=[ATTRIBUTES_FIELD], name=name))
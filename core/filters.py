@@ -2,6 +2,7 @@ import django_filters
 from django import forms
 from django_filters.widgets import RangeWidget
 from .models import Photo, PhotoMetadata, Album, Tag
+from .search import search_photos
 from .widgets import *
 from .fields import *
 
@@ -17,15 +18,22 @@ class ShutterSpeedRangeFilter(django_filters.RangeFilter):
 class PhotoFilter(django_filters.FilterSet):
     """
     Comprehensive filter for Photo model including metadata fields.
-    Supports filtering by title, slug, description, publish date, metadata fields,
-    albums, and tags.
+    Supports full-text search, filtering by title, slug, description, publish
+    date, metadata fields, albums, and tags. Title, description, camera and
+    lens filters match word prefixes through the search index rather than
+    arbitrary substrings.
     """
+
+    # Full-text search over title, description, tags, albums, camera and lens
+    search = django_filters.CharFilter(
+        label='Search',
+        method='filter_search',
+    )
     
-    # Basic Photo fields - case-insensitive search
+    # Basic Photo fields - matched as word prefixes through the search index
     title = django_filters.CharFilter(
-        field_name='title',
-        lookup_expr='icontains',
-        label='Title'
+        label='Title',
+        method='filter_search_field',
     )
     
     slug = django_filters.CharFilter(
@@ -35,9 +43,8 @@ class PhotoFilter(django_filters.FilterSet):
     )
     
     description = django_filters.CharFilter(
-        field_name='description',
-        lookup_expr='icontains',
-        label='Description'
+        label='Description',
+        method='filter_search_field',
     )
     
     # Publish date filters
@@ -76,43 +83,35 @@ class PhotoFilter(django_filters.FilterSet):
         widget=CrispyRangeWidget(attrs={'type': 'number', 'step': '1'})
     )
     
-    # PhotoMetadata fields - CharFields with case-insensitive search
+    # PhotoMetadata fields - camera and lens are matched through the search
+    # index, the rest are short EXIF values matched exactly
     camera_make = django_filters.CharFilter(
-        field_name='metadata__camera_make',
-        lookup_expr='icontains',
-        label='Camera make'
+        label='Camera make',
+        method='filter_search_field',
     )
     
     camera_model = django_filters.CharFilter(
-        field_name='metadata__camera_model',
-        lookup_expr='icontains',
-        label='Camera model'
+        label='Camera model',
+        method='filter_search_field',
     )
     
     lens_model = django_filters.CharFilter(
-        field_name='metadata__lens_model',
-        lookup_expr='icontains',
-        label='Lens model'
+        label='Lens model',
+        method='filter_search_field',
     )
     
     exposure_program = django_filters.CharFilter(
         field_name='metadata__exposure_program',
-        lookup_expr='icontains',
+        lookup_expr='iexact',
         label='Exposure program (PASM)'
     )
     
     flash = django_filters.CharFilter(
         field_name='metadata__flash',
-        lookup_expr='icontains',
+        lookup_expr='iexact',
         label='Flash'
     )
     
-    copyright = django_filters.CharFilter(
-        field_name='metadata__copyright',
-        lookup_expr='icontains',
-        label='Copyright'
-    )
-    
     # PhotoMetadata fields - Numeric (focal_length)
     focal_length = django_filters.RangeFilter(
         field_name='metadata__focal_length',
@@ -166,6 +165,23 @@ class PhotoFilter(django_filters.FilterSet):
         method='filter_has_location_data',
     )
 
+    # Search document field each free-text filter is matched against. Camera
+    # and lens share the keywords field with tag names and album titles.
+    SEARCH_FIELDS = {
+        'title': 'title',
+        'description': 'body',
+        'camera_make': 'keywords',
+        'camera_model': 'keywords',
+        'lens_model': 'keywords',
+    }
+
+    def filter_search(self, queryset, name, value):
+        return search_photos(queryset, value).order_by('-search_rank')
+
+    def filter_search_field(self, queryset, name, value):
+        matches = search_photos(Photo.objects.all(), value, field=self.SEARCH_FIELDS[name])
+        return queryset.filter(pk__in=matches.values('pk'))
+
     def filter_has_location_data(self, queryset, name, value):
         if value is True:
             return queryset.filter(latitude__isnull=False, longitude__isnull=False)
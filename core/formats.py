@@ -0,0 +1,103 @@
+"""
+Output formats for renditions.
+
+Every rendition is written as JPEG, which any client can display. Sizes can
+also ask for WebP and AVIF, which come out a good deal smaller at the same
+quality; clients that accept them are sent those instead.
+
+Sizes also set how their files are encoded: a quality or a byte budget to
+fit, progressive JPEG, and how much of the EXIF block to keep.
+"""
+from io import BytesIO
+from django.db import models
+from PIL import ExifTags, Image
+
+
+class ImageFormat(models.TextChoices):
+    JPEG = "jpeg", "JPEG"
+    WEBP = "webp", "WebP"
+    AVIF = "avif", "AVIF"
+
+
+# Formats a size can produce in addition to JPEG
+EXTRA_FORMATS = (ImageFormat.WEBP, ImageFormat.AVIF)
+# Best first, for picking what to send a client that accepts several
+FORMAT_PREFERENCE = (ImageFormat.AVIF, ImageFormat.WEBP, ImageFormat.JPEG)
+
+CONTENT_TYPES = {
+    ImageFormat.JPEG: "image/jpeg",
+    ImageFormat.WEBP: "image/webp",
+    ImageFormat.AVIF: "image/avif",
+}
+EXTENSIONS = {
+    ImageFormat.JPEG: "jpg",
+    ImageFormat.WEBP: "webp",
+    ImageFormat.AVIF: "avif",
+}
+PILLOW_FORMATS = {
+    ImageFormat.JPEG: "JPEG",
+    ImageFormat.WEBP: "WEBP",
+    ImageFormat.AVIF: "AVIF",
+}
+
+# Quality range searched to fit a byte budget
+MIN_QUALITY = 10
+MAX_BUDGET_QUALITY = 90
+# EXIF tags kept when metadata is reduced: how to display the image, and its rights
+REDUCED_EXIF_TAGS = (ExifTags.Base.Orientation, ExifTags.Base.Artist, ExifTags.Base.Copyright)
+
+
+def reduce_exif(exif: bytes) -> bytes | None:
+    """An EXIF block with only the REDUCED_EXIF_TAGS of `exif`, or None if it has none of them."""
+    source = Image.Exif()
+    source.load(exif)
+    reduced = Image.Exif()
+    for tag in REDUCED_EXIF_TAGS:
+        if tag in source:
+            reduced[tag] = source[tag]
+    return reduced.tobytes() if len(reduced) else None
+
+
+def _encode(image, format: str, exif: bytes, quality: int | None, progressive: bool) -> bytes:
+    options = {}
+    if exif:
+        options["exif"] = exif
+    if quality is not None:
+        options["quality"] = quality
+    if progressive and format == ImageFormat.JPEG:
+        options.update(progressive=True, optimize=True)
+    buffer = BytesIO()
+    image.save(buffer, format=PILLOW_FORMATS[format], **options)
+    return buffer.getvalue()
+
+
+def encode_image(image, format: str, exif: bytes = None, quality: int = None,
+                 progressive: bool = False, max_bytes: int = None) -> bytes:
+    """
+    Encode a Pillow image in one of ImageFormat, keeping its EXIF block if given.
+
+    `quality` defaults to the format's own default. `progressive` writes
+    progressive JPEG with optimized Huffman tables. With `max_bytes`, the
+    highest quality up to `quality` (or MAX_BUDGET_QUALITY) that fits is
+    found by binary search; if none does, MIN_QUALITY is used.
+    """
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    if max_bytes is None:
+        return _encode(image, format, exif, quality, progressive)
+
+    low, high = MIN_QUALITY, max(quality or MAX_BUDGET_QUALITY, MIN_QUALITY)
+    content = _encode(image, format, exif, high, progressive)
+    if len(content) <= max_bytes:
+        return content
+
+    best = None
+    high -= 1
+    while low <= high:
+        middle = (low + high) // 2
+        content = _encode(image, format, exif, middle, progressive)
+        if len(content) <= max_bytes:
+            best, low = content, middle + 1
+        else:
+            high = middle - 1
+    return best or _encode(image, format, exif, MIN_QUALITY, progressive)
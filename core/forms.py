@@ -3,6 +3,7 @@ from django.utils import timezone
 from crispy_forms.helper import FormHelper
 from .models import *
 from .tasks import post_photo_create
+from .formats import EXTRA_FORMATS
 import json
 
 
@@ -194,9 +195,19 @@ PhotoFormSet = forms.modelformset_factory(
 
 
 class SizeForm(forms.ModelForm):
+    formats = forms.MultipleChoiceField(
+        choices=[(format.value, format.label) for format in EXTRA_FORMATS],
+        required=False,
+        widget=forms.CheckboxSelectMultiple,
+        help_text="Formats to produce alongside JPEG. Clients that accept them are sent these instead.",
+    )
+
     class Meta:
         model = Size
-        fields = ["slug", "comment", "max_dimension", "square_crop", "public"]
+        fields = [
+            "slug", "comment", "max_dimension", "square_crop", "formats",
+            "quality", "max_bytes", "progressive", "metadata", "public",
+        ]
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -226,9 +237,9 @@ class AlbumForm(forms.ModelForm, FormWithCustomAttributesFieldMixin):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.helper = FormHelper(self)
-        # Exclude current album from parent choices
+        # Exclude current album and its descendants from parent choices
         if self.instance and self.instance.pk:
-            self.fields['parent'].queryset = Album.objects.exclude(pk=self.instance.pk)
+            self.fields['parent'].queryset = Album.objects.exclude(pk__in=self.instance.get_descendants().values("pk"))
         else:
             self.fields['parent'].queryset = Album.objects.all()
 
@@ -0,0 +1,145 @@
+"""
+Spatial cell ids for indexed location queries.
+
+A cell id interleaves the bits of a point's quantized longitude and latitude
+(a Z-order / Morton code, the integer form of a geohash). Every cell at a
+coarser level covers one contiguous range of ids, so the points inside any
+bounding box can be found with a handful of indexed range predicates on a
+single integer column, on any database, before refining on latitude and
+longitude themselves.
+"""
+import math
+from django.db.models import F, Q, Value
+from django.db.models.functions import ASin, Cos, Least, Power, Radians, Sin, Sqrt
+
+
+CELL_BITS = 30  # per axis; 60-bit ids fit a signed 64-bit column
+MAX_COVERING_CELLS = 32
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def _quantize(value: float, low: float, high: float) -> int:
+    scaled = int((value - low) / (high - low) * (1 << CELL_BITS))
+    return min(max(scaled, 0), (1 << CELL_BITS) - 1)
+
+
+def _interleave(x: int, y: int, bits: int) -> int:
+    code = 0
+    for bit in range(bits - 1, -1, -1):
+        code = (code << 2) | (((x >> bit) & 1) << 1) | ((y >> bit) & 1)
+    return code
+
+
+def cell_id(latitude: float, longitude: float) -> int:
+    """Cell id of a point at full precision."""
+    return _interleave(_quantize(longitude, -180, 180), _quantize(latitude, -90, 90), CELL_BITS)
+
+
+def cell_ranges(south: float, west: float, north: float, east: float) -> list:
+    """
+    Inclusive cell id ranges covering a bounding box, from the finest level at
+    which the box spans at most MAX_COVERING_CELLS cells. Adjacent ranges are
+    merged. A box with west > east crosses the antimeridian.
+    """
+    if south > north:
+        return []
+    if west > east:
+        return _merge(cell_ranges(south, west, north, 180) + cell_ranges(south, -180, north, east))
+
+    x0, x1 = _quantize(west, -180, 180), _quantize(east, -180, 180)
+    y0, y1 = _quantize(south, -90, 90), _quantize(north, -90, 90)
+
+    for level in range(CELL_BITS, -1, -1):
+        shift = CELL_BITS - level
+        xs = range(x0 >> shift, (x1 >> shift) + 1)
+        ys = range(y0 >> shift, (y1 >> shift) + 1)
+        if len(xs) * len(ys) <= MAX_COVERING_CELLS:
+            break
+
+    span = 1 << (2 * shift)
+    ranges = []
+    for x in xs:
+        for y in ys:
+            prefix = _interleave(x, y, level)
+            ranges.append((prefix * span, (prefix + 1) * span - 1))
+    return _merge(ranges)
+
+
+def _merge(ranges: list) -> list:
+    merged = []
+    for low, high in sorted(ranges):
+        if merged and low <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], high))
+        else:
+            merged.append((low, high))
+    return merged
+
+
+def cells_within(south: float, west: float, north: float, east: float, field: str = "geocell") -> Q:
+    """
+    Candidate filter for points inside a bounding box. Matches a superset of the
+    box; refine with the exact latitude/longitude predicates.
+    """
+    condition = Q(pk__in=[])
+    for low, high in cell_ranges(south, west, north, east):
+        condition |= Q(**{f"{field}__range": (low, high)})
+    return condition
+
+
+def radius_bounds(latitude: float, longitude: float, radius_km: float) -> tuple:
+    """
+    (south, west, north, east) of a box containing every point within
+    `radius_km` of a point. Longitudes wrap; near a pole the box spans all of them.
+    """
+    delta_lat = radius_km / KM_PER_DEGREE
+    south, north = max(latitude - delta_lat, -90.0), min(latitude + delta_lat, 90.0)
+
+    cos_lat = math.cos(math.radians(max(abs(south), abs(north))))
+    delta_lon = radius_km / (KM_PER_DEGREE * cos_lat) if cos_lat > 1e-9 else 360.0
+    if delta_lon >= 180:
+        return south, -180.0, north, 180.0
+
+    west = longitude - delta_lon
+    east = longitude + delta_lon
+    if west < -180:
+        west += 360
+    if east > 180:
+        east -= 360
+    return south, west, north, east
+
+
+def distance_km(latitude: float, longitude: float, lat_field: str = "latitude", lon_field: str = "longitude"):
+    """
+    Expression for the great-circle (haversine) distance in kilometres from a
+    point to each row's location. Django provides the math functions on SQLite.
+    """
+    row_lat = Radians(F(lat_field))
+    half_dlat = (row_lat - math.radians(latitude)) / 2
+    half_dlon = (Radians(F(lon_field)) - math.radians(longitude)) / 2
+    a = Power(Sin(half_dlat), 2) + math.cos(math.radians(latitude)) * Cos(row_lat) * Power(Sin(half_dlon), 2)
+    # Rounding can push `a` just past 1 for antipodal points
+    return 2 * EARTH_RADIUS_KM * ASin(Sqrt(Least(a, Value(1.0))))
+
+
+def tiles_within(south: float, west: float, north: float, east: float, zoom: int, max_tiles: int) -> list:
+    """
+    Tiles at `zoom` overlapping a bounding box, in cell id order. A tile is one
+    cell at level `zoom`, identified by its cell id prefix, so the world is
+    2**zoom tiles wide and high. Raises ValueError past `max_tiles` tiles.
+    """
+    shift = CELL_BITS - zoom
+    x0, x1 = _quantize(west, -180, 180) >> shift, _quantize(east, -180, 180) >> shift
+    y0, y1 = _quantize(south, -90, 90) >> shift, _quantize(north, -90, 90) >> shift
+
+    xs = list(range(x0, x1 + 1)) if west <= east else [*range(x0, 1 << zoom), *range(0, x1 + 1)]
+    ys = range(y0, y1 + 1)
+    if len(xs) * len(ys) > max_tiles:
+        raise ValueError(f"The bounding box covers more than {max_tiles} tiles at this zoom.")
+    return sorted(_interleave(x, y, zoom) for x in xs for y in ys)
+
+
+def tile_ranges(tiles: list, zoom: int) -> list:
+    """Inclusive cell id ranges covering `tiles` at `zoom`, with adjacent tiles merged."""
+    span = 1 << (2 * (CELL_BITS - zoom))
+    return _merge([(tile * span, (tile + 1) * span - 1) for tile in tiles])
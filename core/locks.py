@@ -0,0 +1,111 @@
+"""
+Coalescing duplicate work across processes.
+
+Locks live in the Django cache (Redis), so every web and Celery worker sees
+them. A lock expires on its own after a timeout, so a crashed holder can't
+block a key forever; a live holder renews it for as long as its work runs.
+Each lock holds a random token and is only released by the holder of that
+token, so a holder whose lock expired never releases someone else's.
+
+Without a Redis cache there is nothing shared to lock, so work runs
+uncoalesced.
+"""
+import functools
+import threading
+import time
+import redis
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.redis import RedisCache
+from redis.exceptions import LockError
+
+
+LOCK_PREFIX = "core:singleflight"
+LOCK_TIMEOUT = 60
+# How often a held lock is renewed, well within LOCK_TIMEOUT
+RENEW_INTERVAL = LOCK_TIMEOUT / 3
+POLL_INTERVAL = 0.05
+
+
+def lock_name(key: str) -> str:
+    return f"{LOCK_PREFIX}:{key}"
+
+
+@functools.cache
+def redis_client():
+    """
+    A client for the Redis server the default cache writes to, or None when
+    the cache isn't Redis.
+    """
+    if not isinstance(caches[DEFAULT_CACHE_ALIAS], RedisCache):
+        return None
+    location = settings.CACHES[DEFAULT_CACHE_ALIAS]["LOCATION"]
+    servers = location.split(",") if isinstance(location, str) else location
+    # Like RedisCache, write to the first server
+    return redis.Redis.from_url(servers[0])
+
+
+def _lock(key: str):
+    # Not thread-local, so the renewing thread can use the holder's token
+    return redis_client().lock(cache.make_and_validate_key(lock_name(key)), timeout=LOCK_TIMEOUT, thread_local=False)
+
+
+def _renew(lock, stop: threading.Event):
+    while not stop.wait(RENEW_INTERVAL):
+        try:
+            lock.reacquire()
+        except LockError:
+            return  # Lost to expiry; the work carries on unprotected
+
+
+def wait_for(check, wait: float):
+    """Poll `check()` until it returns a result, for up to `wait` seconds. Returns None on timeout."""
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        result = check()
+        if result is not None:
+            return result
+    return None
+
+
+def singleflight(key: str, check, work, wait: float = LOCK_TIMEOUT):
+    """
+    Return the result `check()` finds, or else compute it with `work()`.
+
+    Only one caller runs `work()` for a key at a time; concurrent callers poll
+    `check()` for its result instead. Returns None when the result hasn't
+    appeared after waiting `wait` seconds for the lock.
+    """
+    result = check()
+    if result is not None:
+        return result
+    if redis_client() is None:
+        return work()
+
+    lock = _lock(key)
+    deadline = time.monotonic() + wait
+    while not lock.acquire(blocking=False):
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(POLL_INTERVAL)
+        result = check()
+        if result is not None:
+            return result
+
+    stop = threading.Event()
+    renewer = threading.Thread(target=_renew, args=(lock, stop), daemon=True)
+    renewer.start()
+    try:
+        # The previous holder may have finished between the first check and the lock
+        result = check()
+        if result is not None:
+            return result
+        return work()
+    finally:
+        stop.set()
+        renewer.join()
+        try:
+            lock.release()
+        except LockError:
+            pass  # Expired, and possibly taken by another caller whose lock stays
@@ -0,0 +1,32 @@
+# Generated by Django 6.0.3 on 2026-10-19 01:40
+
+import os
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_file_sizes(apps, schema_editor):
+    PhotoSize = apps.get_model('core', 'PhotoSize')
+    for photo_size in PhotoSize.objects.filter(file_size__isnull=True).exclude(image=""):
+        try:
+            photo_size.file_size = os.path.getsize(os.path.join(settings.MEDIA_ROOT, photo_size.image.name))
+        except OSError:
+            # Missing files are cleaned up by the consistency task
+            continue
+        photo_size.save(update_fields=['file_size'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_catalogchange'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photosize',
+            name='file_size',
+            field=models.PositiveBigIntegerField(help_text='Size of the image file in bytes', null=True),
+        ),
+        migrations.RunPython(populate_file_sizes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 6.0.3 on 2026-10-19 02:15
+
+from django.db import migrations, models
+
+
+def populate_album_paths(apps, schema_editor):
+    Album = apps.get_model('core', 'Album')
+    parents = dict(Album.objects.values_list('pk', 'parent_id'))
+
+    def path_of(pk, seen=()):
+        seen = seen + (pk,)
+        parent_id = parents.get(pk)
+        # Existing cycles can't be represented; break them at the repeated album
+        if parent_id is None or parent_id in seen:
+            return f"/{pk}/"
+        return f"{path_of(parent_id, seen)}{pk}/"
+
+    for pk in parents:
+        Album.objects.filter(pk=pk).update(path=path_of(pk))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_photosize_file_size'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='album',
+            name='path',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=1024),
+        ),
+        migrations.RunPython(populate_album_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 6.0.3 on 2026-10-19 02:21
+
+from django.db import migrations, models
+from core.geo import cell_id
+
+
+def populate_geocells(apps, schema_editor):
+    Photo = apps.get_model('core', 'Photo')
+    located = Photo.objects.filter(hide_location=False, latitude__isnull=False, longitude__isnull=False)
+    for pk, latitude, longitude in list(located.values_list('pk', 'latitude', 'longitude')):
+        Photo.objects.filter(pk=pk).update(geocell=cell_id(latitude, longitude))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_album_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='geocell',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(fields=['geocell', '_published'], name='core_photo_geocell_idx'),
+        ),
+        migrations.RunPython(populate_geocells, migrations.RunPython.noop),
+    ]
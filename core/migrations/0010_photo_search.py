@@ -0,0 +1,110 @@
+# Generated by Django 6.0.3 on 2026-10-19 02:36
+
+import django.contrib.postgres.search
+import django.db.models.deletion
+from collections import defaultdict
+from django.db import migrations, models
+
+
+FTS_TABLE = 'core_photosearch_fts'
+
+# FTS5 external content table over core_photosearchdocument. The triggers keep
+# it in sync; SQLite drops them if the documents table is ever rebuilt, so a
+# migration altering that table must recreate them.
+SQLITE_CREATE = [
+    f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        title, keywords, body,
+        content='core_photosearchdocument', content_rowid='photo_id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_insert AFTER INSERT ON core_photosearchdocument BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, keywords, body)
+        VALUES (new.photo_id, new.title, new.keywords, new.body);
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_delete AFTER DELETE ON core_photosearchdocument BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, keywords, body)
+        VALUES ('delete', old.photo_id, old.title, old.keywords, old.body);
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_update AFTER UPDATE ON core_photosearchdocument BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, keywords, body)
+        VALUES ('delete', old.photo_id, old.title, old.keywords, old.body);
+        INSERT INTO {FTS_TABLE}(rowid, title, keywords, body)
+        VALUES (new.photo_id, new.title, new.keywords, new.body);
+    END
+    """,
+]
+
+POSTGRES_CREATE = [
+    "CREATE INDEX core_photosearchdocument_vector_gin ON core_photosearchdocument USING gin (vector)",
+]
+
+
+def create_search_index(apps, schema_editor):
+    statements = {'sqlite': SQLITE_CREATE, 'postgresql': POSTGRES_CREATE}.get(schema_editor.connection.vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    elif schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS core_photosearchdocument_vector_gin")
+
+
+def populate_search_documents(apps, schema_editor):
+    Photo = apps.get_model('core', 'Photo')
+    PhotoTag = apps.get_model('core', 'PhotoTag')
+    PhotoInAlbum = apps.get_model('core', 'PhotoInAlbum')
+    PhotoMetadata = apps.get_model('core', 'PhotoMetadata')
+    PhotoSearchDocument = apps.get_model('core', 'PhotoSearchDocument')
+
+    keywords = defaultdict(list)
+    for photo_id, name in PhotoTag.objects.values_list('photo_id', 'tag__name'):
+        keywords[photo_id].append(name)
+    for photo_id, title in PhotoInAlbum.objects.values_list('photo_id', 'album__title'):
+        keywords[photo_id].append(title)
+    for photo_id, *values in PhotoMetadata.objects.values_list('photo_id', 'camera_make', 'camera_model', 'lens_model'):
+        keywords[photo_id].extend(value for value in values if value)
+
+    PhotoSearchDocument.objects.bulk_create(
+        PhotoSearchDocument(photo_id=pk, title=title, body=description or '', keywords=' '.join(keywords[pk]))
+        for pk, title, description in Photo.objects.values_list('pk', 'title', 'description')
+    )
+
+    if schema_editor.connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchVector
+        PhotoSearchDocument.objects.update(
+            vector=SearchVector('title', weight='A', config='simple')
+            + SearchVector('keywords', weight='B', config='simple')
+            + SearchVector('body', weight='C', config='simple')
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_photo_geocell'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PhotoSearchDocument',
+            fields=[
+                ('photo', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='core.photo')),
+                ('title', models.TextField(blank=True)),
+                ('keywords', models.TextField(blank=True)),
+                ('body', models.TextField(blank=True)),
+                ('vector', django.contrib.postgres.search.SearchVectorField(editable=False, null=True)),
+            ],
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(populate_search_documents, migrations.RunPython.noop),
+    ]
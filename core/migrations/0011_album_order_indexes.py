@@ -0,0 +1,25 @@
+# Generated by Django 6.0.3 on 2026-10-19 02:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_photo_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(fields=['publish_date', 'id'], name='core_photo_publish_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='photoinalbum',
+            index=models.Index(fields=['album', 'order'], name='core_photoinalbum_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='photometadata',
+            index=models.Index(fields=['capture_date'], name='core_photometadata_capture_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 6.0.3 on 2026-10-19 03:10
+
+from django.db import migrations
+
+
+# Containment lookups on custom attributes. SQLite has no equivalent; keys
+# listed in INDEXED_CUSTOM_ATTRIBUTES get expression indexes there instead.
+GIN_INDEXES = {
+    'core_photo_custom_attributes_gin': 'core_photo',
+    'core_album_custom_attributes_gin': 'core_album',
+}
+
+
+def create_gin_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table in GIN_INDEXES.items():
+        schema_editor.execute(f"CREATE INDEX {name} ON {table} USING gin (custom_attributes jsonb_path_ops)")
+
+
+def drop_gin_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in GIN_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_album_order_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_gin_indexes, drop_gin_indexes),
+    ]
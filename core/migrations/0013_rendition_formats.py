@@ -0,0 +1,23 @@
+# Generated by Django 6.0.3 on 2026-10-19 03:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_custom_attributes_gin'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photosize',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='size',
+            name='formats',
+            field=models.JSONField(blank=True, default=list, help_text='Formats to produce alongside JPEG'),
+        ),
+    ]
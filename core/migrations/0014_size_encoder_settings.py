@@ -0,0 +1,34 @@
+# Generated by Django 6.0.3 on 2026-10-19 03:54
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_rendition_formats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='size',
+            name='max_bytes',
+            field=models.PositiveIntegerField(blank=True, help_text='Byte budget per file. Quality is lowered as far as needed to fit, starting from the quality above if set.', null=True),
+        ),
+        migrations.AddField(
+            model_name='size',
+            name='metadata',
+            field=models.CharField(choices=[('keep', 'Keep all'), ('reduce', 'Keep orientation and copyright only'), ('strip', 'Strip (orientation is applied to the pixels)')], default='keep', help_text='EXIF metadata to keep', max_length=8),
+        ),
+        migrations.AddField(
+            model_name='size',
+            name='progressive',
+            field=models.BooleanField(default=False, help_text='Write progressive JPEGs with optimized Huffman tables'),
+        ),
+        migrations.AddField(
+            model_name='size',
+            name='quality',
+            field=models.PositiveSmallIntegerField(blank=True, help_text="Encoder quality from 1 to 100. Leave blank for each format's default.", null=True, validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(100)]),
+        ),
+    ]
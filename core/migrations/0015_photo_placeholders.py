@@ -0,0 +1,23 @@
+# Generated by Django 6.0.3 on 2026-10-19 04:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_size_encoder_settings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='blurhash',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='dominant_color',
+            field=models.CharField(blank=True, editable=False, max_length=7, null=True),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 6.0.3 on 2026-10-19 04:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_photo_placeholders'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='catalogchange',
+            index=models.Index(fields=['timestamp'], name='core_catalogchange_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='catalogchange',
+            index=models.Index(fields=['entity_uuid', 'id'], name='core_catalogchange_entity_idx'),
+        ),
+    ]
@@ -1,13 +1,23 @@
 from django.db import models
+from django.db.models import F, Q, Value
+from django.contrib.postgres.search import SearchVectorField
+from django.db.models.functions import Concat, Mod, Substr
+import hashlib
 import os
+import random
 import uuid
+from datetime import timedelta
+from django.conf import settings
 from django.urls import reverse
 from django.utils.text import slugify
 from . import CONTENT_RAW_PHOTOS_PATH, CONTENT_RESIZED_PHOTOS_PATH
 from . import tasks
 from django.core.exceptions import ValidationError
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.utils import timezone
 from .signals import photo_published, photo_unpublished
+from .geo import cell_id
+from .formats import EXTRA_FORMATS, ImageFormat
 
 
 class PublicEntity(models.Model):
@@ -43,6 +53,11 @@ class Photo(PublicEntity):
     latitude = models.FloatField(null=True, blank=True)
     longitude = models.FloatField(null=True, blank=True)
     hide_location = models.BooleanField(default=False, help_text="Hide location data from public API")
+    # Spatial cell of the public location (see core.geo); null when there is none
+    geocell = models.BigIntegerField(null=True, blank=True, editable=False)
+    # Placeholders shown before the image loads (see core.placeholders)
+    blurhash = models.CharField(max_length=64, null=True, blank=True, editable=False)
+    dominant_color = models.CharField(max_length=7, null=True, blank=True, editable=False)
 
     tags = models.ManyToManyField(
         "Tag",
@@ -50,6 +65,12 @@ class Photo(PublicEntity):
         related_name="photos"
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["geocell", "_published"], name="core_photo_geocell_idx"),
+            models.Index(fields=["publish_date", "id"], name="core_photo_publish_date_idx"),
+        ]
+
     @property
     def published(self):
         return self._published
@@ -64,6 +85,11 @@ class Photo(PublicEntity):
         slug = f"{timezone.now().strftime('%Y-%m-%d')}-{slugify(self.title)}"
         return slug[:self._meta.get_field('slug').max_length]
     
+    def calculate_geocell(self):
+        if self.hide_location or self.latitude is None or self.longitude is None:
+            return None
+        return cell_id(self.latitude, self.longitude)
+
     def calculate_published(self) -> bool:
         return not self.hidden and bool(self.publish_date and self.publish_date <= timezone.now())
     
@@ -89,6 +115,12 @@ class Photo(PublicEntity):
 
     def get_size(self, size: str):
         return self.sizes.filter(size__slug=size).first()
+
+    def save_placeholder(self, blurhash: str | None, dominant_color: str | None):
+        self.blurhash, self.dominant_color = blurhash, dominant_color
+        # Nothing save() derives depends on these, and its publish checks must
+        # wait until every size exists
+        super().save(update_fields=["blurhash", "dominant_color"])
     
     def clean(self):
         # Calculate the slug if not already set
@@ -133,6 +165,11 @@ class Photo(PublicEntity):
                     self.latitude = self.metadata.raw_latitude
                     self.longitude = self.metadata.raw_longitude
 
+        self.geocell = self.calculate_geocell()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"latitude", "longitude", "hide_location"} & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "geocell"}
+
         super().save(*args, **kwargs)
 
         if schedule_followup_tasks and is_new:
@@ -157,7 +194,7 @@ class Photo(PublicEntity):
     
     def delete(self, *args, **kwargs):
         # Delete all sizes associated with this photo
-        size_files = [s.image.path for s in self.sizes.all() if s.image]
+        size_files = [file.path for s in self.sizes.all() for file in s.files() if file]
         if self.raw_image:
             size_files.append(self.raw_image.path)
 
@@ -205,10 +242,32 @@ class PhotoMetadata(PublicEntity):
     raw_latitude = models.FloatField(null=True, blank=True)
     raw_longitude = models.FloatField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["capture_date"], name="core_photometadata_capture_idx"),
+        ]
+
     def __str__(self):
         return f"Metadata for {str(self.photo)}"
 
 
+class PhotoSearchDocument(models.Model):
+    """
+    A photo's searchable text, maintained by core.search. Postgres matches it
+    through `vector` (GIN indexed); SQLite through an FTS5 table that triggers
+    keep in sync with this one. Both are created in migration 0010.
+    """
+    photo = models.OneToOneField(Photo, on_delete=models.CASCADE, primary_key=True, related_name="search_document")
+    title = models.TextField(blank=True)
+    # Tag names, album titles, camera and lens
+    keywords = models.TextField(blank=True)
+    body = models.TextField(blank=True)
+    vector = SearchVectorField(null=True, editable=False)
+
+    def __str__(self):
+        return f"Search document for {str(self.photo)}"
+
+
 class Tag(PublicEntity):
     name = models.CharField(max_length=128)
 
@@ -269,6 +328,31 @@ class PhotoTag(models.Model):
         return str(self.tag)
 
 
+# Mersenne prime 2^31 - 1, the modulus for seeded_order
+SEEDED_ORDER_MODULUS = 2147483647
+
+
+def seeded_order(seed: int, field: str = "id"):
+    """
+    Order expression for a pseudo-random permutation that is the same for every
+    request with the same seed: `(field * a + b) mod p`, with `a` and `b` derived
+    from the seed. Rows can be paged and cached, and the database only computes
+    a key per row instead of calling random().
+    """
+    digest = hashlib.sha256(str(seed).encode()).digest()
+    multiplier = int.from_bytes(digest[:8]) % (SEEDED_ORDER_MODULUS - 1) + 1
+    offset = int.from_bytes(digest[8:16]) % SEEDED_ORDER_MODULUS
+    return Mod(F(field) * multiplier + offset, SEEDED_ORDER_MODULUS)
+
+
+def _sort_ordering(key, descending: bool, reverse: bool = False) -> tuple:
+    """order_by() arguments for an album sort key: missing keys last, ties by id."""
+    nulls = {"nulls_first": True} if reverse else {"nulls_last": True}
+    if descending != reverse:
+        return key.desc(**nulls), F("id").desc()
+    return key.asc(**nulls), F("id").asc()
+
+
 class Album(PublicEntity):
     class AlbumSortMethod(models.TextChoices):
         CREATED = "CREATED", "Photo Created Date (Exif)"
@@ -293,48 +377,91 @@ class Album(PublicEntity):
         verbose_name="Photos"
     )
     parent = models.ForeignKey("Album", on_delete=models.SET_NULL, null=True, blank=True, related_name="children")
+    # Ids from the root down to this album, e.g. "/1/5/9/"; maintained by save() and
+    # the post_delete receiver so subtrees are a single indexed prefix match
+    path = models.CharField(max_length=1024, default="", editable=False, db_index=True)
     custom_attributes = models.JSONField(default=dict, blank=True)
 
-    def get_ordered_photos(self, public_only: bool = False, recursive: bool = False, sort_method: AlbumSortMethod = None, sort_descending: bool = None):
-        qs = self._photos.all()
-
+    def get_descendants(self, include_self: bool = True):
+        """Albums in this album's subtree, in one query."""
+        if not self.path:
+            # Not saved yet, so it has no subtree
+            return Album.objects.none()
+        qs = Album.objects.filter(path__startswith=self.path)
+        if not include_self:
+            qs = qs.exclude(pk=self.pk)
+        return qs
+
+    def get_sort(self, recursive: bool = False, sort_method: AlbumSortMethod = None, sort_descending: bool = None, seed: int = None) -> tuple:
+        """
+        The effective order of the album's photos as a (key expression,
+        descending) pair. Photos without a key sort last, and ties are broken
+        by id in the same direction.
+        """
         sort_method = sort_method if sort_method is not None else self.sort_method
         sort_descending = self.sort_descending if sort_descending is None else sort_descending
 
-        if recursive:
-            # MANUAL sort is meaningless across multiple albums; fall back to PUBLISHED
-            if sort_method == self.AlbumSortMethod.MANUAL:
-                sort_method = self.AlbumSortMethod.PUBLISHED
-
-            # Collect all album PKs in the subtree (BFS)
-            album_pks = []
-            queue = [self]
-            while queue:
-                current = queue.pop(0)
-                album_pks.append(current.pk)
-                queue.extend(current.children.all())
-
-            qs = Photo.objects.filter(albums__in=album_pks).distinct()
-
-        if public_only:
-            qs = qs.filter(_published=True)
+        # MANUAL sort is meaningless across multiple albums; fall back to PUBLISHED
+        if recursive and sort_method == self.AlbumSortMethod.MANUAL:
+            sort_method = self.AlbumSortMethod.PUBLISHED
 
         if sort_method == self.AlbumSortMethod.MANUAL:
             # Do not apply ascending/descending for manual sort
-            return qs.order_by("photoinalbum__order")
+            return F("photoinalbum__order"), False
         elif sort_method == self.AlbumSortMethod.CREATED:
-            order_by = "metadata__capture_date"
+            return F("metadata__capture_date"), sort_descending
         elif sort_method == self.AlbumSortMethod.PUBLISHED:
-            order_by = "publish_date"
+            return F("publish_date"), sort_descending
         elif sort_method == self.AlbumSortMethod.RANDOM:
-            return qs.order_by("?")  # random order, no need for sort_descending
+            # Seeded so the same seed always gives the same order; no need for sort_descending
+            if seed is None:
+                seed = random.getrandbits(32)
+            return seeded_order(seed), False
+        return F("photoinalbum__order"), sort_descending
+
+    def get_photos(self, public_only: bool = False, recursive: bool = False):
+        """The album's photos, or with `recursive` those of the album and all its descendants, unordered."""
+        if recursive:
+            qs = Photo.objects.filter(albums__in=self.get_descendants().values("pk")).distinct()
         else:
-            order_by = "photoinalbum__order"
-
-        if sort_descending:
-            order_by = f'-{order_by}'
-
-        return qs.order_by(order_by)
+            qs = self._photos.all()
+        if public_only:
+            qs = qs.filter(_published=True)
+        return qs
+
+    def get_ordered_photos(self, public_only: bool = False, recursive: bool = False, sort_method: AlbumSortMethod = None, sort_descending: bool = None, seed: int = None):
+        key, descending = self.get_sort(recursive, sort_method, sort_descending, seed)
+        return self.get_photos(public_only, recursive).order_by(*_sort_ordering(key, descending))
+
+    def get_neighbors(self, photo, public_only: bool = False, recursive: bool = False, sort_method: AlbumSortMethod = None, sort_descending: bool = None, seed: int = None) -> tuple:
+        """
+        The photos just before and after `photo` in `get_ordered_photos`, each
+        None at an end of the album. Each is a keyset query: a comparison with
+        `photo`'s sort key and id, limited to one row, so neither reads the
+        photos in between. Raises Photo.DoesNotExist if `photo` isn't in the album.
+        """
+        key, descending = self.get_sort(recursive, sort_method, sort_descending, seed)
+        photos = self.get_photos(public_only, recursive).annotate(sort_key=key)
+        current = photos.filter(pk=photo.pk).values("sort_key").first()
+        if current is None:
+            raise Photo.DoesNotExist("The photo is not in this album.")
+
+        value = current["sort_key"]
+        later, earlier = ("lt", "gt") if descending else ("gt", "lt")
+        if value is None:
+            after = Q(sort_key__isnull=True, **{f"pk__{later}": photo.pk})
+            before = Q(sort_key__isnull=False) | Q(sort_key__isnull=True, **{f"pk__{earlier}": photo.pk})
+        else:
+            after = (
+                Q(**{f"sort_key__{later}": value})
+                | Q(sort_key=value, **{f"pk__{later}": photo.pk})
+                | Q(sort_key__isnull=True)
+            )
+            before = Q(**{f"sort_key__{earlier}": value}) | Q(sort_key=value, **{f"pk__{earlier}": photo.pk})
+
+        ordering = _sort_ordering(F("sort_key"), descending)
+        reverse = _sort_ordering(F("sort_key"), descending, reverse=True)
+        return photos.filter(before).order_by(*reverse).first(), photos.filter(after).order_by(*ordering).first()
     
     def calculate_slug(self) -> str:
         return slugify(f"{self.title}")[:255]
@@ -348,12 +475,10 @@ class Album(PublicEntity):
             raise ValidationError(f"An album with the slug '{slug_to_check}' already exists.")
         
         # Ensure parent does not create a cyclic relationship
-        if self.parent:
-            ancestor = self.parent
-            while ancestor:
-                if ancestor == self:
-                    raise ValidationError("An album cannot be its own ancestor.")
-                ancestor = ancestor.parent
+        if self.parent_id and self.pk:
+            own_path = Album.objects.filter(pk=self.pk).values("path")
+            if Album.objects.filter(pk=self.parent_id, path__startswith=models.Subquery(own_path)).exists():
+                raise ValidationError("An album cannot be its own ancestor.")
     
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -363,8 +488,41 @@ class Album(PublicEntity):
                 self.short_description = self.description[:97] + "..."
             else:
                 self.short_description = self.description
+
+        parent_path = "/"
+        if self.parent_id:
+            parent_path = Album.objects.filter(pk=self.parent_id).values_list("path", flat=True).first() or "/"
+
+        if self.pk is None:
+            super().save(*args, **kwargs)
+            self.path = f"{parent_path}{self.pk}/"
+            Album.objects.filter(pk=self.pk).update(path=self.path)
+            return
+
+        old_path = Album.objects.filter(pk=self.pk).values_list("path", flat=True).first()
+        self.path = f"{parent_path}{self.pk}/"
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = {*kwargs["update_fields"], "path"}
         super().save(*args, **kwargs)
 
+        if old_path and old_path != self.path:
+            # Moved: re-root the whole subtree in one update
+            Album.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                path=Concat(Value(self.path), Substr("path", len(old_path) + 1))
+            )
+
+    @staticmethod
+    def reroot_descendants(path: str):
+        """
+        Make the subtrees below a deleted album, whose path was `path`, roots,
+        after its children's parent has been set to null.
+        """
+        if not path:
+            return
+        Album.objects.filter(path__startswith=path).update(
+            path=Concat(Value("/"), Substr("path", len(path) + 1))
+        )
+
     def __str__(self):
         return self.title
     
@@ -380,12 +538,20 @@ class PhotoInAlbum(models.Model):
     class Meta:
         unique_together = ("album", "photo")
         ordering = ["order"]
+        indexes = [
+            models.Index(fields=["album", "order"], name="core_photoinalbum_order_idx"),
+        ]
     
     def __str__(self):
         return f"{self.album.title} -> {self.photo.title}"
 
 
 class Size(PublicEntity):
+    class Metadata(models.TextChoices):
+        KEEP = "keep", "Keep all"
+        REDUCE = "reduce", "Keep orientation and copyright only"
+        STRIP = "strip", "Strip (orientation is applied to the pixels)"
+
     slug = models.CharField(max_length=32, unique=True)
     comment = models.CharField(max_length=255, blank=True, null=True)
     max_dimension = models.PositiveIntegerField()
@@ -393,11 +559,26 @@ class Size(PublicEntity):
     builtin = models.BooleanField(default=False)
     can_edit = models.BooleanField(default=True)
     public = models.BooleanField(default=True, help_text="Allow in the public API?")
+    formats = models.JSONField(default=list, blank=True, help_text="Formats to produce alongside JPEG")
+    quality = models.PositiveSmallIntegerField(
+        null=True, blank=True, validators=[MinValueValidator(1), MaxValueValidator(100)],
+        help_text="Encoder quality from 1 to 100. Leave blank for each format's default.",
+    )
+    max_bytes = models.PositiveIntegerField(
+        null=True, blank=True,
+        help_text="Byte budget per file. Quality is lowered as far as needed to fit, starting from the quality above if set.",
+    )
+    progressive = models.BooleanField(default=False, help_text="Write progressive JPEGs with optimized Huffman tables")
+    metadata = models.CharField(
+        max_length=8, choices=Metadata.choices, default=Metadata.KEEP, help_text="EXIF metadata to keep"
+    )
 
     def clean(self):
         # Prevent modifications to builtin sizes
         if not self.can_edit:
             raise ValidationError("Cannot modify this size.")
+        if any(format not in EXTRA_FORMATS for format in self.formats):
+            raise ValidationError("Sizes can only add WebP and AVIF formats.")
         # Don't allow changes to slug or comment if it's a builtin size
         if self.pk is not None:
             orig = Size.objects.get(pk=self.pk)
@@ -407,7 +588,7 @@ class Size(PublicEntity):
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
 
-        file_paths = list(self.photos.values_list("image", flat=True))
+        file_paths = rendition_files(self.photos.all())
         self.photos.all().delete()
 
         if file_paths:
@@ -421,7 +602,7 @@ class Size(PublicEntity):
         if self.builtin or not self.can_edit:
             raise ValidationError("Cannot delete a builtin size.")
         
-        file_paths = list(self.photos.values_list("image", flat=True))
+        file_paths = rendition_files(self.photos.all())
         self.photos.all().delete()
 
         if file_paths:
@@ -450,10 +631,105 @@ class PhotoSize(models.Model):
     height = models.PositiveIntegerField(null=True)
     width = models.PositiveIntegerField(null=True)
     md5 = models.CharField(max_length=32, null=True)
+    file_size = models.PositiveBigIntegerField(null=True, help_text="Size of the image file in bytes")
+    # The image above is JPEG. Renditions in the size's other formats are kept
+    # here by format, as {"image": <file name>, "md5": ..., "file_size": ...},
+    # so they load with the row instead of in another query.
+    variants = models.JSONField(default=dict, blank=True)
 
     class Meta:
         unique_together = ("photo", "size")
         ordering = ["size__max_dimension"]
 
+    @property
+    def formats(self) -> list:
+        return [ImageFormat.JPEG, *self.variants]
+
+    def get_file(self, format: str = ImageFormat.JPEG):
+        """The image file of the rendition in `format`, or None if there isn't one."""
+        if format == ImageFormat.JPEG:
+            return self.image
+        variant = self.variants.get(format)
+        if variant is None:
+            return None
+        return self.image.field.attr_class(self, self.image.field, variant["image"])
+
+    def files(self) -> list:
+        return [self.get_file(format) for format in self.formats]
+
     def __str__(self):
         return f"{self.photo.title} - {self.size.slug}"
+
+
+def rendition_files(photo_sizes) -> list:
+    """File names of every rendition, in all formats, of a PhotoSize queryset."""
+    files = []
+    for image, variants in photo_sizes.values_list("image", "variants"):
+        files.append(image)
+        files.extend(variant["image"] for variant in variants.values())
+    return files
+
+
+class CatalogChange(models.Model):
+    """
+    Append-only log of changes to publicly visible catalog entities.
+
+    The auto-incrementing id doubles as a monotonic cursor for delta syncs.
+    Deletions (and photos or sizes leaving the public API) are recorded as
+    DELETED tombstones, since they can't be discovered through updated_at.
+
+    Ids are assigned when a change is written, not when its transaction
+    commits, so a change can become visible after one with a higher id. Only
+    changes older than CHANGE_FEED_SAFETY_LAG seconds are handed out, and
+    cursors never move past a change younger than that.
+    """
+    class EntityType(models.TextChoices):
+        PHOTO = "photo", "Photo"
+        ALBUM = "album", "Album"
+        TAG = "tag", "Tag"
+        SIZE = "size", "Size"
+
+    class Action(models.TextChoices):
+        CREATED = "created", "Created"
+        UPDATED = "updated", "Updated"
+        DELETED = "deleted", "Deleted"
+
+    entity_type = models.CharField(max_length=8, choices=EntityType.choices)
+    entity_uuid = models.UUIDField()
+    action = models.CharField(max_length=8, choices=Action.choices)
+    timestamp = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(fields=["timestamp"], name="core_catalogchange_time_idx"),
+            models.Index(fields=["entity_uuid", "id"], name="core_catalogchange_entity_idx"),
+        ]
+
+    @classmethod
+    def record(cls, entity_type: EntityType, entity_uuid, action: Action) -> "CatalogChange":
+        return cls.objects.create(entity_type=entity_type, entity_uuid=entity_uuid, action=action)
+
+    @classmethod
+    def is_tombstoned(cls, entity_type: EntityType, entity_uuid) -> bool:
+        """Whether an entity has no changes recorded, or its latest is a tombstone."""
+        latest = (
+            cls.objects.filter(entity_type=entity_type, entity_uuid=entity_uuid)
+            .order_by("-id").values_list("action", flat=True).first()
+        )
+        return latest in (None, cls.Action.DELETED)
+
+    @classmethod
+    def settled_cursor(cls) -> int:
+        """
+        The highest id up to which every change is older than the safety lag,
+        and so presumably committed along with all changes before it.
+        """
+        cutoff = timezone.now() - timedelta(seconds=settings.CHANGE_FEED_SAFETY_LAG)
+        first_recent = cls.objects.filter(timestamp__gte=cutoff).order_by("id").values_list("id", flat=True).first()
+        if first_recent is not None:
+            return first_recent - 1
+        return cls.objects.order_by("-id").values_list("id", flat=True).first() or 0
+
+    def __str__(self):
+        return f"{self.id}: {self.action} {self.entity_type} {self.entity_uuid}"
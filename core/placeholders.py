@@ -0,0 +1,99 @@
+"""
+Low-quality image placeholders.
+
+Each photo gets a BlurHash (https://blurha.sh) and a dominant colour, small
+enough to send with every photo summary, so galleries can paint a tile for
+each photo before any of its images load. Both are computed from a tiny copy
+of an image already decoded for a rendition.
+"""
+import math
+from PIL import Image, ImageOps
+
+
+# Longest side of the copy placeholders are computed from
+PLACEHOLDER_DIMENSION = 32
+BLURHASH_COMPONENTS = (4, 3)
+DOMINANT_COLORS = 4
+
+BASE83 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+# sRGB channel values in linear light
+_LINEAR = [
+    value / 12.92 if value <= 0.04045 else ((value + 0.055) / 1.055) ** 2.4
+    for value in (channel / 255 for channel in range(256))
+]
+
+
+def _base83(value: int, length: int) -> str:
+    return "".join(BASE83[value // 83 ** (length - i) % 83] for i in range(1, length + 1))
+
+
+def _srgb(value: float) -> int:
+    value = min(max(value, 0.0), 1.0)
+    if value <= 0.0031308:
+        return int(value * 12.92 * 255 + 0.5)
+    return int((1.055 * value ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def _sign_pow(value: float, exponent: float) -> float:
+    return math.copysign(abs(value) ** exponent, value)
+
+
+def blurhash(image: Image.Image, components: tuple = BLURHASH_COMPONENTS) -> str:
+    """BlurHash of an RGB image; meant for images of a few dozen pixels a side."""
+    x_components, y_components = components
+    width, height = image.size
+    pixels = [tuple(_LINEAR[channel] for channel in pixel) for pixel in image.getdata()]
+    cos_x = [[math.cos(math.pi * i * x / width) for x in range(width)] for i in range(x_components)]
+    cos_y = [[math.cos(math.pi * j * y / height) for y in range(height)] for j in range(y_components)]
+
+    factors = []
+    for j in range(y_components):
+        for i in range(x_components):
+            scale = (1 if i == j == 0 else 2) / (width * height)
+            r = g = b = 0.0
+            for y in range(height):
+                row = y * width
+                for x in range(width):
+                    basis = cos_x[i][x] * cos_y[j][y]
+                    red, green, blue = pixels[row + x]
+                    r += basis * red
+                    g += basis * green
+                    b += basis * blue
+            factors.append((r * scale, g * scale, b * scale))
+
+    dc, ac = factors[0], factors[1:]
+    result = _base83((x_components - 1) + (y_components - 1) * 9, 1)
+    if ac:
+        quantised_max = max(0, min(82, int(max(abs(value) for factor in ac for value in factor) * 166 - 0.5)))
+        max_value = (quantised_max + 1) / 166
+    else:
+        quantised_max, max_value = 0, 1
+    result += _base83(quantised_max, 1)
+    result += _base83((_srgb(dc[0]) << 16) + (_srgb(dc[1]) << 8) + _srgb(dc[2]), 4)
+
+    def quantise(value):
+        return max(0, min(18, int(_sign_pow(value / max_value, 0.5) * 9 + 9.5)))
+
+    for r, g, b in ac:
+        result += _base83(quantise(r) * 19 * 19 + quantise(g) * 19 + quantise(b), 2)
+    return result
+
+
+def dominant_color(image: Image.Image) -> str:
+    """The most common of a few representative colours of an RGB image, as #rrggbb."""
+    quantized = image.quantize(colors=DOMINANT_COLORS, method=Image.Quantize.MEDIANCUT)
+    _, index = max(quantized.getcolors())
+    palette = quantized.getpalette()
+    return "#{:02x}{:02x}{:02x}".format(*palette[index * 3:index * 3 + 3])
+
+
+def placeholder(image: Image.Image) -> tuple:
+    """
+    (BlurHash, dominant colour) of an image, upright. `image` can be any size;
+    placeholders are computed from a copy at most PLACEHOLDER_DIMENSION a side.
+    """
+    scale = min(PLACEHOLDER_DIMENSION / max(image.size), 1.0)
+    small_size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    small = image.resize(small_size, Image.Resampling.BILINEAR, reducing_gap=2.0)
+    small = ImageOps.exif_transpose(small).convert("RGB")
+    return blurhash(small), dominant_color(small)
@@ -0,0 +1,128 @@
+from django.dispatch import receiver
+from django.db.models.signals import post_save, post_delete
+from .models import Photo, PhotoMetadata, PhotoSize, Size, Album, PhotoInAlbum, Tag, PhotoTag, CatalogChange
+from . import search
+
+
+def record_entity_change(entity_type, instance, created, visible=True):
+    """
+    Record a change to a top-level entity. An entity that stops being visible
+    in the public API is recorded as a tombstone; saves of entities that
+    weren't visible anyway aren't recorded.
+    """
+    if visible:
+        action = CatalogChange.Action.CREATED if created else CatalogChange.Action.UPDATED
+    elif created or CatalogChange.is_tombstoned(entity_type, instance.uuid):
+        return
+    else:
+        action = CatalogChange.Action.DELETED
+
+    CatalogChange.record(entity_type, instance.uuid, action)
+
+
+def record_photo_updated(photo_id):
+    """Record that a photo's payload changed through one of its related rows."""
+    photo = Photo.objects.filter(pk=photo_id, _published=True).values("uuid").first()
+    if photo:
+        CatalogChange.record(CatalogChange.EntityType.PHOTO, photo["uuid"], CatalogChange.Action.UPDATED)
+
+
+def record_parent_updated(model, entity_type, pk):
+    parent = model.objects.filter(pk=pk).values("uuid").first()
+    if parent:
+        CatalogChange.record(entity_type, parent["uuid"], CatalogChange.Action.UPDATED)
+
+
+@receiver(post_save, sender=Photo)
+def handle_photo_saved(sender, instance, created, **kwargs):
+    record_entity_change(CatalogChange.EntityType.PHOTO, instance, created, visible=instance.published)
+
+
+@receiver(post_save, sender=Album)
+def handle_album_saved(sender, instance, created, **kwargs):
+    record_entity_change(CatalogChange.EntityType.ALBUM, instance, created)
+
+
+@receiver(post_save, sender=Tag)
+def handle_tag_saved(sender, instance, created, **kwargs):
+    record_entity_change(CatalogChange.EntityType.TAG, instance, created)
+
+
+@receiver(post_save, sender=Size)
+def handle_size_saved(sender, instance, created, **kwargs):
+    record_entity_change(CatalogChange.EntityType.SIZE, instance, created, visible=instance.public)
+
+
+@receiver(post_delete, sender=Photo)
+@receiver(post_delete, sender=Album)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Size)
+def handle_entity_deleted(sender, instance, **kwargs):
+    entity_type = {
+        Photo: CatalogChange.EntityType.PHOTO,
+        Album: CatalogChange.EntityType.ALBUM,
+        Tag: CatalogChange.EntityType.TAG,
+        Size: CatalogChange.EntityType.SIZE,
+    }[sender]
+    if sender is Photo:
+        visible = instance.published
+    elif sender is Size:
+        visible = instance.public
+    else:
+        visible = True
+    # Entities that were never public, or are already tombstoned, need no tombstone
+    if visible or not CatalogChange.is_tombstoned(entity_type, instance.uuid):
+        CatalogChange.record(entity_type, instance.uuid, CatalogChange.Action.DELETED)
+
+
+@receiver(post_save, sender=PhotoMetadata)
+@receiver(post_save, sender=PhotoSize)
+@receiver(post_delete, sender=PhotoMetadata)
+@receiver(post_delete, sender=PhotoSize)
+def handle_photo_detail_changed(sender, instance, **kwargs):
+    record_photo_updated(instance.photo_id)
+
+
+@receiver(post_save, sender=PhotoInAlbum)
+@receiver(post_delete, sender=PhotoInAlbum)
+def handle_album_membership_changed(sender, instance, **kwargs):
+    record_photo_updated(instance.photo_id)
+    record_parent_updated(Album, CatalogChange.EntityType.ALBUM, instance.album_id)
+
+
+@receiver(post_save, sender=PhotoTag)
+@receiver(post_delete, sender=PhotoTag)
+def handle_tag_membership_changed(sender, instance, **kwargs):
+    record_photo_updated(instance.photo_id)
+    record_parent_updated(Tag, CatalogChange.EntityType.TAG, instance.tag_id)
+
+
+@receiver(post_delete, sender=Album)
+def handle_album_deleted(sender, instance, **kwargs):
+    Album.reroot_descendants(instance.path)
+
+
+@receiver(post_save, sender=Photo)
+def handle_photo_search_text_changed(sender, instance, created, update_fields=None, **kwargs):
+    if created or update_fields is None or {"title", "description"} & set(update_fields):
+        search.schedule_update([instance.pk])
+
+
+@receiver(post_save, sender=PhotoMetadata)
+@receiver(post_delete, sender=PhotoMetadata)
+@receiver(post_save, sender=PhotoTag)
+@receiver(post_delete, sender=PhotoTag)
+@receiver(post_save, sender=PhotoInAlbum)
+@receiver(post_delete, sender=PhotoInAlbum)
+def handle_photo_keywords_changed(sender, instance, **kwargs):
+    search.schedule_update([instance.photo_id])
+
+
+@receiver(post_save, sender=Tag)
+def handle_tag_search_text_changed(sender, instance, **kwargs):
+    search.schedule_update(PhotoTag.objects.filter(tag=instance).values_list("photo_id", flat=True))
+
+
+@receiver(post_save, sender=Album)
+def handle_album_search_text_changed(sender, instance, **kwargs):
+    search.schedule_update(PhotoInAlbum.objects.filter(album=instance).values_list("photo_id", flat=True))
@@ -0,0 +1,200 @@
+"""
+On-demand renditions at arbitrary dimensions.
+
+Renders are made from the smallest existing uncropped PhotoSize that is at
+least as large as the output, falling back to the raw image, and are kept in a
+disk cache bounded by RENDER_CACHE_MAX_BYTES. Cache hits refresh a file's
+modification time, so eviction drops the least recently used renders first.
+Concurrent requests for the same render share one rendering: the first
+request renders and the others wait for its file. Each output format is a
+separate render.
+
+Renders are always upright: the source's EXIF orientation is applied to the
+pixels and its Orientation tag dropped from the output.
+"""
+import hashlib
+import math
+import os
+import tempfile
+from django.conf import settings
+from PIL import ExifTags, Image, ImageOps
+from .formats import ImageFormat, encode_image
+from .locks import singleflight
+from .models import Size
+
+
+RENDER_FITS = ("contain", "cover")
+# EXIF orientations that rotate the image a quarter turn, swapping its axes
+TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+
+
+def _scale(source_width: int, source_height: int, width: int | None, height: int | None, fit: str) -> float:
+    """Scale factor from a source to the requested output, before capping at 1."""
+    scales = [
+        target / source
+        for target, source in ((width, source_width), (height, source_height))
+        if target is not None
+    ]
+    return max(scales) if fit == "cover" and len(scales) == 2 else min(scales)
+
+
+def render_source(photo, width: int | None, height: int | None, fit: str):
+    """
+    The smallest uncropped PhotoSize of `photo` that covers the requested
+    output without upscaling, or None to render from the raw image.
+    """
+    sizes = (
+        photo.sizes.filter(size__square_crop=False, width__isnull=False, height__isnull=False)
+        .select_related("size")
+        .order_by("size__max_dimension")
+    )
+    transposed = None
+    for photo_size in sizes:
+        source_width, source_height = photo_size.width, photo_size.height
+        # Sizes that keep the Orientation tag store the image sideways for these
+        if photo_size.size.metadata != Size.Metadata.STRIP:
+            if transposed is None:
+                transposed = _orientation(photo.raw_image) in TRANSPOSED_ORIENTATIONS
+            if transposed:
+                source_width, source_height = source_height, source_width
+        if _scale(source_width, source_height, width, height, fit) <= 1:
+            return photo_size
+    return None
+
+
+def _orientation(file) -> int:
+    """EXIF orientation of an image file, read from its header."""
+    try:
+        file.open("rb")
+    except (OSError, ValueError):
+        return 1
+    try:
+        with Image.open(file) as image:
+            return image.getexif().get(ExifTags.Base.Orientation, 1)
+    finally:
+        file.close()
+
+
+def render_image(image: Image.Image, width: int | None, height: int | None, fit: str) -> Image.Image:
+    """
+    Scale `image` to fit inside `width` x `height`, or with `cover` to fill it
+    and crop the overflow around the centre. Images are never upscaled.
+    """
+    scale = min(_scale(*image.size, width, height, fit), 1.0)
+    resized_width = max(1, round(image.width * scale))
+    resized_height = max(1, round(image.height * scale))
+    if (resized_width, resized_height) != image.size:
+        image = image.resize((resized_width, resized_height), Image.Resampling.LANCZOS)
+
+    if fit == "cover" and width is not None and height is not None:
+        crop_width, crop_height = min(width, resized_width), min(height, resized_height)
+        left = (resized_width - crop_width) // 2
+        top = (resized_height - crop_height) // 2
+        image = image.crop((left, top, left + crop_width, top + crop_height))
+    return image
+
+
+def render_key(photo, source, width: int | None, height: int | None, fit: str,
+               format: str = ImageFormat.JPEG) -> str:
+    # The source's identity is part of the key, so replaced images get new renders
+    source_id = (source.md5 or source.image.name) if source else photo.raw_image.name
+    raw = f"{photo.uuid}:{source_id}:{width}x{height}:{fit}"
+    if format != ImageFormat.JPEG:
+        raw = f"{raw}:{format}"
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def render_photo(photo, source, width: int | None, height: int | None, fit: str,
+                 format: str = ImageFormat.JPEG) -> bytes:
+    """Render `photo` from `source` (a PhotoSize, or None for the raw image) in `format`."""
+    file = source.image if source else photo.raw_image
+    file.open("rb")
+    try:
+        with Image.open(file) as image:
+            upright_size = image.size
+            if image.getexif().get(ExifTags.Base.Orientation, 1) in TRANSPOSED_ORIENTATIONS:
+                upright_size = upright_size[::-1]
+            # Let JPEG decoding downscale by a power of two when that still covers the output
+            scale = min(_scale(*upright_size, width, height, fit), 1.0)
+            image.draft("RGB", (math.ceil(image.width * scale), math.ceil(image.height * scale)))
+
+            # Also removes the Orientation tag from the image's EXIF block
+            image = ImageOps.exif_transpose(image)
+            output = render_image(image, width, height, fit)
+            return encode_image(output, format, image.info.get("exif"))
+    finally:
+        file.close()
+
+
+def _cache_path(key: str) -> str:
+    # Keys are unique across formats, so every render shares one extension
+    return os.path.join(settings.RENDER_CACHE_DIR, f"{key}.jpg")
+
+
+def _open_cached(key: str):
+    path = _cache_path(key)
+    try:
+        file = open(path, "rb")
+    except FileNotFoundError:
+        return None
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass  # Evicted since it was opened; the open handle still reads it
+    return file
+
+
+def cached_render(key: str, render):
+    """
+    Open the cached render `key`, calling `render()` for its bytes if it isn't
+    cached. Only one caller renders a given key at a time; others wait for its
+    result.
+    """
+    file = singleflight(f"render:{key}", lambda: _open_cached(key), lambda: store_render(key, render()))
+    # A render holding the lock this long is presumably stuck; don't wait on it
+    return file or store_render(key, render())
+
+
+def store_render(key: str, content: bytes):
+    """Write a render to the disk cache, evict to stay under the cap, and open it."""
+    os.makedirs(settings.RENDER_CACHE_DIR, exist_ok=True)
+    # Write then rename, so readers never see a partial file
+    fd, temp_path = tempfile.mkstemp(dir=settings.RENDER_CACHE_DIR, suffix=".tmp")
+    with os.fdopen(fd, "wb") as temp:
+        temp.write(content)
+    os.replace(temp_path, _cache_path(key))
+
+    file = open(_cache_path(key), "rb")
+    evict_renders(keep=key)
+    return file
+
+
+def evict_renders(keep: str = None):
+    """
+    Delete the least recently used renders until the cache fits
+    RENDER_CACHE_MAX_BYTES. The render `keep` is never deleted.
+    """
+    entries = []
+    total = 0
+    with os.scandir(settings.RENDER_CACHE_DIR) as scan:
+        for entry in scan:
+            if not entry.name.endswith(".jpg"):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+
+    keep_path = _cache_path(keep) if keep else None
+    for _, size, path in sorted(entries):
+        if total <= settings.RENDER_CACHE_MAX_BYTES:
+            break
+        if path == keep_path:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
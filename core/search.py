@@ -0,0 +1,113 @@
+"""
+Full-text search over photos.
+
+Every photo has a PhotoSearchDocument with its title, description and
+keywords (tag names, album titles, camera and lens). On Postgres documents are
+matched through a weighted tsvector column with a GIN index; on SQLite through
+an FTS5 table kept in sync with the documents by triggers. Search terms match
+as prefixes on both, so results are the same for partially typed words.
+"""
+import re
+from collections import defaultdict
+from functools import partial
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection, transaction
+from django.db.models import F, FloatField, Value
+from django.db.models.expressions import RawSQL
+from .models import Photo, PhotoInAlbum, PhotoMetadata, PhotoSearchDocument, PhotoTag
+
+
+# Postgres text search configuration. "simple" lowercases without stemming,
+# like FTS5's unicode61 tokenizer.
+SEARCH_CONFIG = "simple"
+FTS_TABLE = "core_photosearch_fts"
+# bm25 weights for the FTS5 columns (title, keywords, body), in line with the
+# A, B and C weights given to them on Postgres
+FTS_WEIGHTS = (10.0, 4.0, 1.0)
+# Document fields a search can be restricted to, and their Postgres weights
+FIELD_WEIGHTS = {"title": "A", "keywords": "B", "body": "C"}
+MAX_SEARCH_TERMS = 16
+
+
+def build_documents(photo_ids) -> dict:
+    """Searchable text for each existing photo in `photo_ids`, keyed by photo id."""
+    keywords = defaultdict(list)
+    for photo_id, name in PhotoTag.objects.filter(photo_id__in=photo_ids).values_list("photo_id", "tag__name"):
+        keywords[photo_id].append(name)
+    for photo_id, title in PhotoInAlbum.objects.filter(photo_id__in=photo_ids).values_list("photo_id", "album__title"):
+        keywords[photo_id].append(title)
+    metadata = PhotoMetadata.objects.filter(photo_id__in=photo_ids).values_list(
+        "photo_id", "camera_make", "camera_model", "lens_model"
+    )
+    for photo_id, *values in metadata:
+        keywords[photo_id].extend(value for value in values if value)
+
+    return {
+        photo_id: PhotoSearchDocument(
+            photo_id=photo_id, title=title, body=description or "", keywords=" ".join(keywords[photo_id])
+        )
+        for photo_id, title, description in Photo.objects.filter(pk__in=photo_ids).values_list("pk", "title", "description")
+    }
+
+
+def update_documents(photo_ids):
+    """Rebuild the search documents of `photo_ids`, dropping those of deleted photos."""
+    photo_ids = set(photo_ids)
+    documents = build_documents(photo_ids)
+    with transaction.atomic():
+        PhotoSearchDocument.objects.filter(photo_id__in=photo_ids).delete()
+        PhotoSearchDocument.objects.bulk_create(documents.values())
+        if connection.vendor == "postgresql":
+            PhotoSearchDocument.objects.filter(photo_id__in=documents).update(vector=document_vector())
+
+
+def schedule_update(photo_ids):
+    """Rebuild the search documents of `photo_ids` once the current transaction commits."""
+    photo_ids = list(photo_ids)
+    if photo_ids:
+        transaction.on_commit(partial(update_documents, photo_ids))
+
+
+def document_vector():
+    return (
+        SearchVector("title", weight="A", config=SEARCH_CONFIG)
+        + SearchVector("keywords", weight="B", config=SEARCH_CONFIG)
+        + SearchVector("body", weight="C", config=SEARCH_CONFIG)
+    )
+
+
+def search_terms(text: str) -> list:
+    return re.findall(r"\w+", text.lower())[:MAX_SEARCH_TERMS]
+
+
+def search_photos(queryset, text: str, field: str = None):
+    """
+    Restrict a photo queryset to photos matching every word in `text`, as a
+    prefix, annotated with `search_rank` (higher is better).
+
+    `field` restricts matching to one document field ("title", "keywords" or
+    "body").
+    """
+    terms = search_terms(text)
+    if not terms:
+        return queryset.annotate(search_rank=Value(0.0, output_field=FloatField())).none()
+
+    if connection.vendor == "postgresql":
+        weight = FIELD_WEIGHTS[field] if field else ""
+        query = SearchQuery(" & ".join(f"{term}:*{weight}" for term in terms), search_type="raw", config=SEARCH_CONFIG)
+        return queryset.filter(search_document__vector=query).annotate(
+            search_rank=SearchRank(F("search_document__vector"), query)
+        )
+
+    column = f"{field} : " if field else ""
+    match = " ".join(f'{column}"{term}"*' for term in terms)
+    weights = ", ".join(str(weight) for weight in FTS_WEIGHTS)
+    matches = RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match])
+    # bm25() is lower for better matches
+    rank = RawSQL(
+        f"SELECT -bm25({FTS_TABLE}, {weights}) FROM {FTS_TABLE} "
+        f"WHERE {FTS_TABLE} MATCH %s AND rowid = {Photo._meta.db_table}.id",
+        [match],
+        output_field=FloatField(),
+    )
+    return queryset.filter(pk__in=matches).annotate(search_rank=rank)
@@ -1,5 +1,6 @@
 import django_tables2 as tables
 from .models import *
+from .formats import ImageFormat
 
 # Include CSS Classes: pagination
 
@@ -35,6 +36,7 @@ class SizeTable(tables.Table):
     comment = tables.Column()
     max_dimension = tables.Column()
     square_crop = tables.BooleanColumn()
+    formats = tables.Column(orderable=False, verbose_name="Extra formats")
 
     edit = tables.TemplateColumn(
         template_name="core/partials/size_table_edit_button.html",
@@ -48,9 +50,12 @@ class SizeTable(tables.Table):
         orderable=False
     )
 
+    def render_formats(self, value):
+        return ", ".join(ImageFormat(format).label for format in value)
+
     class Meta:
         model = Size
-        fields = ("slug", "comment", "max_dimension", "square_crop", "public")
+        fields = ("slug", "comment", "max_dimension", "square_crop", "formats", "public")
 
 
 class AlbumTable(tables.Table):
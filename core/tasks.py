@@ -1,7 +1,6 @@
 from celery import shared_task
 from . import models
-from PIL import Image
-from io import BytesIO
+from PIL import Image, ImageOps
 from django.core.files.base import ContentFile
 import os
 from PIL.ExifTags import TAGS as ExifTags
@@ -9,7 +8,11 @@ from datetime import datetime
 import exiftool
 from . import CONTENT_RESIZED_PHOTOS_PATH
 from django.conf import settings
+from django.db import IntegrityError, transaction
 import hashlib
+from .locks import singleflight, wait_for
+from .formats import EXTENSIONS, ImageFormat, encode_image, reduce_exif
+from .placeholders import placeholder
 
 
 # Metadata tag constants
@@ -35,6 +38,10 @@ METADATA_EXIF_COPYRIGHT = "EXIF:Copyright"
 METADATA_COMPOSITE_LATITUDE = "Composite:GPSLatitude"
 METADATA_COMPOSITE_LONGITUDE = "Composite:GPSLongitude"
 
+# Celery priority of renditions a request is waiting for. On Redis lower values
+# run first, and other tasks get CELERY_TASK_DEFAULT_PRIORITY.
+REQUEST_TASK_PRIORITY = 0
+
 
 def gen_size(photo, size):
     photo.raw_image.open()  # ensure file is ready
@@ -44,6 +51,10 @@ def gen_size(photo, size):
         # Use updated resampling constant
         img.thumbnail((size.max_dimension, size.max_dimension), Image.Resampling.LANCZOS)
 
+        if not photo.blurhash and not size.square_crop:
+            # Computed once per image, from the first uncropped rendition decoded
+            photo.save_placeholder(*placeholder(img))
+
         # Square crop, centered
         if size.square_crop:
             width, height = img.size
@@ -57,20 +68,93 @@ def gen_size(photo, size):
             if min_dim != size.max_dimension:
                 img = img.resize((size.max_dimension, size.max_dimension), Image.Resampling.LANCZOS)
 
-        buffer = BytesIO()
-        if exif_data:
-            img.save(buffer, format='JPEG', exif=exif_data)
-        else:
-            img.save(buffer, format='JPEG')
-
-        photo_size = models.PhotoSize(photo=photo, size=size, height=img.height, width=img.width, md5=hashlib.md5(buffer.getvalue()).hexdigest())
-        photo_size.image.save(
-            f"{photo.id}_{size.slug}.jpg",
-            ContentFile(buffer.getvalue()),
-            save=True
+        if size.metadata == models.Size.Metadata.STRIP:
+            # Without an Orientation tag, viewers need the image upright already
+            img = ImageOps.exif_transpose(img)
+            exif_data = None
+        elif size.metadata == models.Size.Metadata.REDUCE and exif_data:
+            exif_data = reduce_exif(exif_data)
+
+        def encode(format):
+            return encode_image(
+                img, format, exif_data,
+                quality=size.quality, progressive=size.progressive, max_bytes=size.max_bytes,
+            )
+
+        content = encode(ImageFormat.JPEG)
+        photo_size = models.PhotoSize(
+            photo=photo,
+            size=size,
+            height=img.height,
+            width=img.width,
+            md5=hashlib.md5(content).hexdigest(),
+            file_size=len(content),
         )
 
-        return f"Sizes generated for photo id {photo.id}."
+        for format in size.formats:
+            variant = encode(format)
+            name = photo_size.image.field.generate_filename(photo_size, f"{photo.id}_{size.slug}.{EXTENSIONS[format]}")
+            photo_size.variants[format] = {
+                "image": photo_size.image.storage.save(name, ContentFile(variant)),
+                "md5": hashlib.md5(variant).hexdigest(),
+                "file_size": len(variant),
+            }
+
+        try:
+            with transaction.atomic():
+                photo_size.image.save(
+                    f"{photo.id}_{size.slug}.jpg",
+                    ContentFile(content),
+                    save=True
+                )
+        except IntegrityError:
+            # Another worker stored this rendition first; drop the files written here
+            for file in photo_size.files():
+                if file:
+                    file.storage.delete(file.name)
+            return models.PhotoSize.objects.get(photo=photo, size=size)
+
+        return photo_size
+
+
+def gen_size_once(photo, size, wait: float = 0):
+    """
+    Generate `size` for `photo` unless it already exists, sharing the work with
+    any concurrent caller. Returns the PhotoSize, or None if another caller is
+    still generating it after `wait` seconds.
+    """
+    return singleflight(
+        f"photo_size:{photo.id}:{size.id}",
+        lambda: models.PhotoSize.objects.filter(photo=photo, size=size).first(),
+        lambda: gen_size(photo, size),
+        wait=wait,
+    )
+
+
+def request_photo_size(photo, size):
+    """
+    Get a missing rendition that a request is waiting for.
+
+    Raw images of up to PHOTO_SIZE_SYNC_MAX_PIXELS are rendered in the request,
+    which bounds its memory and time, as long as the size needs a single
+    encode. Sizes with extra formats or a byte budget take several encodes
+    each, so they are queued ahead of background work like larger images.
+    Either way the request waits at most PHOTO_SIZE_REQUEST_WAIT seconds for a
+    render in progress elsewhere, and gets None if the rendition isn't ready
+    by then.
+    """
+    with photo.raw_image.open("rb") as raw, Image.open(raw) as img:
+        pixels = img.width * img.height
+
+    single_encode = not size.formats and size.max_bytes is None
+    if single_encode and pixels <= settings.PHOTO_SIZE_SYNC_MAX_PIXELS:
+        return gen_size_once(photo, size, wait=settings.PHOTO_SIZE_REQUEST_WAIT)
+
+    generate_photo_size.apply_async((photo.id, size.id), priority=REQUEST_TASK_PRIORITY)
+    return wait_for(
+        lambda: models.PhotoSize.objects.filter(photo=photo, size=size).first(),
+        settings.PHOTO_SIZE_REQUEST_WAIT,
+    )
 
 
 # Function parse_exif_date. Returns datetime object or None
@@ -94,13 +178,48 @@ def generate_sizes_for_photo(photo_id):
             continue  # Skip if already exists
 
         try:
-            gen_size(photo, size)
+            gen_size_once(photo, size)
         except FileNotFoundError:
             return f"Raw image file for photo id {photo.id} not found."
     
     return f"Sizes generated for photo id {photo.id}."
 
 
+@shared_task
+def generate_photo_size(photo_id, size_id):
+    try:
+        photo = models.Photo.objects.get(id=photo_id)
+        size = models.Size.objects.get(id=size_id)
+    except (models.Photo.DoesNotExist, models.Size.DoesNotExist):
+        return f"Photo {photo_id} or size {size_id} does not exist."
+
+    try:
+        gen_size_once(photo, size)
+    except FileNotFoundError:
+        return f"Raw image file for photo id {photo.id} not found."
+
+    return f"Size {size.slug} generated for photo id {photo.id}."
+
+
+@shared_task
+def generate_photo_placeholder(photo_id):
+    """Compute a photo's placeholders from its smallest uncropped rendition."""
+    photo_size = (
+        models.PhotoSize.objects.filter(photo_id=photo_id, size__square_crop=False)
+        .select_related("photo").order_by("size__max_dimension").first()
+    )
+    if photo_size is None:
+        return f"Photo {photo_id} has no rendition to compute placeholders from."
+
+    try:
+        with photo_size.image.open("rb") as file, Image.open(file) as img:
+            photo_size.photo.save_placeholder(*placeholder(img))
+    except FileNotFoundError:
+        return f"Rendition file for photo id {photo_id} not found."
+
+    return f"Placeholders generated for photo id {photo_id}."
+
+
 @shared_task
 def generate_photo_sizes_for_size(size_id):
     try:
@@ -218,11 +337,12 @@ def photo_replace_image(photo_id, old_image_path):
     photo_sizes = models.PhotoSize.objects.filter(photo=photo)
     deleted_count = 0
     for photo_size in photo_sizes:
-        if photo_size.image:
-            try:
-                os.remove(photo_size.image.path)
-            except (FileNotFoundError, ValueError):
-                pass
+        for file in photo_size.files():
+            if file:
+                try:
+                    os.remove(file.path)
+                except (FileNotFoundError, ValueError):
+                    pass
         photo_size.delete()
         deleted_count += 1
     
@@ -238,6 +358,9 @@ def photo_replace_image(photo_id, old_image_path):
         photo.metadata.delete()
     except models.PhotoMetadata.DoesNotExist:
         pass
+
+    # Placeholders are recomputed with the new sizes
+    photo.save_placeholder(None, None)
     
     # Regenerate everything (called directly, not as delayed task)
     post_photo_create(photo_id)
@@ -271,13 +394,16 @@ def consistency():
     # 1. Ensure every photo size's image file exists
     photo_sizes = models.PhotoSize.objects.all()
     for photo_size in photo_sizes:
-        if (not photo_size.image
-            or not os.path.isfile(photo_size.image.path)
+        if (not all(file and os.path.isfile(file.path) for file in photo_size.files())
             or not photo_size.height
             or not photo_size.width
             or not photo_size.md5):
             issues += 1
             photo_size.delete()
+        elif photo_size.file_size is None:
+            # Fill in byte counts for renditions created before they were tracked
+            issues += 1
+            models.PhotoSize.objects.filter(pk=photo_size.pk).update(file_size=os.path.getsize(photo_size.image.path))
 
     # Photo Objects
     photos = models.Photo.objects.all()
@@ -294,9 +420,14 @@ def consistency():
             issues += 1
             generate_sizes_for_photo.delay(photo.id)
 
+        # 4. Ensure every photo with an uncropped size has placeholders
+        if not photo.blurhash and photo_sizes.filter(size__square_crop=False).exists():
+            issues += 1
+            generate_photo_placeholder.delay(photo.id)
+
     # Filesystem
     # 1. Delete stray resized photos
-    resized_photos = models.PhotoSize.objects.values_list('image', flat=True)
+    resized_photos = set(models.rendition_files(models.PhotoSize.objects.all()))
     delete_files_list = []
     for disk_file in os.listdir(resized_photos_dir):
         rel_path = os.path.join(CONTENT_RESIZED_PHOTOS_PATH, disk_file)
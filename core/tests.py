@@ -1,8 +1,8 @@
 from unittest import mock, skipIf
 from django.test import TestCase
-from django.core.exceptions import ValidationError
+from django.core.exceptions import ImproperlyConfigured, ValidationError
 from .models import *
-from .views import TagUpdateView
+from .views import TagUpdateView, PhotoCalendarView
 from django.core.exceptions import ObjectDoesNotExist
 from django.urls import reverse
 from django.db.migrations.executor import MigrationExecutor
@@ -10,6 +10,28 @@ from django.db import connection
 from django.apps import apps
 from django.conf import settings
 from .filters import PhotoFilter
+from . import geo
+from .search import search_photos, update_documents
+from .timeline import timeline
+from .rendering import cached_render, evict_renders, render_image, render_photo, render_source, store_render
+from .locks import lock_name, redis_client, singleflight
+from . import tasks
+from . import formats
+from . import placeholders
+from PIL import ExifTags, ImageOps
+from django.core.files.uploadedfile import SimpleUploadedFile
+import hashlib
+import io
+from django.core.cache import cache
+from PIL import Image
+import os
+import tempfile
+import threading
+import time
+from .attributes import filter_attribute, attribute_index, parse_attribute_value, sync_attribute_indexes
+from django.test import TransactionTestCase, override_settings
+from django.test import RequestFactory
+import datetime
 
 
 class PhotoModelTests(TestCase):
@@ -487,6 +509,95 @@ class AlbumTests(TestCase):
         self.assertEqual(ordered[1], photo2)
         self.assertEqual(ordered[2], photo3)
     
+    def test_album_path_maintained(self):
+        root = Album.objects.create(title="Path Root")
+        child = Album.objects.create(title="Path Child", parent=root)
+        grandchild = Album.objects.create(title="Path Grandchild", parent=child)
+        other = Album.objects.create(title="Path Other")
+
+        self.assertEqual(root.path, f"/{root.pk}/")
+        self.assertEqual(Album.objects.get(pk=grandchild.pk).path, f"/{root.pk}/{child.pk}/{grandchild.pk}/")
+        self.assertCountEqual(root.get_descendants(), [root, child, grandchild])
+        self.assertCountEqual(root.get_descendants(include_self=False), [child, grandchild])
+
+        # Moving a subtree re-roots every descendant
+        child.parent = other
+        child.save()
+        self.assertEqual(Album.objects.get(pk=grandchild.pk).path, f"/{other.pk}/{child.pk}/{grandchild.pk}/")
+        self.assertCountEqual(root.get_descendants(), [root])
+
+        # Detaching makes the subtree a root
+        child.parent = None
+        child.save(update_fields=["parent"])
+        self.assertEqual(Album.objects.get(pk=child.pk).path, f"/{child.pk}/")
+        self.assertEqual(Album.objects.get(pk=grandchild.pk).path, f"/{child.pk}/{grandchild.pk}/")
+
+    def test_album_delete_reroots_children(self):
+        root = Album.objects.create(title="Delete Root")
+        middle = Album.objects.create(title="Delete Middle", parent=root)
+        child = Album.objects.create(title="Delete Child", parent=middle)
+        grandchild = Album.objects.create(title="Delete Grandchild", parent=child)
+
+        middle.delete()
+        child.refresh_from_db()
+        grandchild.refresh_from_db()
+        self.assertIsNone(child.parent)
+        self.assertEqual(child.path, f"/{child.pk}/")
+        self.assertEqual(grandchild.path, f"/{child.pk}/{grandchild.pk}/")
+        self.assertCountEqual(root.get_descendants(), [root])
+
+    def test_unsaved_album_has_no_descendants(self):
+        Album.objects.create(title="Saved Album")
+        self.assertFalse(Album(title="Unsaved Album").get_descendants().exists())
+
+    def test_cycle_check_single_query(self):
+        root = Album.objects.create(title="Cycle Root")
+        albums = [root]
+        for depth in range(5):
+            albums.append(Album.objects.create(title=f"Cycle {depth}", parent=albums[-1]))
+
+        root.parent = albums[-1]
+        # Slug uniqueness, then the cycle check, regardless of depth
+        with self.assertNumQueries(2):
+            with self.assertRaises(ValidationError):
+                Album.clean(root)
+
+        root.parent = None
+        albums[-1].parent = root
+        Album.clean(albums[-1])
+
+        root.parent = root
+        with self.assertRaises(ValidationError):
+            Album.clean(root)
+
+    def test_get_ordered_photos_random_seeded(self):
+        photos = [Photo.objects.create(title=f"R{i}", raw_image=f"r{i}.jpg") for i in range(20)]
+        for order, photo in enumerate(photos):
+            PhotoInAlbum.objects.create(album=self.album, photo=photo, order=order)
+        self.album.sort_method = Album.AlbumSortMethod.RANDOM
+
+        first = list(self.album.get_ordered_photos(seed=42))
+        self.assertEqual(first, list(self.album.get_ordered_photos(seed=42)))
+        self.assertCountEqual(first, photos)
+        self.assertNotEqual(first, photos)
+        self.assertNotEqual(first, list(self.album.get_ordered_photos(seed=43)))
+
+        # A seeded order can be paged
+        page_one = list(self.album.get_ordered_photos(seed=42)[:10])
+        page_two = list(self.album.get_ordered_photos(seed=42)[10:])
+        self.assertEqual(page_one + page_two, first)
+
+    def test_get_ordered_photos_random_recursive(self):
+        child = Album.objects.create(title="Random Child", parent=self.album)
+        photos = [Photo.objects.create(title=f"RR{i}", raw_image=f"rr{i}.jpg") for i in range(6)]
+        for order, photo in enumerate(photos):
+            PhotoInAlbum.objects.create(album=self.album if order % 2 else child, photo=photo, order=order)
+        self.album.sort_method = Album.AlbumSortMethod.RANDOM
+
+        ordered = list(self.album.get_ordered_photos(recursive=True, seed=7))
+        self.assertCountEqual(ordered, photos)
+        self.assertEqual(ordered, list(self.album.get_ordered_photos(recursive=True, seed=7)))
+
     def test_album_parents(self):
         parent = Album.objects.create(title="Parent", description="Parent album")
         child = Album.objects.create(title="Child", description="Child album", parent=parent)
@@ -612,6 +723,62 @@ class AlbumTests(TestCase):
             self.assertNotIn(photo, unrelated_recursive)
 
 
+class AlbumNeighborTests(TestCase):
+    def setUp(self):
+        self.album = Album.objects.create(title="Neighbors")
+        self.child = Album.objects.create(title="Neighbors Child", parent=self.album)
+        base = timezone.now() - timezone.timedelta(days=30)
+        # Two photos share a publish date and two have no capture date, so ties
+        # and missing keys are both exercised
+        publish_offsets = [3, 1, 1, 7, 5]
+        capture_offsets = [2, None, 9, None, 4]
+        self.photos = []
+        for index, (publish, capture) in enumerate(zip(publish_offsets, capture_offsets)):
+            photo = Photo.objects.create(
+                title=f"N{index}", raw_image=f"n{index}.jpg", publish_date=base + timezone.timedelta(days=publish)
+            )
+            if capture is not None:
+                PhotoMetadata.objects.create(photo=photo, capture_date=base + timezone.timedelta(days=capture))
+            self.photos.append(photo)
+        for order, photo in enumerate(self.photos[:4]):
+            PhotoInAlbum.objects.create(album=self.album, photo=photo, order=4 - order)
+        PhotoInAlbum.objects.create(album=self.child, photo=self.photos[4], order=1)
+
+    def assertNeighborsMatchOrder(self, **options):
+        ordered = list(self.album.get_ordered_photos(**options))
+        for position, photo in enumerate(ordered):
+            previous, following = self.album.get_neighbors(photo, **options)
+            self.assertEqual(previous, ordered[position - 1] if position > 0 else None)
+            self.assertEqual(following, ordered[position + 1] if position + 1 < len(ordered) else None)
+
+    def test_neighbors_follow_every_order(self):
+        for sort_method in Album.AlbumSortMethod:
+            for sort_descending in (False, True):
+                for recursive in (False, True):
+                    with self.subTest(sort_method=sort_method, sort_descending=sort_descending, recursive=recursive):
+                        self.assertNeighborsMatchOrder(
+                            sort_method=sort_method, sort_descending=sort_descending, recursive=recursive, seed=7
+                        )
+
+    def test_missing_sort_keys_sort_last(self):
+        ordered = list(self.album.get_ordered_photos(sort_method=Album.AlbumSortMethod.CREATED, sort_descending=False))
+        self.assertEqual(ordered[-2:], [self.photos[1], self.photos[3]])
+        ordered = list(self.album.get_ordered_photos(sort_method=Album.AlbumSortMethod.CREATED, sort_descending=True))
+        self.assertEqual(ordered[-2:], [self.photos[3], self.photos[1]])
+
+    def test_photo_outside_album(self):
+        with self.assertRaises(Photo.DoesNotExist):
+            self.album.get_neighbors(self.photos[4])
+        previous, following = self.album.get_neighbors(
+            self.photos[4], recursive=True, sort_method=Album.AlbumSortMethod.PUBLISHED, sort_descending=False
+        )
+        self.assertEqual((previous, following), (self.photos[0], self.photos[3]))
+
+    def test_neighbors_use_two_keyset_queries(self):
+        with self.assertNumQueries(3):
+            self.album.get_neighbors(self.photos[0], sort_method=Album.AlbumSortMethod.PUBLISHED)
+
+
 class AlbumSlugTests(TestCase):
     def test_album_created_without_slug(self):
         # Create an album without specifying a slug
@@ -922,6 +1089,29 @@ class TestMigration0003(TestMigrations):
         self.assertEqual(len(uuids), len(self.sizes))
 
 
+class TestMigration0008(TestMigrations):
+    migrate_from = "0007_photosize_file_size"
+    migrate_to = "0008_album_path"
+
+    def setUpBeforeMigration(self, apps):
+        AlbumOld = apps.get_model("core", "Album")
+        self.root = AlbumOld.objects.create(title="Root", slug="root")
+        self.child = AlbumOld.objects.create(title="Child", slug="child", parent=self.root)
+        self.grandchild = AlbumOld.objects.create(title="Grandchild", slug="grandchild", parent=self.child)
+
+    @skipIf(
+        getattr(settings, "DB_ENGINE", None) == "sqlite",
+        "Skipping test because DB_ENGINE is sqlite."
+    )
+    def test_album_paths_populated(self):
+        AlbumNew = self.apps.get_model("core", "Album")
+        self.assertEqual(AlbumNew.objects.get(pk=self.root.pk).path, f"/{self.root.pk}/")
+        self.assertEqual(
+            AlbumNew.objects.get(pk=self.grandchild.pk).path,
+            f"/{self.root.pk}/{self.child.pk}/{self.grandchild.pk}/",
+        )
+
+
 class PhotoLocationTests(TestCase):
     def test_new_photo_with_location_defined(self):
         photo = Photo.objects.create(
@@ -975,7 +1165,772 @@ class PhotoLocationTests(TestCase):
 
         self.assertEqual(photo.latitude, 3.3)
         self.assertEqual(photo.longitude, 4.4)
-    
+
+
+class GeoCellTests(TestCase):
+    def test_cell_id_orders_by_containing_cell(self):
+        # Points in the same quadrant share the top bits of their id
+        quadrant = 1 << (2 * geo.CELL_BITS - 2)
+        self.assertEqual(geo.cell_id(10, 10) // quadrant, geo.cell_id(80, 170) // quadrant)
+        self.assertNotEqual(geo.cell_id(10, 10) // quadrant, geo.cell_id(-10, 10) // quadrant)
+        self.assertEqual(geo.cell_id(-90, -180), 0)
+        self.assertEqual(geo.cell_id(90, 180), (1 << (2 * geo.CELL_BITS)) - 1)
+
+    def test_cell_ranges_cover_box(self):
+        ranges = geo.cell_ranges(40, -75, 41, -73)
+        self.assertLessEqual(len(ranges), geo.MAX_COVERING_CELLS)
+        for lat, lon in [(40, -75), (41, -73), (40.5, -74), (40.7128, -74.006)]:
+            cell = geo.cell_id(lat, lon)
+            self.assertTrue(any(low <= cell <= high for low, high in ranges))
+        cell = geo.cell_id(51.5, -0.12)
+        self.assertFalse(any(low <= cell <= high for low, high in ranges))
+
+    def test_cell_ranges_across_antimeridian(self):
+        ranges = geo.cell_ranges(-20, 179, -15, -179)
+        for lon in (179.5, -179.5):
+            cell = geo.cell_id(-17, lon)
+            self.assertTrue(any(low <= cell <= high for low, high in ranges))
+        cell = geo.cell_id(-17, 0)
+        self.assertFalse(any(low <= cell <= high for low, high in ranges))
+
+    def test_radius_bounds(self):
+        south, west, north, east = geo.radius_bounds(0, 0, geo.KM_PER_DEGREE)
+        self.assertAlmostEqual(south, -1)
+        self.assertAlmostEqual(north, 1)
+        # Longitude bounds are widened for the box's furthest latitude
+        self.assertAlmostEqual(west, -1, places=3)
+        self.assertAlmostEqual(east, 1, places=3)
+
+        south, west, north, east = geo.radius_bounds(0, 179.5, geo.KM_PER_DEGREE)
+        self.assertGreater(west, east)
+        self.assertAlmostEqual(east, -179.5, places=3)
+
+        self.assertEqual(geo.radius_bounds(89.9, 0, 100)[1:4:2], (-180.0, 180.0))
+
+    def test_tiles_within(self):
+        self.assertEqual(geo.tiles_within(-90, -180, 90, 180, 0, 1), [0])
+        self.assertEqual(len(geo.tiles_within(-90, -180, 90, 180, 2, 16)), 16)
+        # Across the antimeridian: the easternmost and westernmost columns
+        tiles = geo.tiles_within(-10, 170, 10, -170, 3, 16)
+        self.assertEqual(len(tiles), 4)
+        (low, high), = geo.tile_ranges(geo.tiles_within(-90, -180, 90, 180, 2, 16), 2)
+        self.assertEqual((low, high), (0, (1 << (2 * geo.CELL_BITS)) - 1))
+        with self.assertRaises(ValueError):
+            geo.tiles_within(-90, -180, 90, 180, 3, 16)
+
+    def test_distance_km(self):
+        photo = Photo.objects.create(title="Distance", raw_image="raw.jpg", latitude=40.7128, longitude=-74.0060)
+        distance = Photo.objects.annotate(d=geo.distance_km(51.5074, -0.1278)).get(pk=photo.pk).d
+        self.assertAlmostEqual(distance, 5570, delta=10)
+
+    def test_geocell_maintained_on_save(self):
+        photo = Photo.objects.create(title="Cell", raw_image="raw.jpg", latitude=12.34, longitude=56.78)
+        self.assertEqual(photo.geocell, geo.cell_id(12.34, 56.78))
+
+        photo.latitude = 1.0
+        photo.save(update_fields=["latitude"])
+        photo.refresh_from_db()
+        self.assertEqual(photo.geocell, geo.cell_id(1.0, 56.78))
+
+        photo.hide_location = True
+        photo.save(update_fields=["hide_location"])
+        photo.refresh_from_db()
+        self.assertIsNone(photo.geocell)
+
+    def test_geocell_null_without_location(self):
+        photo = Photo.objects.create(title="NoCell", raw_image="raw.jpg")
+        self.assertIsNone(photo.geocell)
+
+
+class PhotoSearchTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.mountain = Photo.objects.create(
+                title="Mountain Sunset", raw_image="mountain.jpg", description="Alpenglow over the ridge"
+            )
+            PhotoMetadata.objects.create(photo=self.mountain, camera_make="Canon", lens_model="EF 24-70mm")
+            self.harbor = Photo.objects.create(
+                title="Harbor", raw_image="harbor.jpg", description="Boats at sunset in the bay"
+            )
+            self.tag = Tag.objects.create(name="coast")
+            PhotoTag.objects.create(photo=self.harbor, tag=self.tag)
+            self.album = Album.objects.create(title="Travels")
+            self.harbor.assign_albums([self.album])
+            # Ranking needs terms to be rare across the collection
+            for index in range(4):
+                Photo.objects.create(title=f"Other {index}", raw_image=f"other{index}.jpg")
+
+    def matches(self, text):
+        return list(search_photos(Photo.objects.all(), text).order_by("-search_rank").values_list("title", flat=True))
+
+    def test_document_built_from_related_text(self):
+        document = PhotoSearchDocument.objects.get(photo=self.harbor)
+        self.assertEqual(document.title, "Harbor")
+        self.assertEqual(document.body, "Boats at sunset in the bay")
+        self.assertCountEqual(document.keywords.split(), ["coast", "Travels"])
+        self.assertEqual(PhotoSearchDocument.objects.get(photo=self.mountain).keywords, "Canon EF 24-70mm")
+
+    def test_title_matches_rank_first(self):
+        self.assertEqual(self.matches("sunset"), ["Mountain Sunset", "Harbor"])
+
+    def test_every_term_matches_as_prefix(self):
+        self.assertEqual(self.matches("sun boat"), ["Harbor"])
+        self.assertEqual(self.matches("CANON ef"), ["Mountain Sunset"])
+        self.assertEqual(self.matches("alpen"), ["Mountain Sunset"])
+        self.assertEqual(self.matches("sunset volcano"), [])
+
+    def test_empty_search_matches_nothing(self):
+        self.assertEqual(self.matches(" ;; "), [])
+
+    def test_search_text_is_quoted(self):
+        self.assertEqual(self.matches('harbor" OR "mountain'), [])
+
+    def test_documents_follow_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.mountain.title = "Glacier"
+            self.mountain.save()
+        self.assertEqual(self.matches("glacier"), ["Glacier"])
+        self.assertEqual(self.matches("mountain"), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag.name = "seaside"
+            self.tag.save()
+            self.album.title = "Holidays"
+            self.album.save()
+        self.assertEqual(self.matches("seaside holidays"), ["Harbor"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.harbor.assign_albums([])
+        self.assertEqual(self.matches("holidays"), [])
+
+    def test_unrelated_updates_skip_rebuild(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.mountain.hidden = True
+            self.mountain.save(update_fields=["hidden"])
+        self.assertFalse(any(getattr(callback, "func", None) is update_documents for callback in callbacks))
+
+    def test_document_removed_with_photo(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.harbor.delete()
+        self.assertFalse(PhotoSearchDocument.objects.filter(photo_id=self.harbor.pk).exists())
+        self.assertEqual(self.matches("harbor"), [])
+
+    def test_search_restricted_to_field(self):
+        self.assertEqual(
+            list(search_photos(Photo.objects.all(), "sunset", field="title").values_list("title", flat=True)),
+            ["Mountain Sunset"],
+        )
+        self.assertEqual(
+            list(search_photos(Photo.objects.all(), "canon", field="keywords").values_list("title", flat=True)),
+            ["Mountain Sunset"],
+        )
+        self.assertFalse(search_photos(Photo.objects.all(), "canon", field="body").exists())
+
+    def test_filter_uses_search(self):
+        filterset = PhotoFilter(data={"search": "sunset"}, queryset=Photo.objects.all())
+        self.assertEqual([photo.title for photo in filterset.qs], ["Mountain Sunset", "Harbor"])
+
+
+class TimelineTests(TestCase):
+    def setUp(self):
+        dates = [(2023, 12, 31), (2024, 1, 5), (2024, 1, 5), (2024, 1, 20), (2024, 3, 1)]
+        self.photos = []
+        for index, (year, month, day) in enumerate(dates):
+            photo = Photo.objects.create(
+                title=f"Timeline {index}",
+                raw_image=f"timeline{index}.jpg",
+                publish_date=timezone.datetime(year, month, day, 12, index, tzinfo=timezone.UTC),
+            )
+            self.photos.append(photo)
+        # Only the first photo has a capture date
+        PhotoMetadata.objects.create(photo=self.photos[0], capture_date=timezone.datetime(2020, 7, 1, tzinfo=timezone.UTC))
+
+    def test_counts_per_bucket(self):
+        self.assertEqual(timeline(Photo.objects.all(), "publish_date", "year"), [
+            {"date": datetime.date(2023, 1, 1), "count": 1},
+            {"date": datetime.date(2024, 1, 1), "count": 4},
+        ])
+        self.assertEqual(
+            [(bucket["date"].month, bucket["count"]) for bucket in timeline(Photo.objects.all(), "publish_date", "month")],
+            [(12, 1), (1, 3), (3, 1)],
+        )
+
+    def test_capture_date(self):
+        self.assertEqual(timeline(Photo.objects.all(), "capture_date", "day"), [
+            {"date": datetime.date(2020, 7, 1), "count": 1},
+        ])
+
+    def test_first_photos_per_bucket(self):
+        buckets = timeline(Photo.objects.all(), "publish_date", "month", photos_per_bucket=2, photo_fields=("pk",))
+        self.assertEqual([bucket["photos"] for bucket in buckets], [
+            [{"pk": self.photos[0].pk}],
+            [{"pk": self.photos[1].pk}, {"pk": self.photos[2].pk}],
+            [{"pk": self.photos[4].pk}],
+        ])
+        self.assertEqual(buckets[1]["count"], 3)
+
+    def test_calendar_view_uses_day_buckets(self):
+        view = PhotoCalendarView()
+        view.PHOTOS_PER_DAY = 1
+        view.request = RequestFactory().get("/photos/calendar/", {"year": 2024, "month": 1})
+        context = view.get_context_data()
+
+        days = {day["date"]: day for week in context["weeks"] for day in week}
+        day = days[datetime.date(2024, 1, 5)]
+        self.assertEqual([photo["title"] for photo in day["photos"]], ["Timeline 1"])
+        self.assertEqual(day["more"], 1)
+        self.assertEqual(days[datetime.date(2024, 1, 6)]["photos"], [])
+        self.assertEqual(context["years"], [2023, 2024])
+
+
+class CustomAttributeTests(TestCase):
+    def setUp(self):
+        attributes = [
+            {"featured": True, "rank": 1}, {"featured": False, "rank": 2}, {"featured": "true", "rank": "1"},
+            {"featured": None}, {},
+            {"rank": 3.0, "series": ["coast", "winter"]}, {"rank": 3.5, "series": ["coast"]},
+        ]
+        self.photos = [
+            Photo.objects.create(title=f"Attributes {index}", raw_image=f"attributes{index}.jpg", custom_attributes=value)
+            for index, value in enumerate(attributes)
+        ]
+
+    def matching(self, key, *values):
+        return set(filter_attribute(Photo.objects.all(), key, values).values_list("title", flat=True))
+
+    def test_parse_value(self):
+        self.assertIs(parse_attribute_value("true"), True)
+        self.assertEqual(parse_attribute_value("42"), 42)
+        self.assertIsNone(parse_attribute_value("null"))
+        self.assertEqual(parse_attribute_value('"42"'), "42")
+        self.assertEqual(parse_attribute_value("landscapes"), "landscapes")
+
+    def assertMatchesJSONValues(self):
+        self.assertEqual(self.matching("featured", True), {"Attributes 0"})
+        self.assertEqual(self.matching("featured", "true"), {"Attributes 2"})
+        self.assertEqual(self.matching("featured", None), {"Attributes 3"})
+        self.assertEqual(self.matching("rank", 1), {"Attributes 0"})
+        self.assertEqual(self.matching("rank", 1, 2), {"Attributes 0", "Attributes 1"})
+        self.assertEqual(self.matching("missing", True), set())
+        # Numbers compare by value, and lists and objects as a whole
+        self.assertEqual(self.matching("rank", 3), {"Attributes 5"})
+        self.assertEqual(self.matching("rank", 3.5), {"Attributes 6"})
+        self.assertEqual(self.matching("series", ["coast"]), {"Attributes 6"})
+        self.assertEqual(self.matching("series", ["coast", "winter"]), {"Attributes 5"})
+
+    def test_filter_matches_json_values(self):
+        self.assertMatchesJSONValues()
+
+    def test_indexed_keys_match_the_same(self):
+        with override_settings(INDEXED_CUSTOM_ATTRIBUTES=["featured", "rank", "missing"]):
+            self.assertMatchesJSONValues()
+
+    def test_invalid_indexed_key(self):
+        with override_settings(INDEXED_CUSTOM_ATTRIBUTES=["it's"]):
+            with self.assertRaises(ImproperlyConfigured):
+                sync_attribute_indexes()
+
+
+class CustomAttributeIndexTests(TransactionTestCase):
+    # Schema changes can't run inside TestCase's transaction on SQLite
+
+    def tearDown(self):
+        sync_attribute_indexes()
+
+    def index_names(self, model):
+        with connection.cursor() as cursor:
+            return set(connection.introspection.get_constraints(cursor, model._meta.db_table))
+
+    def test_sync_indexes(self):
+        featured = attribute_index(Photo, "featured").name
+        series = attribute_index(Album, "series").name
+        with override_settings(INDEXED_CUSTOM_ATTRIBUTES=["featured", "series"]):
+            sync_attribute_indexes()
+        self.assertIn(featured, self.index_names(Photo))
+        self.assertIn(series, self.index_names(Album))
+
+        with override_settings(INDEXED_CUSTOM_ATTRIBUTES=["featured"]):
+            sync_attribute_indexes()
+        self.assertIn(featured, self.index_names(Photo))
+        self.assertNotIn(series, self.index_names(Album))
+
+    def test_indexed_key_uses_index(self):
+        with override_settings(INDEXED_CUSTOM_ATTRIBUTES=["featured"]):
+            sync_attribute_indexes()
+            plan = filter_attribute(Photo.objects.all(), "featured", [True]).explain()
+        self.assertIn(attribute_index(Photo, "featured").name, plan)
+
+
+class RenderingTests(TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.settings = override_settings(RENDER_CACHE_DIR=self.cache_dir.name, RENDER_CACHE_MAX_BYTES=250)
+        self.settings.enable()
+
+    def tearDown(self):
+        self.settings.disable()
+        self.cache_dir.cleanup()
+
+    def test_render_image_dimensions(self):
+        image = Image.new("RGB", (400, 200))
+        self.assertEqual(render_image(image, 100, 100, "contain").size, (100, 50))
+        self.assertEqual(render_image(image, 100, 100, "cover").size, (100, 100))
+        self.assertEqual(render_image(image, None, 50, "cover").size, (100, 50))
+        self.assertEqual(render_image(image, 800, None, "contain").size, (400, 200))
+        self.assertEqual(render_image(image, 800, 100, "cover").size, (400, 100))
+
+    def test_render_source_is_smallest_covering_size(self):
+        photo = Photo.objects.create(title="Render Source", raw_image="render-source.jpg")
+        for slug, dimension, square in (("small", 200, False), ("square", 600, True), ("large", 800, False)):
+            size = Size.objects.create(slug=f"render_{slug}", max_dimension=dimension, square_crop=square)
+            width, height = (dimension, dimension) if square else (dimension, dimension // 2)
+            PhotoSize.objects.create(photo=photo, size=size, image=f"render-{slug}.jpg", width=width, height=height)
+
+        self.assertEqual(render_source(photo, 150, None, "contain").size.slug, "render_small")
+        # Fitting in 400x80 only needs 160 pixels of width
+        self.assertEqual(render_source(photo, 400, 80, "contain").size.slug, "render_small")
+        # Square crops never serve as a source
+        self.assertEqual(render_source(photo, 500, None, "contain").size.slug, "render_large")
+        self.assertEqual(render_source(photo, 400, 300, "cover").size.slug, "render_large")
+        self.assertIsNone(render_source(photo, 1000, None, "contain"))
+
+    def sideways_photo(self):
+        # Stored 100x200 with a quarter turn, so 200x100 upright
+        exif = Image.Exif()
+        exif[ExifTags.Base.Orientation] = 6
+        exif[ExifTags.Base.Copyright] = "Photographer"
+        file = io.BytesIO()
+        Image.new("RGB", (100, 200), color="green").save(file, "JPEG", exif=exif.tobytes())
+        return Photo.objects.create(
+            title="Sideways", raw_image=SimpleUploadedFile("sideways.jpg", file.getvalue(), content_type="image/jpeg")
+        )
+
+    def test_render_photo_is_upright(self):
+        photo = self.sideways_photo()
+        for width, height, fit, expected in ((100, None, "contain", (100, 50)), (50, 50, "cover", (50, 50)),
+                                             (None, 100, "contain", (200, 100))):
+            with self.subTest(width=width, height=height, fit=fit):
+                image = Image.open(io.BytesIO(render_photo(photo, None, width, height, fit)))
+                self.assertEqual(image.size, expected)
+                self.assertNotIn(ExifTags.Base.Orientation, image.getexif())
+                self.assertEqual(image.getexif()[ExifTags.Base.Copyright], "Photographer")
+
+    def test_render_source_compares_upright_dimensions(self):
+        photo = self.sideways_photo()
+        keep = Size.objects.create(slug="render_keep", max_dimension=160)
+        strip = Size.objects.create(slug="render_strip", max_dimension=180, metadata=Size.Metadata.STRIP)
+        # Sizes that keep the Orientation tag are stored sideways, stripped ones upright
+        PhotoSize.objects.create(photo=photo, size=keep, image="render-keep.jpg", width=80, height=160)
+        PhotoSize.objects.create(photo=photo, size=strip, image="render-strip.jpg", width=180, height=90)
+
+        self.assertEqual(render_source(photo, 160, None, "contain").size, keep)
+        self.assertEqual(render_source(photo, None, 90, "contain").size, strip)
+        self.assertEqual(render_source(photo, 170, None, "contain").size, strip)
+        self.assertIsNone(render_source(photo, None, 120, "contain"))
+
+    def test_cached_render(self):
+        render = mock.Mock(return_value=b"rendered")
+        for _ in range(2):
+            with cached_render("cached", render) as file:
+                self.assertEqual(file.read(), b"rendered")
+        render.assert_called_once()
+
+    def test_concurrent_renders_are_merged(self):
+        calls = []
+
+        def slow_render():
+            calls.append(1)
+            time.sleep(0.2)
+            return b"merged"
+
+        results = []
+
+        def request():
+            with cached_render("merged", slow_render) as file:
+                results.append(file.read())
+
+        threads = [threading.Thread(target=request) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [b"merged"] * 4)
+        self.assertEqual(len(calls), 1)
+
+    def test_waits_for_render_in_progress(self):
+        lock = lock_name("render:inflight")
+        cache.add(lock, 1)
+        self.addCleanup(cache.delete, lock)
+        render = mock.Mock(return_value=b"mine")
+
+        def finish_other_render(seconds):
+            store_render("inflight", b"theirs").close()
+
+        with mock.patch("core.locks.time.sleep", side_effect=finish_other_render):
+            with cached_render("inflight", render) as file:
+                self.assertEqual(file.read(), b"theirs")
+        render.assert_not_called()
+
+    def test_evicts_least_recently_used(self):
+        for index, key in enumerate(("a", "b")):
+            store_render(key, b"x" * 100).close()
+            path = os.path.join(self.cache_dir.name, f"{key}.jpg")
+            os.utime(path, (1000 + index, 1000 + index))
+        # Reading "a" makes "b" the least recently used
+        cached_render("a", mock.Mock()).close()
+
+        store_render("c", b"x" * 100).close()
+        self.assertEqual(sorted(os.listdir(self.cache_dir.name)), ["a.jpg", "c.jpg"])
+
+        # The cap is checked again on every eviction pass
+        with override_settings(RENDER_CACHE_MAX_BYTES=0):
+            evict_renders(keep="c")
+        self.assertEqual(os.listdir(self.cache_dir.name), ["c.jpg"])
+
+
+class SingleflightTests(TestCase):
+    def test_runs_work_once_result_exists(self):
+        results = []
+        work = mock.Mock(side_effect=lambda: results.append("done") or "done")
+        check = lambda: results[0] if results else None
+        self.assertEqual(singleflight("once", check, work), "done")
+        self.assertEqual(singleflight("once", check, work), "done")
+        work.assert_called_once()
+
+    def test_gives_up_after_wait(self):
+        lock = lock_name("held")
+        cache.add(lock, 1)
+        self.addCleanup(cache.delete, lock)
+        work = mock.Mock()
+        self.assertIsNone(singleflight("held", lambda: None, work, wait=0.1))
+        work.assert_not_called()
+
+    def test_expired_lock_not_released_over_new_holder(self):
+        lock = lock_name("expired")
+        self.addCleanup(cache.delete, lock)
+
+        def work():
+            # This holder's lock expires and another caller takes it
+            cache.delete(lock)
+            cache.add(lock, "other")
+            return "done"
+
+        self.assertEqual(singleflight("expired", lambda: None, work), "done")
+        self.assertEqual(cache.get(lock), "other")
+
+    def test_runs_work_without_redis(self):
+        work = mock.Mock(return_value="done")
+        with mock.patch("core.locks.redis_client", return_value=None):
+            self.assertEqual(singleflight("no-redis", lambda: None, work), "done")
+        work.assert_called_once()
+
+    @mock.patch("core.locks.RENEW_INTERVAL", 0.05)
+    @mock.patch("core.locks.LOCK_TIMEOUT", 1)
+    def test_lock_renewed_while_work_runs(self):
+        lock = lock_name("slow")
+        client = redis_client()
+        ttls = []
+
+        def work():
+            for _ in range(4):
+                time.sleep(0.4)
+                ttls.append(client.pttl(cache.make_and_validate_key(lock)))
+            return "done"
+
+        self.assertEqual(singleflight("slow", lambda: None, work), "done")
+        # Still held 1.6s in, past the 1s timeout
+        self.assertTrue(all(ttl > 0 for ttl in ttls))
+        self.assertIsNone(cache.get(lock))
+
+
+class OnRequestSizeTests(TestCase):
+    def setUp(self):
+        file = io.BytesIO()
+        Image.new("RGB", (300, 200), color="green").save(file, "JPEG")
+        self.photo = Photo.objects.create(
+            title="On Request", raw_image=SimpleUploadedFile("on-request.jpg", file.getvalue(), content_type="image/jpeg")
+        )
+        self.size = Size.objects.create(slug="on_request", max_dimension=150)
+
+    def test_small_raw_rendered_in_request(self):
+        photo_size = tasks.request_photo_size(self.photo, self.size)
+        self.assertEqual((photo_size.width, photo_size.height), (150, 100))
+        self.assertEqual(PhotoSize.objects.get(photo=self.photo, size=self.size), photo_size)
+
+    @override_settings(PHOTO_SIZE_SYNC_MAX_PIXELS=1000, PHOTO_SIZE_REQUEST_WAIT=0.1)
+    def test_large_raw_queued_at_request_priority(self):
+        with mock.patch("core.tasks.generate_photo_size.apply_async") as apply_async:
+            self.assertIsNone(tasks.request_photo_size(self.photo, self.size))
+        apply_async.assert_called_once_with((self.photo.id, self.size.id), priority=tasks.REQUEST_TASK_PRIORITY)
+
+        # The queued task generates it, unless it exists by then
+        tasks.generate_photo_size(self.photo.id, self.size.id)
+        tasks.generate_photo_size(self.photo.id, self.size.id)
+        self.assertEqual(PhotoSize.objects.filter(photo=self.photo, size=self.size).count(), 1)
+
+    @override_settings(PHOTO_SIZE_REQUEST_WAIT=0.1)
+    def test_multiple_encodes_queued(self):
+        for encoder_settings in ({"formats": ["webp"]}, {"max_bytes": 10000}):
+            with self.subTest(**encoder_settings):
+                size = Size.objects.create(
+                    slug=f"encodes_{list(encoder_settings)[0]}", max_dimension=100, **encoder_settings
+                )
+                with mock.patch("core.tasks.generate_photo_size.apply_async") as apply_async:
+                    self.assertIsNone(tasks.request_photo_size(self.photo, size))
+                apply_async.assert_called_once()
+
+    def test_duplicate_render_removes_its_files(self):
+        self.size.formats = ["webp"]
+        existing = tasks.gen_size(self.photo, self.size)
+        before = set(os.listdir(os.path.dirname(existing.image.path)))
+
+        photo_size = tasks.gen_size(self.photo, self.size)
+        self.assertEqual(photo_size, existing)
+        self.assertEqual(set(os.listdir(os.path.dirname(existing.image.path))), before)
+
+    @override_settings(PHOTO_SIZE_REQUEST_WAIT=0.1)
+    def test_shares_render_in_progress(self):
+        lock = lock_name(f"photo_size:{self.photo.id}:{self.size.id}")
+        cache.add(lock, 1)
+        self.addCleanup(cache.delete, lock)
+
+        other_worker_gen_size = tasks.gen_size
+
+        def finish_other_render(seconds):
+            if not PhotoSize.objects.filter(photo=self.photo, size=self.size).exists():
+                other_worker_gen_size(self.photo, self.size)
+
+        with mock.patch("core.tasks.gen_size") as gen_size:
+            with mock.patch("core.locks.time.sleep", side_effect=finish_other_render):
+                photo_size = tasks.request_photo_size(self.photo, self.size)
+        self.assertEqual(photo_size.size, self.size)
+        gen_size.assert_not_called()
+
+
+class RenditionFormatTests(TestCase):
+    def setUp(self):
+        file = io.BytesIO()
+        Image.new("RGB", (300, 200), color="teal").save(file, "JPEG")
+        self.photo = Photo.objects.create(
+            title="Formats", raw_image=SimpleUploadedFile("formats.jpg", file.getvalue(), content_type="image/jpeg")
+        )
+        self.size = Size.objects.create(slug="formats", max_dimension=150, formats=["webp", "avif"])
+
+    def test_gen_size_writes_each_format(self):
+        photo_size = PhotoSize.objects.get(pk=tasks.gen_size(self.photo, self.size).pk)
+        self.assertEqual(photo_size.formats, ["jpeg", "webp", "avif"])
+
+        for format, pillow_format in (("jpeg", "JPEG"), ("webp", "WEBP"), ("avif", "AVIF")):
+            with photo_size.get_file(format).open("rb") as file:
+                content = file.read()
+            with Image.open(io.BytesIO(content)) as image:
+                self.assertEqual((image.format, image.size), (pillow_format, (150, 100)))
+            if format != "jpeg":
+                variant = photo_size.variants[format]
+                self.assertEqual(variant["file_size"], len(content))
+                self.assertEqual(variant["md5"], hashlib.md5(content).hexdigest())
+
+    def test_jpeg_only_by_default(self):
+        size = Size.objects.create(slug="jpeg_only", max_dimension=100)
+        photo_size = tasks.gen_size(self.photo, size)
+        self.assertEqual(photo_size.variants, {})
+        self.assertIsNone(photo_size.get_file("webp"))
+
+    def test_only_extra_formats_allowed(self):
+        self.size.formats = ["jpeg"]
+        with self.assertRaises(ValidationError):
+            self.size.clean()
+
+    def test_size_save_deletes_all_formats(self):
+        photo_size = tasks.gen_size(self.photo, self.size)
+        with mock.patch("core.tasks.delete_files.delay_on_commit") as delete_files:
+            self.size.save()
+        self.assertCountEqual(delete_files.call_args.args[0], [
+            photo_size.image.name, photo_size.variants["webp"]["image"], photo_size.variants["avif"]["image"],
+        ])
+
+    def test_consistency_keeps_variant_files(self):
+        photo_size = tasks.gen_size(self.photo, self.size)
+        with mock.patch("core.tasks.delete_files.delay") as delete_files, \
+                mock.patch("core.tasks.generate_sizes_for_photo.delay"), \
+                mock.patch("core.tasks.generate_photo_metadata.delay"):
+            tasks.consistency()
+        deleted = delete_files.call_args.args[0] if delete_files.called else []
+        for file in photo_size.files():
+            self.assertNotIn(file.path, deleted)
+        self.assertTrue(PhotoSize.objects.filter(pk=photo_size.pk).exists())
+
+    def test_consistency_drops_rendition_missing_a_variant(self):
+        photo_size = tasks.gen_size(self.photo, self.size)
+        os.remove(photo_size.get_file("avif").path)
+        with mock.patch("core.tasks.delete_files.delay"), \
+                mock.patch("core.tasks.generate_sizes_for_photo.delay"), \
+                mock.patch("core.tasks.generate_photo_metadata.delay"):
+            tasks.consistency()
+        self.assertFalse(PhotoSize.objects.filter(pk=photo_size.pk).exists())
+
+    def test_consistency_backfills_file_size(self):
+        photo_size = tasks.gen_size(self.photo, self.size)
+        PhotoSize.objects.filter(pk=photo_size.pk).update(file_size=None)
+        with mock.patch("core.tasks.delete_files.delay"), \
+                mock.patch("core.tasks.generate_sizes_for_photo.delay"), \
+                mock.patch("core.tasks.generate_photo_metadata.delay"):
+            tasks.consistency()
+        photo_size.refresh_from_db()
+        self.assertEqual(photo_size.file_size, os.path.getsize(photo_size.image.path))
+
+
+class EncoderSettingsTests(TestCase):
+    def setUp(self):
+        exif = Image.Exif()
+        exif[ExifTags.Base.Orientation] = 6  # Rotated a quarter turn
+        exif[ExifTags.Base.Make] = "Camera Co"
+        exif[ExifTags.Base.Copyright] = "Photographer"
+        file = io.BytesIO()
+        Image.effect_noise((300, 200), 64).convert("RGB").save(file, "JPEG", quality=95, exif=exif)
+        self.photo = Photo.objects.create(
+            title="Encoder", raw_image=SimpleUploadedFile("encoder.jpg", file.getvalue(), content_type="image/jpeg")
+        )
+
+    def generate(self, **settings):
+        size = Size.objects.create(slug=f"encoder_{Size.objects.count()}", max_dimension=150, **settings)
+        photo_size = tasks.gen_size(self.photo, size)
+        with photo_size.image.open("rb") as file:
+            content = file.read()
+        return photo_size, content, Image.open(io.BytesIO(content))
+
+    def test_quality(self):
+        _, default, _ = self.generate()
+        _, low, _ = self.generate(quality=20)
+        self.assertLess(len(low), len(default))
+
+    def test_byte_budget(self):
+        _, unlimited, _ = self.generate(quality=90)
+        photo_size, content, _ = self.generate(max_bytes=len(unlimited) // 2, formats=["webp"])
+        self.assertLessEqual(len(content), len(unlimited) // 2)
+        self.assertLessEqual(photo_size.variants["webp"]["file_size"], len(unlimited) // 2)
+
+        # The budget is a ceiling, not a target to undershoot by far
+        _, minimum, _ = self.generate(quality=formats.MIN_QUALITY)
+        self.assertGreater(len(content), len(minimum))
+
+    def test_unreachable_budget_uses_min_quality(self):
+        _, content, _ = self.generate(max_bytes=1)
+        _, minimum, _ = self.generate(quality=formats.MIN_QUALITY)
+        self.assertEqual(len(content), len(minimum))
+
+    def test_progressive(self):
+        _, _, image = self.generate(progressive=True)
+        self.assertTrue(image.info.get("progressive"))
+        _, _, image = self.generate()
+        self.assertFalse(image.info.get("progressive"))
+
+    def test_metadata(self):
+        _, _, image = self.generate()
+        self.assertEqual(dict(image.getexif()), {
+            ExifTags.Base.Orientation: 6, ExifTags.Base.Make: "Camera Co", ExifTags.Base.Copyright: "Photographer",
+        })
+
+        _, _, image = self.generate(metadata=Size.Metadata.REDUCE)
+        self.assertEqual(dict(image.getexif()), {ExifTags.Base.Orientation: 6, ExifTags.Base.Copyright: "Photographer"})
+
+        photo_size, _, image = self.generate(metadata=Size.Metadata.STRIP)
+        self.assertEqual(dict(image.getexif()), {})
+        # The orientation is applied to the pixels instead
+        self.assertEqual((photo_size.width, photo_size.height), (100, 150))
+
+    def test_quality_range(self):
+        size = Size(slug="bad_quality", max_dimension=100, quality=101)
+        with self.assertRaises(ValidationError):
+            size.full_clean()
+
+
+class PlaceholderTests(TestCase):
+    def setUp(self):
+        image = Image.new("RGB", (300, 200), color=(20, 40, 200))
+        image.paste((250, 250, 250), (0, 0, 60, 40))
+        file = io.BytesIO()
+        image.save(file, "JPEG")
+        self.photo = Photo.objects.create(
+            title="Placeholder", raw_image=SimpleUploadedFile("placeholder.jpg", file.getvalue(), content_type="image/jpeg")
+        )
+
+    def test_blurhash(self):
+        value = placeholders.blurhash(Image.new("RGB", (32, 24), color=(255, 0, 0)))
+        # 4x3 components: size flag, AC maximum, 4-character DC and 11 2-character ACs
+        self.assertEqual(len(value), 28)
+        self.assertEqual(value[0], "L")
+        dc = sum(placeholders.BASE83.index(char) * 83 ** (3 - i) for i, char in enumerate(value[2:6]))
+        self.assertEqual(dc, 0xFF0000)
+
+    def test_dominant_color(self):
+        _, color = placeholders.placeholder(Image.open(self.photo.raw_image))
+        self.assertEqual(color[0], "#")
+        red, green, blue = (int(color[i:i + 2], 16) for i in (1, 3, 5))
+        self.assertGreater(blue, 150)
+        self.assertLess(red, 60)
+
+    def test_orientation_applied(self):
+        exif = Image.Exif()
+        exif[ExifTags.Base.Orientation] = 6
+        file = io.BytesIO()
+        Image.open(self.photo.raw_image).save(file, "JPEG", exif=exif)
+        rotated = Image.open(file)
+        self.assertEqual(
+            placeholders.placeholder(rotated),
+            placeholders.placeholder(ImageOps.exif_transpose(rotated)),
+        )
+        self.assertNotEqual(placeholders.placeholder(rotated), placeholders.placeholder(Image.open(self.photo.raw_image)))
+
+    def test_gen_size_stores_placeholder_once(self):
+        square = Size.objects.create(slug="placeholder_square", max_dimension=50, square_crop=True)
+        tasks.gen_size(self.photo, square)
+        self.photo.refresh_from_db()
+        self.assertIsNone(self.photo.blurhash)
+
+        size = Size.objects.create(slug="placeholder_size", max_dimension=150)
+        tasks.gen_size(self.photo, size)
+        self.photo.refresh_from_db()
+        self.assertEqual(len(self.photo.blurhash), 28)
+        self.assertRegex(self.photo.dominant_color, r"^#[0-9a-f]{6}$")
+
+        with mock.patch("core.tasks.placeholder") as placeholder:
+            tasks.gen_size(self.photo, Size.objects.create(slug="placeholder_other", max_dimension=100))
+        placeholder.assert_not_called()
+
+    def test_backfill_from_rendition(self):
+        size = Size.objects.create(slug="placeholder_size", max_dimension=150)
+        tasks.gen_size(self.photo, size)
+        expected = Photo.objects.values_list("blurhash", "dominant_color").get(pk=self.photo.pk)
+        self.photo.save_placeholder(None, None)
+
+        with mock.patch("core.tasks.generate_photo_placeholder.delay") as delay, \
+                mock.patch("core.tasks.generate_sizes_for_photo.delay"), \
+                mock.patch("core.tasks.generate_photo_metadata.delay"), \
+                mock.patch("core.tasks.delete_files.delay"):
+            tasks.consistency()
+        delay.assert_called_once_with(self.photo.id)
+
+        tasks.generate_photo_placeholder(self.photo.id)
+        self.assertEqual(Photo.objects.values_list("blurhash", "dominant_color").get(pk=self.photo.pk), expected)
+
+    def test_no_backfill_without_uncropped_rendition(self):
+        tasks.gen_size(self.photo, Size.objects.create(slug="placeholder_square", max_dimension=100, square_crop=True))
+        with mock.patch("core.tasks.generate_photo_placeholder.delay") as delay, \
+                mock.patch("core.tasks.generate_sizes_for_photo.delay"), \
+                mock.patch("core.tasks.generate_photo_metadata.delay"), \
+                mock.patch("core.tasks.delete_files.delay"):
+            tasks.consistency()
+        delay.assert_not_called()
+
+    def test_save_placeholder_leaves_publish_state(self):
+        with mock.patch("core.models.photo_published.send") as published:
+            self.photo.save_placeholder("LKO2?U%2Tw=w]~RBVZRi};RPxuwH", "#123456")
+        published.assert_not_called()
+        self.photo.refresh_from_db()
+        self.assertFalse(self.photo.published)
+        self.assertEqual(self.photo.dominant_color, "#123456")
+
 
 class FilterTests(TestCase):
     """Test PhotoFilter and PhotoFilterAPI functionality"""
@@ -1096,11 +2051,13 @@ class FilterTests(TestCase):
         )
         PhotoTag.objects.create(photo=self.photo4, tag=self.tag_nature)
         PhotoInAlbum.objects.create(album=self.album1, photo=self.photo4, order=2)
+        # Title, description, camera and lens filters go through the search index
+        update_documents(Photo.objects.values_list("pk", flat=True))
     
-    def test_filter_by_title_contains(self):
-        """Test filtering photos by title using contains search"""
+    def test_filter_by_title_words(self):
+        """Test filtering photos by title using word prefix search"""
         
-        # Test contains search
+        # Test word search
         f = PhotoFilter(data={'title': 'Mountain'}, queryset=Photo.objects.all())
         self.assertEqual(f.qs.count(), 1)
         self.assertIn(self.photo1, f.qs)
@@ -1110,15 +2067,14 @@ class FilterTests(TestCase):
         self.assertEqual(f.qs.count(), 1)
         self.assertIn(self.photo2, f.qs)
         
-        # Test partial match
-        f = PhotoFilter(data={'title': 'City'}, queryset=Photo.objects.all())
-        self.assertEqual(f.qs.count(), 1)
-        self.assertIn(self.photo3, f.qs)
-        
-        # Test substring match
-        f = PhotoFilter(data={'title': 'est'}, queryset=Photo.objects.all())
+        # Test prefix match
+        f = PhotoFilter(data={'title': 'Fore'}, queryset=Photo.objects.all())
         self.assertEqual(f.qs.count(), 1)
         self.assertIn(self.photo4, f.qs)
+        
+        # Only the title is matched, not the description or keywords
+        f = PhotoFilter(data={'title': 'city'}, queryset=Photo.objects.all())
+        self.assertEqual(list(f.qs), [self.photo3])
     
     def test_filter_by_slug_contains(self):
         """Test filtering photos by slug using contains search"""
@@ -1131,8 +2087,8 @@ class FilterTests(TestCase):
         self.assertEqual(f.qs.count(), 1)
         self.assertIn(self.photo2, f.qs)
     
-    def test_filter_by_description_contains(self):
-        """Test filtering photos by description using contains search"""
+    def test_filter_by_description_words(self):
+        """Test filtering photos by description using word prefix search"""
         
         f = PhotoFilter(data={'description': 'mountains'}, queryset=Photo.objects.all())
         self.assertEqual(f.qs.count(), 1)
@@ -1157,8 +2113,8 @@ class FilterTests(TestCase):
         self.assertNotIn(self.photo1, f.qs)
         self.assertNotIn(self.photo4, f.qs)
     
-    def test_filter_by_camera_make_contains(self):
-        """Test filtering by camera make with contains search"""
+    def test_filter_by_camera_make_words(self):
+        """Test filtering by camera make with word prefix search"""
         
         # Canon cameras
         f = PhotoFilter(data={'camera_make': 'Canon'}, queryset=Photo.objects.all())
@@ -1176,8 +2132,8 @@ class FilterTests(TestCase):
         self.assertEqual(f.qs.count(), 1)
         self.assertIn(self.photo3, f.qs)
     
-    def test_filter_by_camera_model_contains(self):
-        """Test filtering by camera model with contains search"""
+    def test_filter_by_camera_model_words(self):
+        """Test filtering by camera model with word prefix search"""
         
         f = PhotoFilter(data={'camera_model': '5D'}, queryset=Photo.objects.all())
         self.assertEqual(f.qs.count(), 1)
@@ -1188,8 +2144,8 @@ class FilterTests(TestCase):
         self.assertIn(self.photo1, f.qs)
         self.assertIn(self.photo4, f.qs)
     
-    def test_filter_by_lens_model_contains(self):
-        """Test filtering by lens model with contains search"""
+    def test_filter_by_lens_model_words(self):
+        """Test filtering by lens model with word prefix search"""
         
         f = PhotoFilter(data={'lens_model': '85mm'}, queryset=Photo.objects.all())
         self.assertEqual(f.qs.count(), 1)
@@ -1293,17 +2249,17 @@ class FilterTests(TestCase):
         self.assertIn(self.photo3, f.qs)  # 3 days ago
         self.assertNotIn(self.photo1, f.qs)  # 15 days ago
     
-    def test_filter_by_exposure_program_contains(self):
-        """Test filtering by exposure program with contains search"""
+    def test_filter_by_exposure_program(self):
+        """Test filtering by exposure program, ignoring case"""
         
-        f = PhotoFilter(data={'exposure_program': 'Manual'}, queryset=Photo.objects.all())
-        self.assertIn(self.photo1, f.qs)
+        f = PhotoFilter(data={'exposure_program': 'manual'}, queryset=Photo.objects.all())
+        self.assertEqual(list(f.qs), [self.photo1])
     
-    def test_filter_by_flash_contains(self):
-        """Test filtering by flash with contains search"""
+    def test_filter_by_flash(self):
+        """Test filtering by flash, ignoring case"""
         
         f = PhotoFilter(data={'flash': 'No Flash'}, queryset=Photo.objects.all())
-        self.assertIn(self.photo3, f.qs)
+        self.assertEqual(list(f.qs), [self.photo3])
     
     def test_filter_by_albums(self):
         """Test filtering photos by albums (many-to-many)"""
@@ -1372,4 +2328,114 @@ class FilterTests(TestCase):
         self.assertNotIn(self.photo1, f.qs)
         self.assertNotIn(self.photo2, f.qs)
         self.assertIn(self.photo3, f.qs)
-        self.assertIn(self.photo4, f.qs)
\ No newline at end of file
+        self.assertIn(self.photo4, f.qs)
+
+class CatalogChangeTests(TestCase):
+    def setUp(self):
+        self.photo = Photo.objects.create(title="Change Photo", raw_image="change.jpg")
+        self.photo.update_published(update_model=True)
+        self.album = Album.objects.create(title="Change Album")
+        self.tag = Tag.objects.create(name="change")
+        self.start = CatalogChange.objects.order_by("-id").values_list("id", flat=True).first()
+
+    def changes(self):
+        return list(
+            CatalogChange.objects.filter(id__gt=self.start).values_list("entity_type", "entity_uuid", "action")
+        )
+
+    def test_entity_create_update_delete(self):
+        album = Album.objects.create(title="Another Album")
+        album.title = "Renamed Album"
+        album.save()
+        album_uuid = album.uuid
+        album.delete()
+
+        self.assertEqual(self.changes(), [
+            (CatalogChange.EntityType.ALBUM, album_uuid, CatalogChange.Action.CREATED),
+            (CatalogChange.EntityType.ALBUM, album_uuid, CatalogChange.Action.UPDATED),
+            (CatalogChange.EntityType.ALBUM, album_uuid, CatalogChange.Action.DELETED),
+        ])
+
+    def test_cursor_is_monotonic(self):
+        Tag.objects.create(name="one")
+        Tag.objects.create(name="two")
+        ids = list(CatalogChange.objects.filter(id__gt=self.start).values_list("id", flat=True))
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(set(ids)), len(ids))
+
+    def test_unpublished_photo_recorded_as_tombstone(self):
+        self.photo.hidden = True
+        self.photo.save()
+
+        self.assertEqual(self.changes(), [
+            (CatalogChange.EntityType.PHOTO, self.photo.uuid, CatalogChange.Action.DELETED),
+        ])
+
+    def test_hidden_photo_saves_not_recorded(self):
+        self.photo.hidden = True
+        self.photo.save()
+        self.photo.title = "Still Hidden"
+        self.photo.save()
+
+        self.assertEqual(self.changes(), [
+            (CatalogChange.EntityType.PHOTO, self.photo.uuid, CatalogChange.Action.DELETED),
+        ])
+
+    def test_new_unpublished_photo_not_recorded(self):
+        photo = Photo.objects.create(title="Draft Photo", raw_image="draft.jpg", hidden=True)
+        photo.title = "Draft Renamed"
+        photo.save()
+        self.assertEqual(self.changes(), [])
+
+    def test_deleting_unpublished_photo_not_recorded(self):
+        draft = Photo.objects.create(title="Draft Photo", raw_image="draft.jpg", hidden=True)
+        draft.delete()
+        self.photo.hidden = True
+        self.photo.save()
+        self.photo.delete()
+        size = Size.objects.create(slug="draft_size", max_dimension=300, public=False)
+        size.delete()
+
+        self.assertEqual(self.changes(), [
+            (CatalogChange.EntityType.PHOTO, self.photo.uuid, CatalogChange.Action.DELETED),
+        ])
+
+    def test_settled_cursor_holds_back_recent_changes(self):
+        settled = CatalogChange.objects.order_by("-id").first()
+        with override_settings(CHANGE_FEED_SAFETY_LAG=60):
+            CatalogChange.objects.update(timestamp=timezone.now() - datetime.timedelta(minutes=5))
+            self.assertEqual(CatalogChange.settled_cursor(), settled.id)
+            Tag.objects.create(name="recent")
+            Tag.objects.create(name="also recent")
+            self.assertEqual(CatalogChange.settled_cursor(), settled.id)
+        with override_settings(CHANGE_FEED_SAFETY_LAG=0):
+            self.assertEqual(CatalogChange.settled_cursor(), CatalogChange.objects.order_by("-id").first().id)
+
+    def test_private_size_recorded_as_tombstone(self):
+        size = Size.objects.create(slug="change_size", max_dimension=300)
+        size.public = False
+        size.save()
+
+        self.assertEqual(self.changes(), [
+            (CatalogChange.EntityType.SIZE, size.uuid, CatalogChange.Action.CREATED),
+            (CatalogChange.EntityType.SIZE, size.uuid, CatalogChange.Action.DELETED),
+        ])
+
+    def test_membership_updates_photo_and_parent(self):
+        self.photo.assign_albums([self.album])
+        PhotoTag.objects.create(photo=self.photo, tag=self.tag)
+
+        self.assertEqual(self.changes(), [
+            (CatalogChange.EntityType.PHOTO, self.photo.uuid, CatalogChange.Action.UPDATED),
+            (CatalogChange.EntityType.ALBUM, self.album.uuid, CatalogChange.Action.UPDATED),
+            (CatalogChange.EntityType.PHOTO, self.photo.uuid, CatalogChange.Action.UPDATED),
+            (CatalogChange.EntityType.TAG, self.tag.uuid, CatalogChange.Action.UPDATED),
+        ])
+
+    def test_photo_delete_ends_with_tombstone(self):
+        self.photo.assign_albums([self.album])
+        photo_uuid = self.photo.uuid
+        self.photo.delete()
+
+        photo_changes = [c for c in self.changes() if c[1] == photo_uuid]
+        self.assertEqual(photo_changes[-1], (CatalogChange.EntityType.PHOTO, photo_uuid, CatalogChange.Action.DELETED))
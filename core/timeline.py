@@ -0,0 +1,47 @@
+from collections import defaultdict
+from django.db.models import Count, DateField, F, Window
+from django.db.models.functions import RowNumber, Trunc
+
+
+# Date fields photos can be bucketed by, and their paths from Photo
+TIMELINE_FIELDS = {
+    "publish_date": "publish_date",
+    "capture_date": "metadata__capture_date",
+}
+GRANULARITIES = ("year", "month", "day")
+
+
+def timeline(queryset, field: str = "publish_date", granularity: str = "month",
+             photos_per_bucket: int = 0, photo_fields=("uuid",)) -> list:
+    """
+    Count the photos in `queryset` per year, month or day of `field`, in date
+    order, with a single GROUP BY on the truncated date. Dates are truncated in
+    the current time zone and photos without the date are left out.
+
+    Each bucket is a dict with its first `date` and `count`. With
+    `photos_per_bucket`, it also lists `photos`: the `photo_fields` values of
+    up to that many of its earliest photos, picked with a window function in
+    one more query.
+    """
+    path = TIMELINE_FIELDS[field]
+    dated = queryset.filter(**{f"{path}__isnull": False}).annotate(
+        bucket=Trunc(path, granularity, output_field=DateField())
+    )
+
+    counts = dated.values("bucket").annotate(count=Count("pk")).order_by("bucket")
+    buckets = [{"date": row["bucket"], "count": row["count"]} for row in counts]
+    if not photos_per_bucket:
+        return buckets
+
+    ranked = (
+        dated.annotate(position=Window(RowNumber(), partition_by=F("bucket"), order_by=[F(path).asc(), F("pk").asc()]))
+        .filter(position__lte=photos_per_bucket)
+        .order_by("bucket", "position")
+        .values("bucket", *photo_fields)
+    )
+    photos = defaultdict(list)
+    for row in ranked:
+        photos[row.pop("bucket")].append(row)
+    for bucket in buckets:
+        bucket["photos"] = photos[bucket["date"]]
+    return buckets
@@ -4,15 +4,16 @@ from django.views import View
 from django.views.generic import DetailView, CreateView, UpdateView, DeleteView, TemplateView
 from django_tables2.views import SingleTableView
 from django_filters.views import FilterView
+from django.db import transaction
 from django.db.models import Count
 from .models import *
 from .forms import *
 from .tables import *
 from .filters import PhotoFilter
+from .timeline import timeline
 from .mixins import CRUDGenericMixin
 from django.http import FileResponse, Http404
 import calendar
-from collections import defaultdict
 import json
 
 #region Photo
@@ -127,6 +128,7 @@ class PhotoCreateMultipleView(PhotoMixin, View):
 
 class PhotoCalendarView(TemplateView):
     template_name = "core/photo_calendar.html"
+    PHOTOS_PER_DAY = 10
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -146,23 +148,18 @@ class PhotoCalendarView(TemplateView):
         # Build contiguous weeks (list of 7-date lists)
         weeks_raw = [month_dates[i : i + 7] for i in range(0, len(month_dates), 7)]
 
-        # Preload photos that fall within the displayed range
+        # Count photos per local publish date within the displayed range,
+        # listing the first few of each day
         range_start = month_dates[0]
         range_end = month_dates[-1]
-        photos_qs = (
-            Photo.objects.filter(publish_date__date__range=(range_start, range_end))
-            .order_by('publish_date')
+        days = timeline(
+            Photo.objects.filter(publish_date__date__range=(range_start, range_end)),
+            field='publish_date',
+            granularity='day',
+            photos_per_bucket=self.PHOTOS_PER_DAY,
+            photo_fields=('pk', 'title'),
         )
-
-        # Group photos by local date
-        photos_map = defaultdict(list)
-        for p in photos_qs:
-            try:
-                pd = timezone.localtime(p.publish_date).date()
-            except Exception:
-                # Fallback to naive date if timezone conversion fails
-                pd = p.publish_date.date()
-            photos_map[pd].append(p)
+        days = {bucket['date']: bucket for bucket in days}
 
         # Build week/days data structure for template convenience
         weeks = []
@@ -174,7 +171,8 @@ class PhotoCalendarView(TemplateView):
                     'day': d.day,
                     'in_month': d.month == month,
                     'is_today': d == today,
-                    'photos': photos_map.get(d, []),
+                    'photos': days[d]['photos'] if d in days else [],
+                    'more': days[d]['count'] - len(days[d]['photos']) if d in days else 0,
                 })
             weeks.append(week_row)
 
@@ -189,8 +187,7 @@ class PhotoCalendarView(TemplateView):
             next_month, next_year = month + 1, year
 
         # Years dropdown population from photo publish dates
-        years_qs = Photo.objects.dates('publish_date', 'year')
-        years = sorted({d.year for d in years_qs})
+        years = [bucket['date'].year for bucket in timeline(Photo.objects.all(), 'publish_date', 'year')]
         if not years:
             years = [today.year]
 
@@ -372,14 +369,15 @@ class AlbumUpdateView(AlbumMixin, UpdateView):
     template_name = "core/album_form.html"
 
     def form_valid(self, form):
-        # Save the Album itself first
-        response = super().form_valid(form)
-
-        # Update photo order from submitted hidden inputs
-        photo_ids = [int(pid) for pid in self.request.POST.getlist("photo_order[]") if pid]
-        for idx, photo_id in enumerate(photo_ids, start=1):
-            PhotoInAlbum.objects.filter(album=self.object, photo_id=photo_id).update(order=idx)
-
+        # One transaction, so cache invalidation on commit happens after the reorder
+        with transaction.atomic():
+            # Save the Album itself first
+            response = super().form_valid(form)
+
+            # Update photo order from submitted hidden inputs
+            photo_ids = [int(pid) for pid in self.request.POST.getlist("photo_order[]") if pid]
+            for idx, photo_id in enumerate(photo_ids, start=1):
+                PhotoInAlbum.objects.filter(album=self.object, photo_id=photo_id).update(order=idx)
 
         return response
 
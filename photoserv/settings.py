@@ -55,6 +55,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     "django.forms",
 
     "django_tables2",
@@ -170,6 +171,8 @@ CELERY_BROKER_URL = f"redis://{REDIS_HOST}:{REDIS_PORT}/0"
 CELERY_RESULT_BACKEND = "django-db"
 CELERY_RESULT_EXTENDED = True
 CELERY_RESULT_EXPIRES = 604800
+# Leaves room above routine tasks for work a request is waiting on (0 runs first on Redis)
+CELERY_TASK_DEFAULT_PRIORITY = 5
 
 # --- Cache Configuration (use Redis for shared cache across workers) ---
 CACHES = {
@@ -210,6 +213,20 @@ if IS_CONTAINER:
 else:
     MEDIA_ROOT = os.path.join(BASE_DIR, 'content')
 
+# On-demand renders (/api/photos/<uuid>/render/) are kept on disk, evicting the
+# least recently used once the directory grows past RENDER_CACHE_MAX_BYTES.
+RENDER_CACHE_DIR = os.getenv("RENDER_CACHE_DIR", os.path.join(MEDIA_ROOT, "render_cache"))
+RENDER_CACHE_MAX_BYTES = int(os.getenv("RENDER_CACHE_MAX_BYTES", 1024 * 1024 * 1024))
+# Signed render URLs stop working RENDER_URL_MAX_AGE seconds after they're issued.
+RENDER_URL_MAX_AGE = int(os.getenv("RENDER_URL_MAX_AGE", 7 * 24 * 60 * 60))
+
+# A request for a rendition that hasn't been generated yet renders it in place
+# if the raw image has at most PHOTO_SIZE_SYNC_MAX_PIXELS pixels, and otherwise
+# queues it at high priority. Requests wait at most PHOTO_SIZE_REQUEST_WAIT
+# seconds for a rendition being generated elsewhere.
+PHOTO_SIZE_SYNC_MAX_PIXELS = int(os.getenv("PHOTO_SIZE_SYNC_MAX_PIXELS", 40_000_000))
+PHOTO_SIZE_REQUEST_WAIT = float(os.getenv("PHOTO_SIZE_REQUEST_WAIT", 5))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -224,7 +241,9 @@ REST_FRAMEWORK = {
         'api_key.permissions.HasAPIKey'
     ],
     'DEFAULT_RENDERER_CLASSES': (
-        'rest_framework.renderers.JSONRenderer',  # Only JSON, no HTML
+        'public_rest_api.renderers.FastJSONRenderer',  # JSON is the default; no HTML
+        'public_rest_api.renderers.MessagePackRenderer',
+        'public_rest_api.renderers.CBORRenderer',
     ),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_FILTER_BACKENDS': [
@@ -232,6 +251,22 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Seconds a rendered public API response stays in the cache. Entries are keyed by
+# catalog version, so any content change makes them unreachable; 0 disables caching.
+PUBLIC_API_CACHE_TIMEOUT = int(os.getenv("PUBLIC_API_CACHE_TIMEOUT", 60 * 60 * 24))
+
+# Seconds a catalog change must age before the change feed hands it out, so a
+# change whose transaction commits late isn't skipped by a cursor already past it.
+CHANGE_FEED_SAFETY_LAG = int(os.getenv("CHANGE_FEED_SAFETY_LAG", 10))
+
+# Custom attribute keys that get a dedicated expression index on photos and
+# albums, for frequent `attr.<key>=` filters. Indexes are synced after migrate.
+INDEXED_CUSTOM_ATTRIBUTES = [key.strip() for key in os.getenv("INDEXED_CUSTOM_ATTRIBUTES", "").split(",") if key.strip()]
+
+# Cached public API bodies at least this many bytes are stored with gzip and brotli
+# variants, served according to Accept-Encoding.
+PUBLIC_API_COMPRESSION_MIN_SIZE = int(os.getenv("PUBLIC_API_COMPRESSION_MIN_SIZE", 1024))
+
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Photoserv API',
     'DESCRIPTION': 'Public API for your Photoserv instance.',
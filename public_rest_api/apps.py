@@ -7,3 +7,4 @@ class PublicApiConfig(AppConfig):
 
     def ready(self):
         import public_rest_api.extensions
+        import public_rest_api.receivers
@@ -0,0 +1,262 @@
+import gzip
+import hashlib
+import time
+import brotli
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+
+
+CATALOG_VERSION_KEY = "public_rest_api:catalog_version"
+RESPONSE_CACHE_PREFIX = "public_rest_api:response"
+
+# Content codings stored alongside cached bodies, in order of preference.
+# Compression happens once per cache entry, so the levels favour size over speed.
+COMPRESSED_ENCODINGS = ("br", "gzip")
+BROTLI_QUALITY = 9
+GZIP_LEVEL = 9
+
+
+def get_catalog_version() -> int:
+    """
+    Return the current catalog version, initializing it if it is not set yet.
+
+    The initial value is a nanosecond timestamp rather than 1 so a version lost
+    to a Redis flush or eviction can never collide with one used before it.
+    """
+    cache.add(CATALOG_VERSION_KEY, time.time_ns(), timeout=None)
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # Evicted between add() and get(); fall back to a fresh value
+        version = time.time_ns()
+        cache.set(CATALOG_VERSION_KEY, version, timeout=None)
+    return version
+
+
+def _incr_catalog_version():
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        # Key doesn't exist, create it
+        cache.set(CATALOG_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def bump_catalog_version():
+    """
+    Invalidate every cached API response by moving to a new catalog version.
+
+    The version is bumped immediately, so reads within the current transaction
+    see the change, and again after commit, so a response cached by another
+    worker between the first bump and the commit is not served afterwards.
+    """
+    _incr_catalog_version()
+    transaction.on_commit(_incr_catalog_version)
+
+
+def response_cache_key(request, version: int = None) -> str:
+    """
+    Build a response cache key from the endpoint, query parameters, negotiated
+    media type and catalog version.
+    """
+    if version is None:
+        version = get_catalog_version()
+
+    params = sorted((key, sorted(values)) for key, values in request.query_params.lists())
+    media_type = getattr(request, "accepted_media_type", "")
+    raw = f"{request.path}?{params}|{media_type}"
+    digest = hashlib.md5(raw.encode()).hexdigest()
+    return f"{RESPONSE_CACHE_PREFIX}:{version}:{digest}"
+
+
+def compressed_variants(content: bytes) -> dict:
+    """
+    Compress a response body with each of COMPRESSED_ENCODINGS.
+
+    Bodies smaller than PUBLIC_API_COMPRESSION_MIN_SIZE aren't compressed, and
+    variants that come out no smaller than the body are dropped.
+    """
+    if len(content) < settings.PUBLIC_API_COMPRESSION_MIN_SIZE:
+        return {}
+
+    variants = {
+        "br": brotli.compress(content, quality=BROTLI_QUALITY),
+        "gzip": gzip.compress(content, compresslevel=GZIP_LEVEL, mtime=0),
+    }
+    return {encoding: body for encoding, body in variants.items() if len(body) < len(content)}
+
+
+def cache_entry(content: bytes, content_type: str) -> dict:
+    return {"content": content, "content_type": content_type, "encodings": compressed_variants(content)}
+
+
+def accepted_encoding(request, encodings) -> str | None:
+    """
+    Pick the preferred content coding in `encodings` that the request's
+    Accept-Encoding allows, or None to send the body uncompressed.
+    """
+    header = request.headers.get("Accept-Encoding", "")
+    qualities = {}
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if coding:
+            qualities[coding.strip().lower()] = quality
+
+    for encoding in COMPRESSED_ENCODINGS:
+        if encoding in encodings and qualities.get(encoding, qualities.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+def encode_response(request, response, entry: dict):
+    """
+    Swap in the precompressed body from a cache entry, if the client accepts one.
+    """
+    encodings = entry.get("encodings", {})
+    encoding = accepted_encoding(request, encodings)
+    if encoding:
+        response.content = encodings[encoding]
+        response["Content-Encoding"] = encoding
+    patch_vary_headers(response, ["Accept-Encoding"])
+    return response
+
+
+def cached_http_response(request, entry: dict) -> HttpResponse:
+    """Build a response from a cache entry, precompressed when accepted."""
+    response = HttpResponse(entry["content"], content_type=entry["content_type"])
+    return encode_response(request, response, entry)
+
+
+def caching_stream(key: str, chunks, content_type: str):
+    """
+    Pass `chunks` through to a streaming response, storing the joined body (and
+    its compressed variants) in the response cache once the stream completes.
+    Incomplete streams are not cached.
+    """
+    timeout = settings.PUBLIC_API_CACHE_TIMEOUT
+    body = []
+    for chunk in chunks:
+        if timeout:
+            body.append(chunk)
+        yield chunk
+
+    if timeout:
+        cache.set(key, cache_entry(b"".join(body), content_type), timeout=timeout)
+
+
+def cached_stream_response(request, key: str, chunks, content_type: str):
+    """
+    Serve a streamed body from the response cache, or stream `chunks` and cache
+    the body once it completes. Only cached bodies are served compressed.
+    """
+    cached = cache.get(key) if settings.PUBLIC_API_CACHE_TIMEOUT else None
+    if cached is not None:
+        return cached_http_response(request, cached)
+
+    response = StreamingHttpResponse(caching_stream(key, chunks, content_type), content_type=content_type)
+    patch_vary_headers(response, ["Accept-Encoding"])
+    return response
+
+
+def response_etag(cache_key: str) -> str:
+    """
+    Weak ETag for a response cache key. The key already carries the catalog
+    version, so the tag changes whenever any catalog content changes.
+    """
+    return f"W/{quote_etag(hashlib.md5(cache_key.encode()).hexdigest())}"
+
+
+def etag_matches(request, etag: str, wildcard: bool = True) -> bool:
+    """
+    Whether the request's If-None-Match header matches the given ETag, using the
+    weak comparison RFC 9110 requires for If-None-Match.
+
+    `*` matches any current representation, so it counts only with `wildcard`,
+    for callers that know the resource exists.
+    """
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+
+    etags = parse_etags(header)
+    if etags == ["*"]:
+        return wildcard
+    bare = etag.removeprefix("W/")
+    return any(candidate.removeprefix("W/") == bare for candidate in etags)
+
+
+def not_modified(etag: str) -> HttpResponseNotModified:
+    response = HttpResponseNotModified()
+    response["ETag"] = etag
+    return response
+
+
+class CachedResponseMixin:
+    """
+    Serve list and retrieve responses from the response cache.
+
+    Every response carries an ETag derived from its cache key, and a matching
+    If-None-Match is answered with 304 before the cache or database is touched.
+    Responses are stored rendered, keyed by `response_cache_key`, so a hit skips
+    the ORM and serialization entirely. Bodies are compressed once when they are
+    stored, and the precompressed variant is served to clients that accept it.
+    Authentication and permissions still run on every request since the lookup
+    happens inside the handler.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def is_response_cacheable(self, request, response) -> bool:
+        return response.status_code == 200
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        key = response_cache_key(request)
+        etag = response_etag(key)
+        # Whether the resource exists isn't known yet, so `*` waits for the handler
+        if etag_matches(request, etag, wildcard=False):
+            return not_modified(etag)
+
+        timeout = settings.PUBLIC_API_CACHE_TIMEOUT
+        cached = cache.get(key) if timeout else None
+        if cached is not None:
+            # Only successful responses are cached
+            if etag_matches(request, etag):
+                return not_modified(etag)
+            response = cached_http_response(request, cached)
+            response["ETag"] = etag
+            return response
+
+        response = handler(request, *args, **kwargs)
+        if self.is_response_cacheable(request, response):
+            if etag_matches(request, etag):
+                return not_modified(etag)
+            response["ETag"] = etag
+            if timeout:
+                response.response_cache_key = key
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        # The body depends on the negotiated renderer
+        patch_vary_headers(response, ["Accept"])
+
+        key = getattr(response, "response_cache_key", None)
+        if key:
+            response.render()
+            entry = cache_entry(response.content, response["Content-Type"])
+            cache.set(key, entry, timeout=settings.PUBLIC_API_CACHE_TIMEOUT)
+            encode_response(request, response, entry)
+        return response
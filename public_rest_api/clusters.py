@@ -0,0 +1,71 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, BigIntegerField, Count, F, Max, Q, Value
+from core.geo import CELL_BITS, tile_ranges
+from core.models import Photo
+from .cache import RESPONSE_CACHE_PREFIX, get_catalog_version
+
+
+# Each tile is split into a 2**CLUSTER_GRID_BITS square grid of clusters
+CLUSTER_GRID_BITS = 3
+MAX_CLUSTER_ZOOM = CELL_BITS - CLUSTER_GRID_BITS
+MAX_CLUSTER_TILES = 256
+CLUSTER_CACHE_PREFIX = f"{RESPONSE_CACHE_PREFIX}:clusters"
+
+
+def tile_clusters(tiles: list, zoom: int) -> dict:
+    """
+    Aggregate the public, geotagged photos in `tiles` into grid clusters with
+    a single GROUP BY on the geocell prefix.
+
+    Returns the clusters of each tile, keyed by tile. Each cluster has its
+    photo count, centroid and the uuid of its most recently added photo.
+    """
+    cell_span = 1 << (2 * (CELL_BITS - zoom - CLUSTER_GRID_BITS))
+    cells_per_tile = 1 << (2 * CLUSTER_GRID_BITS)
+
+    condition = Q(pk__in=[])
+    for low, high in tile_ranges(tiles, zoom):
+        condition |= Q(geocell__range=(low, high))
+
+    rows = list(
+        Photo.objects.filter(condition, _published=True)
+        .annotate(cluster=F("geocell") / Value(cell_span, output_field=BigIntegerField()))
+        .values("cluster")
+        .annotate(count=Count("id"), latitude=Avg("latitude"), longitude=Avg("longitude"), photo_id=Max("id"))
+        .order_by("cluster")
+    )
+    uuids = dict(Photo.objects.filter(pk__in=[row["photo_id"] for row in rows]).values_list("pk", "uuid"))
+
+    clusters = {tile: [] for tile in tiles}
+    for row in rows:
+        clusters[row["cluster"] // cells_per_tile].append({
+            "count": row["count"],
+            "latitude": row["latitude"],
+            "longitude": row["longitude"],
+            "photo": str(uuids[row["photo_id"]]),
+        })
+    return clusters
+
+
+def photo_clusters(tiles: list, zoom: int) -> list:
+    """
+    Clusters for `tiles`, cached per tile and catalog version so panning and
+    overlapping bounding boxes reuse the tiles they share. Tiles missing from
+    the cache are aggregated together in one query.
+    """
+    timeout = settings.PUBLIC_API_CACHE_TIMEOUT
+    version = get_catalog_version()
+    keys = {tile: f"{CLUSTER_CACHE_PREFIX}:{version}:{zoom}:{tile}" for tile in tiles}
+
+    cached = cache.get_many(list(keys.values())) if timeout else {}
+    clusters = {tile: cached[key] for tile, key in keys.items() if key in cached}
+
+    missing = [tile for tile in tiles if tile not in clusters]
+    if missing:
+        computed = tile_clusters(missing, zoom)
+        if timeout:
+            cache.set_many({keys[tile]: computed[tile] for tile in missing}, timeout=timeout)
+        clusters.update(computed)
+
+    return [cluster for tile in tiles for cluster in clusters[tile]]
@@ -1,4 +1,5 @@
-from drf_spectacular.extensions import OpenApiAuthenticationExtension
+from drf_spectacular.extensions import OpenApiAuthenticationExtension, OpenApiSerializerExtension
+from drf_spectacular.plumbing import get_class
 
 class APIKeyAuthenticationScheme(OpenApiAuthenticationExtension):
     target_class = 'api_key.authentication.APIKeyAuthentication'  # full dotted path!
@@ -10,3 +11,23 @@ class APIKeyAuthenticationScheme(OpenApiAuthenticationExtension):
             "scheme": "bearer",
             "bearerFormat": "API Key",
         }
+
+
+class SparseFieldsSerializerExtension(OpenApiSerializerExtension):
+    target_class = 'public_rest_api.serializers.SparseFieldsMixin'
+    match_subclasses = True
+
+    def map_serializer(self, auto_schema, direction):
+        # Document every field, with expandable ones optional since they are
+        # left out unless requested
+        serializer_class = get_class(self.target)
+        schema = auto_schema._map_serializer(serializer_class(all_fields=True), direction, bypass_extensions=True)
+        required = [name for name in schema.get("required", []) if name not in serializer_class.expandable_fields]
+        if required:
+            schema["required"] = required
+        else:
+            schema.pop("required", None)
+        # Don't document the mixin's docstring as the serializer's
+        if not serializer_class.__doc__:
+            schema.pop("description", None)
+        return schema
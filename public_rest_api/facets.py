@@ -0,0 +1,52 @@
+from django.db.models import Count
+from django.db.models.functions import ExtractYear
+from core.models import PhotoInAlbum, PhotoMetadata, PhotoTag
+
+
+def _counts(queryset, columns: dict, order_by: tuple) -> list:
+    """Group `queryset` by `columns` (output key -> field), counting photos in each group."""
+    rows = queryset.values(*columns.values()).annotate(count=Count("photo_id")).order_by(*order_by)
+    return [{**{key: row[field] for key, field in columns.items()}, "count": row["count"]} for row in rows]
+
+
+def photo_facets(queryset) -> dict:
+    """
+    Photo counts per camera model, lens, tag, album and capture year for the
+    photos in `queryset`, each computed with one grouped query. Photos without
+    a value for a facet aren't counted in it.
+    """
+    photo_ids = queryset.values("pk")
+    metadata = PhotoMetadata.objects.filter(photo_id__in=photo_ids)
+
+    facets = {
+        "total": queryset.count(),
+        "cameras": _counts(
+            metadata.exclude(camera_model__isnull=True).exclude(camera_model=""),
+            {"value": "camera_model"},
+            ("-count", "camera_model"),
+        ),
+        "lenses": _counts(
+            metadata.exclude(lens_model__isnull=True).exclude(lens_model=""),
+            {"value": "lens_model"},
+            ("-count", "lens_model"),
+        ),
+        "tags": _counts(
+            PhotoTag.objects.filter(photo_id__in=photo_ids),
+            {"uuid": "tag__uuid", "name": "tag__name"},
+            ("-count", "tag__name"),
+        ),
+        "albums": _counts(
+            PhotoInAlbum.objects.filter(photo_id__in=photo_ids),
+            {"uuid": "album__uuid", "title": "album__title"},
+            ("-count", "album__title"),
+        ),
+        "years": _counts(
+            metadata.exclude(capture_date__isnull=True).annotate(year=ExtractYear("capture_date")),
+            {"value": "year"},
+            ("-year",),
+        ),
+    }
+    for facet in ("tags", "albums"):
+        for row in facets[facet]:
+            row["uuid"] = str(row["uuid"])
+    return facets
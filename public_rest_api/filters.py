@@ -1,7 +1,19 @@
 import django_filters
 from django import forms
+from rest_framework.filters import BaseFilterBackend
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema_field
 from core.models import Photo, Album, Tag
 from core.filters import PhotoFilter
+from core.attributes import filter_attribute, indexed_attributes, parse_attribute_value
+
+
+ATTRIBUTE_PARAM_PREFIX = 'attr.'
+
+
+@extend_schema_field(OpenApiTypes.UUID)
+class UUIDMultipleChoiceFilter(django_filters.ModelMultipleChoiceFilter):
+    """Match any of several related objects, given by UUID."""
 
 
 class PhotoFilterAPI(PhotoFilter):
@@ -12,15 +24,46 @@ class PhotoFilterAPI(PhotoFilter):
     and tags filters to accept UUIDs instead of primary key IDs.
     """
     
-    albums = django_filters.ModelMultipleChoiceFilter(
+    albums = UUIDMultipleChoiceFilter(
         field_name='albums__uuid',
         to_field_name='uuid',
         queryset=Album.objects.all(),
         label='Albums'
     )
-    tags = django_filters.ModelMultipleChoiceFilter(
+    tags = UUIDMultipleChoiceFilter(
         field_name='tags__uuid',
         to_field_name='uuid',
         queryset=Tag.objects.all(),
         label='Tags'
     )
+
+
+class CustomAttributeFilterBackend(BaseFilterBackend):
+    """
+    Filter photos or albums on their custom attributes with `?attr.<key>=<value>`.
+
+    Values are read as JSON, so `?attr.featured=true` matches the boolean.
+    Repeating a parameter matches any of its values; different keys must all match.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        for name in request.query_params:
+            key = name[len(ATTRIBUTE_PARAM_PREFIX):]
+            if not name.startswith(ATTRIBUTE_PARAM_PREFIX) or not key:
+                continue
+            values = [parse_attribute_value(raw) for raw in request.query_params.getlist(name)]
+            queryset = filter_attribute(queryset, key, values)
+        return queryset
+
+    def get_schema_operation_parameters(self, view):
+        # Any key can be filtered on; document the indexed ones
+        return [
+            {
+                'name': f'{ATTRIBUTE_PARAM_PREFIX}{key}',
+                'required': False,
+                'in': 'query',
+                'description': f'Filter by the `{key}` custom attribute. The value is read as JSON (e.g. `true`, `42`), falling back to a string.',
+                'schema': {'type': 'string'},
+            }
+            for key in indexed_attributes()
+        ]
@@ -0,0 +1,67 @@
+import json
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from core.models import Photo, Album, Tag
+from public_rest_api.renderers import FastJSONRenderer
+from public_rest_api.serializers import (
+    PhotoSummarySerializer, AlbumSummarySerializer, TagSummarySerializer, fast_summaries, plan_photo_queryset,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the serializer and values()-based paths for summary list responses "
+        "against the current database. Read-only."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=20, help="Timed runs per case (default: 20)")
+        parser.add_argument("--include-sizes", action="store_true", help="Embed sizes in photo summaries")
+
+    def handle(self, *args, iterations, include_sizes, **options):
+        params = {"include_sizes": "true"} if include_sizes else {}
+        request = Request(RequestFactory().get("/api/", params))
+
+        photos = Photo.objects.filter(_published=True)
+        cases = [
+            (f"photo list ({photos.count()} photos)", PhotoSummarySerializer, photos),
+            (f"album list ({Album.objects.count()} albums)", AlbumSummarySerializer, Album.objects.all()),
+            (f"tag list ({Tag.objects.count()} tags)", TagSummarySerializer, Tag.objects.all()),
+        ]
+
+        for label, serializer_class, queryset in cases:
+            def serializer_path():
+                if serializer_class is PhotoSummarySerializer:
+                    planned = plan_photo_queryset(queryset.all(), serializer_class, request, sizes=include_sizes)
+                else:
+                    planned = queryset.all()
+                data = serializer_class(planned, many=True, context={"request": request}).data
+                return JSONRenderer().render(data)
+
+            def fast_path():
+                return FastJSONRenderer().render(fast_summaries(queryset.all(), serializer_class, request))
+
+            if json.loads(serializer_path()) != json.loads(fast_path()):
+                self.stderr.write(self.style.ERROR(f"{label}: output differs between paths"))
+                continue
+
+            slow = self.time(serializer_path, iterations)
+            fast = self.time(fast_path, iterations)
+            self.stdout.write(
+                f"{label}: serializer {slow * 1000:.2f} ms, values() {fast * 1000:.2f} ms "
+                f"({slow / fast if fast else float('inf'):.1f}x)"
+            )
+
+    def time(self, func, iterations):
+        """Median wall time of `func` in seconds, after one warm-up run."""
+        func()
+        timings = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return statistics.median(timings)
@@ -7,3 +7,10 @@ class SiteHealth:
         self.photos_pending_sizes = photos_pending_sizes
         self.pending_sizes = pending_sizes
         self.pending_metadata = pending_metadata
+
+
+class ChangeFeed:
+    def __init__(self, changes, cursor: int, has_more: bool):
+        self.changes = changes
+        self.cursor = cursor
+        self.has_more = has_more
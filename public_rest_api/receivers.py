@@ -0,0 +1,26 @@
+from django.dispatch import receiver
+from django.db.models.signals import post_save, post_delete
+from core.models import Photo, PhotoMetadata, PhotoSize, Size, Album, PhotoInAlbum, Tag, PhotoTag
+from .cache import bump_catalog_version
+
+
+@receiver(post_save, sender=Photo)
+@receiver(post_save, sender=PhotoMetadata)
+@receiver(post_save, sender=PhotoSize)
+@receiver(post_save, sender=Size)
+@receiver(post_save, sender=Album)
+@receiver(post_save, sender=PhotoInAlbum)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=PhotoTag)
+
+@receiver(post_delete, sender=Photo)
+@receiver(post_delete, sender=PhotoMetadata)
+@receiver(post_delete, sender=PhotoSize)
+@receiver(post_delete, sender=Size)
+@receiver(post_delete, sender=Album)
+@receiver(post_delete, sender=PhotoInAlbum)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=PhotoTag)
+def handle_catalog_change(*args, **kwargs):
+    """Any change to public catalog data invalidates cached API responses."""
+    bump_catalog_version()
@@ -0,0 +1,140 @@
+import abc
+import uuid
+from datetime import datetime
+import cbor2
+import msgpack
+import orjson
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_SUBCLASS
+
+# Serializers emit UUIDs and datetimes as strings; binary renderers turn the
+# values of these fields back into native types so they encode compactly.
+UUID_KEYS = {"uuid"}
+DATETIME_KEYS = {"publish_date", "capture_date", "created_at", "updated_at", "timestamp"}
+# Fields holding free-form JSON, whose keys are user data rather than fields
+JSON_KEYS = {"custom_attributes"}
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes with orjson.
+
+    Output is byte-for-byte what JSONRenderer produces in its compact form:
+    datetimes and anything else orjson doesn't handle natively go through
+    DRF's JSONEncoder. Requests asking for indented output, and data orjson
+    can't encode, fall back to JSONRenderer.
+    """
+    _encoder = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self._encoder.default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Match JSONRenderer, which escapes these so the output is also valid JavaScript
+        return ret.replace("\u2028".encode(), b"\\u2028").replace("\u2029".encode(), b"\\u2029")
+
+
+def _native_value(key, value):
+    if key in JSON_KEYS:
+        return value
+    if isinstance(value, str):
+        try:
+            if key in UUID_KEYS:
+                return uuid.UUID(value)
+            if key in DATETIME_KEYS:
+                return datetime.fromisoformat(value)
+        except ValueError:
+            pass
+        return value
+    return native_types(value)
+
+
+def native_types(data):
+    """
+    Copy serialized data, converting UUID and datetime strings under the keys
+    in UUID_KEYS and DATETIME_KEYS back to `uuid.UUID` and `datetime`. Values
+    of the JSON_KEYS fields are passed through as they are.
+    """
+    if isinstance(data, dict):
+        return {key: _native_value(key, value) for key, value in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [native_types(item) for item in data]
+    return data
+
+
+class BinaryRenderer(BaseRenderer, metaclass=abc.ABCMeta):
+    """
+    Base for compact binary renderers. Serializers are unchanged; their output
+    goes through `native_types` before `encode`.
+    """
+    charset = None
+    render_style = "binary"
+    _encoder = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return self.encode(native_types(data))
+
+    @abc.abstractmethod
+    def encode(self, data) -> bytes:
+        """Encode data already converted by `native_types`."""
+
+    def default(self, value):
+        # Lazy strings, decimals and the like, encoded as they would be in JSON
+        return self._encoder.default(value)
+
+
+class MessagePackRenderer(BinaryRenderer):
+    """
+    MessagePack. UUIDs are 16-byte binaries, datetimes the timestamp extension type.
+    """
+    media_type = "application/msgpack"
+    format = "msgpack"
+
+    def default(self, value):
+        if isinstance(value, uuid.UUID):
+            return value.bytes
+        return super().default(value)
+
+    def encode(self, data) -> bytes:
+        return msgpack.packb(data, datetime=True, default=self.default)
+
+
+class CBORRenderer(BinaryRenderer):
+    """
+    CBOR. UUIDs use tag 37 and datetimes tag 1 (epoch seconds).
+    """
+    media_type = "application/cbor"
+    format = "cbor"
+
+    def encode(self, data) -> bytes:
+        return cbor2.dumps(data, datetime_as_timestamp=True, default=self._encode_default)
+
+    def _encode_default(self, encoder, value):
+        encoder.encode(self.default(value))
+
+
+class ImageContentNegotiation(DefaultContentNegotiation):
+    """
+    Negotiation for views that answer with image files. Their requests accept
+    image types no renderer produces; renderers there only format error
+    bodies, so fall back to the first one rather than refusing with a 406.
+    """
+    def select_renderer(self, request, renderers, format_suffix=None):
+        try:
+            return super().select_renderer(request, renderers, format_suffix)
+        except NotAcceptable:
+            return renderers[0], renderers[0].media_type
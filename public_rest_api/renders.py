@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core import signing
+
+# Render URLs are signed so only dimensions handed out by the API get rendered
+RENDER_SIGNING_SALT = "public_rest_api.render"
+
+
+def _render_value(photo_uuid, width, height, fit) -> str:
+    return f"{photo_uuid}:{width or ''}:{height or ''}:{fit}"
+
+
+def _signer():
+    return signing.TimestampSigner(salt=RENDER_SIGNING_SALT)
+
+
+def render_signature(photo_uuid, width, height, fit) -> str:
+    """A signature for these render parameters: its timestamp and MAC, as "<timestamp>:<mac>"."""
+    value = _render_value(photo_uuid, width, height, fit)
+    return _signer().sign(value)[len(value) + 1:]
+
+
+def valid_render_signature(signature, photo_uuid, width, height, fit) -> bool:
+    """Whether `signature` matches these parameters and is at most RENDER_URL_MAX_AGE seconds old."""
+    value = _render_value(photo_uuid, width, height, fit)
+    try:
+        _signer().unsign(f"{value}:{signature}", max_age=settings.RENDER_URL_MAX_AGE)
+    except signing.BadSignature:  # Including SignatureExpired
+        return False
+    return True
@@ -0,0 +1,150 @@
+import tarfile
+import time
+from django.db.models import Q
+from core.formats import CONTENT_TYPES, EXTENSIONS, FORMAT_PREFERENCE, ImageFormat
+from core.models import PhotoSize, CatalogChange
+from .snapshot import encode_json, ITERATOR_CHUNK_SIZE
+from .summaries import size_variants
+
+
+# New fields go at the end, so clients reading rows by position keep working
+MANIFEST_FIELDS = ["photo", "size", "md5", "bytes", "format"]
+FILE_CHUNK_SIZE = 64 * 1024
+
+
+def public_renditions():
+    """Renditions of published photos in public sizes."""
+    return PhotoSize.objects.filter(photo___published=True, size__public=True).order_by("photo_id", "size__max_dimension")
+
+
+def accepted_format(request, formats) -> str:
+    """
+    Pick the best image format in `formats` that the request's Accept header
+    names explicitly, falling back to JPEG.
+
+    WebP and AVIF are only sent to clients that list them: some clients
+    send `*/*` or `image/*` without being able to decode them.
+    """
+    header = request.headers.get("Accept", "")
+    qualities = {}
+    for item in header.split(","):
+        media_type, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if media_type:
+            qualities[media_type.strip().lower()] = quality
+
+    for format in FORMAT_PREFERENCE:
+        if format in formats and qualities.get(CONTENT_TYPES[format], 0) > 0:
+            return format
+    return ImageFormat.JPEG
+
+
+def latest_change_cursor() -> int:
+    return CatalogChange.settled_cursor()
+
+
+def stream_manifest():
+    """
+    Yield a compact JSON manifest of every public rendition.
+
+    Each file is a `[photo uuid, size slug, md5, bytes, format]` row rather than
+    an object, which keeps a 100k-row manifest to a few megabytes. Renditions
+    stored in several formats get a row per format, JPEG first.
+    """
+    yield f'{{"cursor":{encode_json(latest_change_cursor())},"fields":{encode_json(MANIFEST_FIELDS)},"renditions":['.encode()
+
+    rows = public_renditions().values_list("photo__uuid", "size__slug", "md5", "file_size", "variants")
+    buffer = []
+    separator = ""
+    for photo_uuid, slug, md5, file_size, variants in rows.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+        for variant in size_variants(md5, file_size, variants):
+            row = [photo_uuid, slug, variant["md5"], variant["file_size"], variant["format"]]
+            buffer.append(separator + encode_json(row))
+            separator = ","
+        if len(buffer) >= ITERATOR_CHUNK_SIZE:
+            yield "".join(buffer).encode()
+            buffer = []
+
+    buffer.append("]}")
+    yield "".join(buffer).encode()
+
+
+def renditions_changed_since(cursor: int):
+    """
+    Public renditions whose photo or size has been created or updated after
+    the given change feed cursor.
+    """
+    changes = CatalogChange.objects.filter(id__gt=cursor).exclude(action=CatalogChange.Action.DELETED)
+    photo_uuids = changes.filter(entity_type=CatalogChange.EntityType.PHOTO).values("entity_uuid")
+    size_uuids = changes.filter(entity_type=CatalogChange.EntityType.SIZE).values("entity_uuid")
+    return public_renditions().filter(Q(photo__uuid__in=photo_uuids) | Q(size__uuid__in=size_uuids))
+
+
+def requested_renditions(pairs):
+    """
+    Public renditions matching a list of `(photo uuid, size slug)` pairs.
+    """
+    wanted = {(str(photo), size) for photo, size in pairs}
+    candidates = public_renditions().filter(
+        photo__uuid__in={photo for photo, _ in wanted},
+        size__slug__in={size for _, size in wanted},
+    ).select_related("photo", "size")
+    return [ps for ps in candidates if (str(ps.photo.uuid), ps.size.slug) in wanted]
+
+
+def rendition_archive_name(photo_size, format: str = ImageFormat.JPEG) -> str:
+    return f"{photo_size.photo.uuid}/{photo_size.size.slug}.{EXTENSIONS[format]}"
+
+
+def _tar_member(name: str, file):
+    """Yield a tar member for a storage file, or nothing if it's missing."""
+    try:
+        size = file.size
+        image = file.open("rb")
+    except (OSError, ValueError):
+        return
+
+    info = tarfile.TarInfo(name)
+    info.size = size
+    info.mtime = int(time.time())
+    info.mode = 0o644
+    yield info.tobuf(format=tarfile.PAX_FORMAT)
+
+    remaining = size
+    with image:
+        while remaining > 0:
+            chunk = image.read(min(FILE_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    if remaining:
+        # The file shrank underneath us; pad so the archive stays well-formed
+        yield tarfile.NUL * remaining
+
+    padding = -size % tarfile.BLOCKSIZE
+    if padding:
+        yield tarfile.NUL * padding
+
+
+def stream_tar(photo_sizes):
+    """
+    Yield an uncompressed tar archive of the given renditions, with a member
+    for each format they are stored in.
+
+    Headers are built with tarfile but file bodies are copied straight from
+    storage FILE_CHUNK_SIZE bytes at a time, so at most one chunk of one file
+    is held in memory. Files that are missing are skipped.
+    """
+    for photo_size in photo_sizes:
+        for format in photo_size.formats:
+            yield from _tar_member(rendition_archive_name(photo_size, format), photo_size.get_file(format))
+
+    # End-of-archive marker
+    yield tarfile.NUL * (tarfile.BLOCKSIZE * 2)
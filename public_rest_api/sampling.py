@@ -0,0 +1,67 @@
+import math
+from django.db.models import Case, Max, Min, Value, When
+
+
+# Candidate ids per probe query, kept under SQLite's bound parameter limit
+MAX_CANDIDATES = 500
+PROBE_ROUNDS = 4
+# Below this many ids the id range is cheaper to list than to probe
+MIN_PROBE_SPAN = 10000
+MIN_HIT_RATE = 0.01
+
+
+def sample_ids(queryset, count: int, rng) -> list:
+    """
+    Pick up to `count` distinct primary keys from `queryset`, uniformly at random.
+
+    Rather than sorting the table randomly, random ids are drawn from the
+    model's primary key range and looked up through the primary key index,
+    keeping those that match the queryset. Each round sizes its batch by the
+    previous round's hit rate. When the range is small, or probing keeps
+    missing (a queryset matching few rows), the matching ids are listed and
+    sampled directly instead.
+    """
+    if count <= 0:
+        return []
+
+    bounds = queryset.model.objects.aggregate(low=Min("pk"), high=Max("pk"))
+    low, high = bounds["low"], bounds["high"]
+    if low is None:
+        return []
+
+    chosen = []
+    span = high - low + 1
+    if span >= MIN_PROBE_SPAN:
+        probed = set()
+        hit_rate = 1.0
+        for _ in range(PROBE_ROUNDS):
+            need = count - len(chosen)
+            if need <= 0:
+                return chosen
+
+            batch = min(MAX_CANDIDATES, math.ceil(need / hit_rate * 1.25), span - len(probed))
+            if batch <= 0:
+                break
+            candidates = []
+            while len(candidates) < batch:
+                pk = rng.randint(low, high)
+                if pk not in probed:
+                    probed.add(pk)
+                    candidates.append(pk)
+
+            found = set(queryset.filter(pk__in=candidates).values_list("pk", flat=True))
+            hits = [pk for pk in candidates if pk in found]
+            chosen.extend(hits[:need])
+            hit_rate = max(len(hits) / len(candidates), MIN_HIT_RATE)
+
+        if len(chosen) >= count:
+            return chosen
+
+    remaining = sorted(set(queryset.values_list("pk", flat=True)) - set(chosen))
+    return chosen + rng.sample(remaining, min(count - len(chosen), len(remaining)))
+
+
+def in_given_order(queryset, pks: list):
+    """Restrict `queryset` to `pks`, ordered as they are listed."""
+    ordering = Case(*[When(pk=pk, then=Value(position)) for position, pk in enumerate(pks)])
+    return queryset.filter(pk__in=pks).order_by(ordering)
@@ -1,16 +1,147 @@
-from core.models import Photo, Size, Album, Tag, PhotoMetadata, PhotoTag, PhotoSize
+from core.models import Photo, Size, Album, Tag, PhotoMetadata, PhotoTag, PhotoSize, CatalogChange
+from django.db.models import Prefetch
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from drf_spectacular.utils import extend_schema_field
+from .summaries import PHOTO_SUMMARY_FIELDS, photo_summaries, model_summaries, size_variants
+from core.rendering import RENDER_FITS
+from core.formats import ImageFormat, EXTRA_FORMATS
+
+
+PUBLIC_SIZES_ATTR = "public_sizes"
+
+
+def public_sizes_prefetch():
+    """
+    Prefetch a photo's public sizes (with their Size rows) into `photo.public_sizes`.
+
+    Apply this to any Photo queryset handed to PhotoSummarySerializer or
+    PhotoSerializer so that sizes are loaded in one query for the whole page
+    instead of one query per photo.
+    """
+    return Prefetch(
+        "sizes",
+        queryset=PhotoSize.objects.filter(size__public=True).select_related("size"),
+        to_attr=PUBLIC_SIZES_ATTR,
+    )
+
+
+def get_public_sizes(photo):
+    """
+    Return the public sizes of a photo, using the prefetched list when available.
+    """
+    if hasattr(photo, PUBLIC_SIZES_ATTR):
+        return getattr(photo, PUBLIC_SIZES_ATTR)
+    return photo.sizes.filter(size__public=True).select_related("size")
+
+
+def query_param_names(request, param: str, prefix: str = "") -> set:
+    """
+    Parse a comma-separated field list such as `?fields=uuid,title,photos.uuid`.
+
+    Only entries starting with `prefix` are considered, and only the first
+    segment after it is returned, so `photos.uuid` yields `photos` at the top
+    level and `uuid` for the nested "photos." serializer.
+    """
+    if not request:
+        return set()
+
+    names = set()
+    for raw in request.query_params.getlist(param):
+        for item in raw.split(","):
+            item = item.strip()
+            if item and item.startswith(prefix) and len(item) > len(prefix):
+                names.add(item[len(prefix):].split(".", 1)[0])
+    return names
+
+
+def include_sizes_requested(request, prefix: str = "") -> bool:
+    """
+    Whether photo summaries should embed sizes, via `?include_sizes=true` or
+    by expanding `sizes`.
+    """
+    if not request:
+        return False
+    if request.query_params.get("include_sizes", "").lower() == "true":
+        return True
+    return "sizes" in query_param_names(request, "expand", prefix)
+
+
+class SparseFieldsMixin:
+    """
+    Select output fields from the request with `?fields=` and `?expand=`.
+
+    Fields listed in `expandable_fields` are left out unless expanded (or named
+    in `?fields=`); when `?fields=` is given only the named fields are kept.
+    Unselected fields are dropped when the serializer is built, so their
+    method fields and related lookups never run. Nested serializers pass a
+    `field_prefix` such as "photos." to read their own dotted entries.
+    `all_fields` keeps every field, for documenting the schema.
+    """
+    expandable_fields = ()
+
+    def __init__(self, *args, field_prefix: str = "", all_fields: bool = False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.field_prefix = field_prefix
+        if all_fields:
+            return
+
+        selected = self.selected_fields(self.context.get("request"), field_prefix)
+        for name in list(self.fields):
+            if name not in selected:
+                self.fields.pop(name)
+
+    @classmethod
+    def selected_fields(cls, request, prefix: str = "") -> set:
+        declared = set(cls.Meta.fields)
+        requested = query_param_names(request, "fields", prefix)
+        if requested:
+            return declared & requested
+
+        expanded = query_param_names(request, "expand", prefix)
+        return (declared - set(cls.expandable_fields)) | (declared & expanded)
+
+
+def photo_location(photo):
+    if photo.hide_location:
+        return None
+    if photo.latitude is not None and photo.longitude is not None:
+        return {
+            "latitude": photo.latitude,
+            "longitude": photo.longitude
+        }
+    return None
+
+
+FIELDS_PARAM_DESCRIPTION = (
+    "Comma-separated list of fields to return. Use dotted names (e.g. `photos.uuid`) "
+    "to select fields of nested photo summaries."
+)
+EXPAND_PARAM_DESCRIPTION = (
+    "Comma-separated list of optional fields to include. Photo summaries can expand "
+    "`sizes`, `metadata`, `albums`, `tags` and `location` (dotted, e.g. `photos.tags`, when nested)."
+)
+
+
+class PhotoSizeVariantSerializer(serializers.Serializer):
+    format = serializers.ChoiceField(choices=ImageFormat.choices)
+    content_type = serializers.CharField()
+    md5 = serializers.CharField(allow_null=True)
+    file_size = serializers.IntegerField(allow_null=True, help_text="Size of the image file in bytes")
 
 
 class PhotoSizeSerializer(serializers.ModelSerializer):
     uuid = serializers.UUIDField(source='size.uuid', read_only=True)
     slug = serializers.CharField(source='size.slug', read_only=True)
+    variants = serializers.SerializerMethodField()
 
     class Meta:
         model = PhotoSize
-        fields = ["uuid", "slug", "height", "width", "md5"]
+        fields = ["uuid", "slug", "height", "width", "md5", "variants"]
+
+    @extend_schema_field(PhotoSizeVariantSerializer(many=True))
+    def get_variants(self, obj):
+        return size_variants(obj.md5, obj.file_size, obj.variants)
 
 
 class PhotoMetadataSerializer(serializers.ModelSerializer):
@@ -19,41 +150,132 @@ class PhotoMetadataSerializer(serializers.ModelSerializer):
         exclude = ['uuid', 'id', 'photo', "raw_latitude", "raw_longitude"]
 
 
-class AlbumSummarySerializer(serializers.ModelSerializer):
+class AlbumSummarySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Album
         fields = ["uuid", "slug", "title", "short_description"]
 
 
-class TagSummarySerializer(serializers.ModelSerializer):
+class TagSummarySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Tag
         fields = ["uuid", "name"]
 
 
-class PhotoSummarySerializer(serializers.ModelSerializer):
+class LocationSerializer(serializers.Serializer):
+    latitude = serializers.FloatField()
+    longitude = serializers.FloatField()
+
+
+PLACEHOLDER_FIELD_KWARGS = {
+    "blurhash": {"help_text": "BlurHash (4x3 components) to show until an image loads; null until sizes are generated"},
+    "dominant_color": {"help_text": "Dominant colour of the image as #rrggbb; null until sizes are generated"},
+}
+
+
+class PhotoSummarySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     sizes = serializers.SerializerMethodField()
+    metadata = PhotoMetadataSerializer(read_only=True)
+    albums = AlbumSummarySerializer(many=True, read_only=True)
+    tags = TagSummarySerializer(many=True, read_only=True)
+    location = serializers.SerializerMethodField()
+
+    expandable_fields = ("metadata", "albums", "tags", "location")
 
     @extend_schema_field(PhotoSizeSerializer(many=True))
     def get_sizes(self, obj):
-        request = self.context.get("request")
-
-        include_sizes = False
-        if request:
-            include_sizes = request.query_params.get("include_sizes", "").lower() == "true"
-
-        if not include_sizes:
+        if not include_sizes_requested(self.context.get("request"), self.field_prefix):
             return []
 
-        public_sizes = obj.sizes.filter(size__public=True)
-        return PhotoSizeSerializer(public_sizes, many=True).data
+        return PhotoSizeSerializer(get_public_sizes(obj), many=True).data
+
+    @extend_schema_field(LocationSerializer(allow_null=True))
+    def get_location(self, obj):
+        return photo_location(obj)
 
     class Meta:
         model = Photo
-        fields = ["uuid", "title", "slug", "publish_date", "sizes"]
+        fields = [
+            "uuid", "title", "slug", "publish_date", "blurhash", "dominant_color",
+            "sizes", "metadata", "albums", "tags", "location",
+        ]
+        extra_kwargs = PLACEHOLDER_FIELD_KWARGS
+
 
+def fast_summaries(queryset, serializer_class, request, prefix: str = ""):
+    """
+    Build summary output for `queryset` from values() rows instead of model
+    instances, for the fields the request selected. Output is identical to
+    `serializer_class(queryset, many=True).data`.
 
-class AlbumSerializer(serializers.ModelSerializer):
+    Returns None when the fast path doesn't cover the serializer or the
+    selected fields; callers then fall back to the serializer.
+    """
+    selected = serializer_class.selected_fields(request, prefix)
+    fields = [name for name in serializer_class.Meta.fields if name in selected]
+
+    if serializer_class is PhotoSummarySerializer:
+        if not selected <= PHOTO_SUMMARY_FIELDS:
+            return None
+        return photo_summaries(queryset, fields, include_sizes_requested(request, prefix))
+    if serializer_class in (AlbumSummarySerializer, TagSummarySerializer):
+        return model_summaries(queryset, fields)
+    return None
+
+
+def plan_photo_queryset(queryset, serializer_class, request, prefix: str = "", sizes: bool = True):
+    """
+    Add the joins and prefetches a photo serializer needs for the fields the
+    request selected, and nothing more. `sizes` says whether sizes will be
+    embedded if the field is selected.
+    """
+    fields = serializer_class.selected_fields(request, prefix)
+    if "metadata" in fields:
+        queryset = queryset.select_related("metadata")
+    for relation in ("albums", "tags"):
+        if relation in fields:
+            queryset = queryset.prefetch_related(relation)
+    if "sizes" in fields and sizes:
+        queryset = queryset.prefetch_related(public_sizes_prefetch())
+    return queryset
+
+
+def album_order_options(request) -> dict:
+    """
+    Album ordering options from the `sort_method`, `sort_descending`, `seed`
+    and `recursive` query parameters, as keyword arguments for
+    Album.get_ordered_photos. Raises ValidationError for invalid values.
+    """
+    options = {"sort_method": None, "sort_descending": None, "seed": None, "recursive": False}
+    if not request:
+        return options
+
+    raw_sort = request.query_params.get("sort_method")
+    if raw_sort is not None:
+        try:
+            options["sort_method"] = Album.AlbumSortMethod(raw_sort.upper())
+        except ValueError:
+            valid = [m.value for m in Album.AlbumSortMethod]
+            raise ValidationError(
+                {"sort_method": f"Invalid sort method '{raw_sort}'. Must be one of: {', '.join(valid)}."}
+            )
+
+    raw_desc = request.query_params.get("sort_descending")
+    if raw_desc is not None:
+        options["sort_descending"] = raw_desc.lower() == "true"
+
+    raw_seed = request.query_params.get("seed")
+    if raw_seed is not None:
+        try:
+            options["seed"] = int(raw_seed)
+        except ValueError:
+            raise ValidationError({"seed": f"Invalid seed '{raw_seed}'. Must be an integer."})
+
+    options["recursive"] = request.query_params.get("recursive", "").lower() == "true"
+    return options
+
+
+class AlbumSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     photos = serializers.SerializerMethodField()
     parent = serializers.SerializerMethodField()
     children = serializers.SerializerMethodField()
@@ -65,34 +287,16 @@ class AlbumSerializer(serializers.ModelSerializer):
     @extend_schema_field(PhotoSummarySerializer(many=True))
     def get_photos(self, obj):
         request = self.context.get("request")
+        photos = obj.get_ordered_photos(public_only=True, **album_order_options(request))
+        summaries = fast_summaries(photos, PhotoSummarySerializer, request, "photos.")
+        if summaries is not None:
+            return summaries
+
+        photos = plan_photo_queryset(
+            photos, PhotoSummarySerializer, request, "photos.", sizes=include_sizes_requested(request, "photos.")
+        )
 
-        sort_method = None
-        sort_descending = None
-
-        if request:
-            raw_sort = request.query_params.get("sort_method")
-            if raw_sort is not None:
-                try:
-                    sort_method = Album.AlbumSortMethod(raw_sort.upper())
-                except ValueError:
-                    valid = [m.value for m in Album.AlbumSortMethod]
-                    raise ValidationError(
-                        {"sort_method": f"Invalid sort method '{raw_sort}'. Must be one of: {', '.join(valid)}."}
-                    )
-
-            raw_desc = request.query_params.get("sort_descending")
-            if raw_desc is not None:
-                sort_descending = raw_desc.lower() == "true"
-
-        recursive = False
-        if request:
-            recursive = request.query_params.get("recursive", "").lower() == "true"
-
-        return PhotoSummarySerializer(
-            obj.get_ordered_photos(public_only=True, sort_method=sort_method, sort_descending=sort_descending, recursive=recursive),
-            many=True,
-            context=self.context
-        ).data
+        return PhotoSummarySerializer(photos, many=True, context=self.context, field_prefix="photos.").data
     
     @extend_schema_field(AlbumSummarySerializer(allow_null=True))
     def get_parent(self, obj):
@@ -105,7 +309,27 @@ class AlbumSerializer(serializers.ModelSerializer):
         return AlbumSummarySerializer(obj.children.all(), many=True).data
 
 
-class TagSerializer(serializers.ModelSerializer):
+class PhotoNeighborsSerializer(serializers.Serializer):
+    previous = PhotoSummarySerializer(allow_null=True)
+    next = PhotoSummarySerializer(allow_null=True)
+
+
+class AlbumTreeSerializer(serializers.ModelSerializer):
+    children = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Album
+        fields = ["uuid", "slug", "title", "short_description", "children"]
+
+    def get_children(self, obj):
+        return AlbumTreeSerializer(obj.children.order_by("title"), many=True, context=self.context).data
+
+
+# Annotated after the class so the schema can refer to itself
+extend_schema_field(AlbumTreeSerializer(many=True))(AlbumTreeSerializer.get_children)
+
+
+class TagSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     photos = serializers.SerializerMethodField()
 
     class Meta:
@@ -114,15 +338,21 @@ class TagSerializer(serializers.ModelSerializer):
 
     @extend_schema_field(PhotoSummarySerializer(many=True))
     def get_photos(self, obj):
-        return PhotoSummarySerializer(obj.photos.filter(_published=True), many=True, context=self.context).data
+        request = self.context.get("request")
+        photos = obj.photos.filter(_published=True)
+        summaries = fast_summaries(photos, PhotoSummarySerializer, request, "photos.")
+        if summaries is not None:
+            return summaries
 
+        photos = plan_photo_queryset(
+            photos, PhotoSummarySerializer, request, "photos.",
+            sizes=include_sizes_requested(request, "photos."),
+        )
 
-class LocationSerializer(serializers.Serializer):
-    latitude = serializers.FloatField()
-    longitude = serializers.FloatField()
+        return PhotoSummarySerializer(photos, many=True, context=self.context, field_prefix="photos.").data
 
 
-class PhotoSerializer(serializers.ModelSerializer):
+class PhotoSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     metadata = PhotoMetadataSerializer(read_only=True)
     albums = AlbumSummarySerializer(many=True, read_only=True)
     tags = TagSummarySerializer(many=True, read_only=True)
@@ -131,31 +361,76 @@ class PhotoSerializer(serializers.ModelSerializer):
 
     @extend_schema_field(PhotoSizeSerializer(many=True))
     def get_sizes(self, obj):
-        public_sizes = obj.sizes.filter(size__public=True)
-        return PhotoSizeSerializer(public_sizes, many=True).data
+        return PhotoSizeSerializer(get_public_sizes(obj), many=True).data
     
     @extend_schema_field(LocationSerializer(allow_null=True))
     def get_location(self, obj):
-        if obj.hide_location:
-            return None
-        if obj.latitude is not None and obj.longitude is not None:
-            return {
-                "latitude": obj.latitude,
-                "longitude": obj.longitude
-            }
-        return None
+        return photo_location(obj)
 
     class Meta:
         model = Photo
         fields = [
-            "uuid", "title", "slug", "description", "custom_attributes", "publish_date", "albums", "tags", "metadata", "sizes", "location", "created_at", "updated_at"
+            "uuid", "title", "slug", "description", "custom_attributes", "publish_date", "blurhash", "dominant_color",
+            "albums", "tags", "metadata", "sizes", "location", "created_at", "updated_at"
         ]
+        extra_kwargs = PLACEHOLDER_FIELD_KWARGS
+
+
+class PhotoClusterSerializer(serializers.Serializer):
+    count = serializers.IntegerField()
+    latitude = serializers.FloatField()
+    longitude = serializers.FloatField()
+    photo = serializers.UUIDField(help_text="A representative photo in the cluster")
+
+
+class FacetCountSerializer(serializers.Serializer):
+    value = serializers.CharField()
+    count = serializers.IntegerField()
+
+
+class YearFacetSerializer(FacetCountSerializer):
+    value = serializers.IntegerField()
+
+
+class TagFacetSerializer(serializers.Serializer):
+    uuid = serializers.UUIDField()
+    name = serializers.CharField()
+    count = serializers.IntegerField()
+
+
+class AlbumFacetSerializer(serializers.Serializer):
+    uuid = serializers.UUIDField()
+    title = serializers.CharField()
+    count = serializers.IntegerField()
+
+
+class FacetsSerializer(serializers.Serializer):
+    total = serializers.IntegerField()
+    cameras = FacetCountSerializer(many=True)
+    lenses = FacetCountSerializer(many=True)
+    tags = TagFacetSerializer(many=True)
+    albums = AlbumFacetSerializer(many=True)
+    years = YearFacetSerializer(many=True)
+
 
+class TimelineBucketSerializer(serializers.Serializer):
+    date = serializers.DateField(help_text="First day of the bucket")
+    count = serializers.IntegerField()
+    photos = serializers.ListField(
+        child=serializers.UUIDField(), required=False,
+        help_text="The earliest photos in the bucket, when requested",
+    )
+
+
+class SizeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    formats = serializers.ListField(
+        child=serializers.ChoiceField(choices=[(format.value, format.label) for format in EXTRA_FORMATS]),
+        read_only=True, help_text="Formats produced alongside JPEG",
+    )
 
-class SizeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Size
-        fields = ["uuid", "slug", "max_dimension", "square_crop", "created_at", "updated_at"]
+        fields = ["uuid", "slug", "max_dimension", "square_crop", "formats", "created_at", "updated_at"]
 
 
 class SiteHealthSerializer(serializers.Serializer):
@@ -163,3 +438,54 @@ class SiteHealthSerializer(serializers.Serializer):
     photos_pending_sizes = serializers.IntegerField()
     pending_sizes = serializers.IntegerField()
     pending_metadata = serializers.IntegerField()
+
+
+class CatalogChangeSerializer(serializers.ModelSerializer):
+    cursor = serializers.IntegerField(source="id", read_only=True)
+    entity = serializers.CharField(source="entity_type", read_only=True)
+    uuid = serializers.UUIDField(source="entity_uuid", read_only=True)
+
+    class Meta:
+        model = CatalogChange
+        fields = ["cursor", "entity", "uuid", "action", "timestamp"]
+
+
+class ChangeFeedSerializer(serializers.Serializer):
+    changes = CatalogChangeSerializer(many=True)
+    cursor = serializers.IntegerField(help_text="Pass as `since` to fetch the next page.")
+    has_more = serializers.BooleanField()
+
+
+class PhotoBatchRequestSerializer(serializers.Serializer):
+    MAX_UUIDS = 500
+
+    uuids = serializers.ListField(child=serializers.UUIDField(), allow_empty=False, max_length=MAX_UUIDS)
+
+
+class RenderRequestSerializer(serializers.Serializer):
+    MAX_DIMENSION = 4096
+
+    w = serializers.IntegerField(min_value=1, max_value=MAX_DIMENSION, required=False, help_text="Maximum width in pixels")
+    h = serializers.IntegerField(min_value=1, max_value=MAX_DIMENSION, required=False, help_text="Maximum height in pixels")
+    fit = serializers.ChoiceField(
+        choices=RENDER_FITS, default="contain",
+        help_text="`contain` fits the photo inside w x h; `cover` fills it, cropping the overflow.",
+    )
+
+    def validate(self, attrs):
+        if "w" not in attrs and "h" not in attrs:
+            raise ValidationError("At least one of w and h is required.")
+        return attrs
+
+
+class RenderURLSerializer(serializers.Serializer):
+    url = serializers.URLField(help_text="Signed render URL, usable without an API key")
+
+
+class RenditionRequestSerializer(serializers.Serializer):
+    photo = serializers.UUIDField()
+    size = serializers.CharField(max_length=32)
+
+
+class RenditionArchiveRequestSerializer(serializers.Serializer):
+    renditions = RenditionRequestSerializer(many=True, allow_empty=False, max_length=5000)
@@ -0,0 +1,190 @@
+import json
+from collections import defaultdict
+from operator import itemgetter
+from rest_framework.utils.encoders import JSONEncoder
+from core.models import Photo, PhotoMetadata, PhotoSize, Size, Album, PhotoInAlbum, Tag, PhotoTag, CatalogChange
+from .summaries import size_variants
+
+
+# Mirrors PhotoMetadataSerializer
+METADATA_FIELDS = [
+    f.name for f in PhotoMetadata._meta.concrete_fields
+    if f.name not in ("id", "uuid", "photo", "raw_latitude", "raw_longitude")
+]
+
+PHOTO_FIELDS = [
+    "id", "uuid", "title", "slug", "description", "custom_attributes", "publish_date", "blurhash", "dominant_color",
+    "latitude", "longitude", "hide_location", "created_at", "updated_at", "metadata__id",
+] + [f"metadata__{name}" for name in METADATA_FIELDS]
+
+ITERATOR_CHUNK_SIZE = 500
+STREAM_BUFFER_SIZE = 64 * 1024
+
+
+def encode_json(value) -> str:
+    return json.dumps(value, cls=JSONEncoder, ensure_ascii=False)
+
+
+def _stream_array(items):
+    """Yield a JSON array one encoded element at a time."""
+    yield "["
+    for index, item in enumerate(items):
+        if index:
+            yield ","
+        yield encode_json(item)
+    yield "]"
+
+
+def _public_sizes():
+    return Size.objects.filter(public=True).order_by("max_dimension").values(
+        "uuid", "slug", "max_dimension", "square_crop", "formats", "created_at", "updated_at"
+    )
+
+
+def _photos():
+    """
+    Published photos with their public sizes and metadata.
+
+    Photos and sizes are both read in photo id order and merged as they
+    stream, so neither list has to be held in memory.
+    """
+    photos = Photo.objects.filter(_published=True).order_by("id").values(*PHOTO_FIELDS)
+    sizes = (
+        PhotoSize.objects.filter(photo___published=True, size__public=True)
+        .order_by("photo_id", "size__max_dimension")
+        .values_list("photo_id", "size__uuid", "size__slug", "height", "width", "md5", "file_size", "variants")
+        .iterator(chunk_size=ITERATOR_CHUNK_SIZE)
+    )
+    pending_size = next(sizes, None)
+
+    for row in photos.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+        photo_sizes = []
+        while pending_size is not None and pending_size[0] <= row["id"]:
+            if pending_size[0] == row["id"]:
+                _, uuid, slug, height, width, md5, file_size, variants = pending_size
+                photo_sizes.append({
+                    "uuid": uuid, "slug": slug, "height": height, "width": width, "md5": md5,
+                    "variants": size_variants(md5, file_size, variants),
+                })
+            pending_size = next(sizes, None)
+
+        location = None
+        if not row["hide_location"] and row["latitude"] is not None and row["longitude"] is not None:
+            location = {"latitude": row["latitude"], "longitude": row["longitude"]}
+
+        metadata = None
+        if row["metadata__id"] is not None:
+            metadata = {name: row[f"metadata__{name}"] for name in METADATA_FIELDS}
+
+        yield {
+            "uuid": row["uuid"],
+            "title": row["title"],
+            "slug": row["slug"],
+            "description": row["description"],
+            "custom_attributes": row["custom_attributes"],
+            "publish_date": row["publish_date"],
+            "blurhash": row["blurhash"],
+            "dominant_color": row["dominant_color"],
+            "metadata": metadata,
+            "sizes": photo_sizes,
+            "location": location,
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        }
+
+
+def _order_members(members, sort_method, descending):
+    """Order album memberships like Album.get_ordered_photos, with nulls last."""
+    field = {
+        Album.AlbumSortMethod.PUBLISHED: "photo__publish_date",
+        Album.AlbumSortMethod.CREATED: "photo__metadata__capture_date",
+    }.get(sort_method)
+    if field is None:
+        return members
+
+    dated = sorted((m for m in members if m[field] is not None), key=itemgetter(field), reverse=descending)
+    return dated + [m for m in members if m[field] is None]
+
+
+def _albums():
+    """
+    Albums with the uuids of their published photos, in each album's own sort
+    order. RANDOM albums are listed in manual order and left to the client to shuffle.
+    """
+    memberships = defaultdict(list)
+    for membership in (
+        PhotoInAlbum.objects.filter(photo___published=True)
+        .order_by("album_id", "order")
+        .values("album_id", "order", "photo__uuid", "photo__publish_date", "photo__metadata__capture_date")
+    ):
+        memberships[membership["album_id"]].append(membership)
+
+    for album in Album.objects.order_by("title").values(
+        "id", "uuid", "title", "slug", "short_description", "description", "sort_method",
+        "sort_descending", "parent__uuid", "custom_attributes", "created_at", "updated_at",
+    ):
+        members = _order_members(memberships.get(album["id"], []), album["sort_method"], album["sort_descending"])
+
+        yield {
+            "uuid": album["uuid"],
+            "title": album["title"],
+            "slug": album["slug"],
+            "short_description": album["short_description"],
+            "description": album["description"],
+            "sort_method": album["sort_method"],
+            "sort_descending": album["sort_descending"],
+            "parent": album["parent__uuid"],
+            "photos": [m["photo__uuid"] for m in members],
+            "custom_attributes": album["custom_attributes"],
+            "created_at": album["created_at"],
+            "updated_at": album["updated_at"],
+        }
+
+
+def _tags():
+    tag_photos = defaultdict(list)
+    for tag_id, photo_uuid in (
+        PhotoTag.objects.filter(photo___published=True)
+        .order_by("tag_id", "photo_id")
+        .values_list("tag_id", "photo__uuid")
+    ):
+        tag_photos[tag_id].append(photo_uuid)
+
+    for tag in Tag.objects.order_by("name").values("id", "uuid", "name"):
+        yield {"uuid": tag["uuid"], "name": tag["name"], "photos": tag_photos.get(tag["id"], [])}
+
+
+def _snapshot_parts(version: int):
+    cursor = CatalogChange.settled_cursor()
+
+    yield f'{{"version":{encode_json(version)},"cursor":{encode_json(cursor)},"sizes":'
+    yield from _stream_array(_public_sizes())
+    yield ',"photos":'
+    yield from _stream_array(_photos())
+    yield ',"albums":'
+    yield from _stream_array(_albums())
+    yield ',"tags":'
+    yield from _stream_array(_tags())
+    yield "}"
+
+
+def stream_snapshot(version: int):
+    """
+    Yield the whole published catalog as one JSON document, in byte chunks of
+    roughly STREAM_BUFFER_SIZE.
+
+    `cursor` is the change feed position the snapshot was taken at; passing it
+    to /api/changes/ picks up everything that changed afterwards.
+    """
+    buffer = []
+    buffered = 0
+    for part in _snapshot_parts(version):
+        encoded = part.encode()
+        buffer.append(encoded)
+        buffered += len(encoded)
+        if buffered >= STREAM_BUFFER_SIZE:
+            yield b"".join(buffer)
+            buffer = []
+            buffered = 0
+    if buffer:
+        yield b"".join(buffer)
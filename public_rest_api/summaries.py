@@ -0,0 +1,139 @@
+from collections import defaultdict
+from rest_framework import serializers
+from core.formats import CONTENT_TYPES, ImageFormat
+from core.models import Album, PhotoSize, PhotoInAlbum, PhotoTag
+
+
+# Photo summary fields that can be built from values() rows. Anything else
+# (currently only metadata) is left to PhotoSummarySerializer.
+PHOTO_SUMMARY_FIELDS = {
+    "uuid", "title", "slug", "publish_date", "blurhash", "dominant_color", "sizes", "albums", "tags", "location",
+}
+
+PHOTO_COLUMNS = (
+    "id", "uuid", "title", "slug", "publish_date", "blurhash", "dominant_color", "latitude", "longitude", "hide_location",
+)
+
+# Formats datetimes exactly like the serializers do (timezone, format setting)
+_datetime_field = serializers.DateTimeField()
+
+
+def _group_by_photo(rows, build):
+    grouped = defaultdict(list)
+    for row in rows:
+        grouped[row[0]].append(build(row))
+    return grouped
+
+
+def size_variants(md5, file_size, variants: dict) -> list:
+    """Every format a rendition is available in, JPEG first, from a PhotoSize's columns."""
+    jpeg = {"format": ImageFormat.JPEG.value, "content_type": CONTENT_TYPES[ImageFormat.JPEG], "md5": md5, "file_size": file_size}
+    return [jpeg, *(
+        {"format": format, "content_type": CONTENT_TYPES[format], "md5": variant["md5"], "file_size": variant["file_size"]}
+        for format, variant in variants.items()
+    )]
+
+
+def _public_sizes(photo_ids):
+    rows = (
+        PhotoSize.objects.filter(photo_id__in=photo_ids, size__public=True)
+        .order_by("size__max_dimension")
+        .values_list("photo_id", "size__uuid", "size__slug", "height", "width", "md5", "file_size", "variants")
+    )
+    return _group_by_photo(rows, lambda row: {
+        "uuid": str(row[1]), "slug": row[2], "height": row[3], "width": row[4], "md5": row[5],
+        "variants": size_variants(row[5], row[6], row[7]),
+    })
+
+
+def _albums(photo_ids):
+    rows = (
+        PhotoInAlbum.objects.filter(photo_id__in=photo_ids)
+        .order_by("album_id")
+        .values_list("photo_id", "album__uuid", "album__slug", "album__title", "album__short_description")
+    )
+    return _group_by_photo(rows, lambda row: {
+        "uuid": str(row[1]), "slug": row[2], "title": row[3], "short_description": row[4],
+    })
+
+
+def _tags(photo_ids):
+    rows = (
+        PhotoTag.objects.filter(photo_id__in=photo_ids)
+        .order_by("tag__name")
+        .values_list("photo_id", "tag__uuid", "tag__name")
+    )
+    return _group_by_photo(rows, lambda row: {"uuid": str(row[1]), "name": row[2]})
+
+
+def _location(row):
+    if row["hide_location"] or row["latitude"] is None or row["longitude"] is None:
+        return None
+    return {"latitude": row["latitude"], "longitude": row["longitude"]}
+
+
+def photo_summaries(queryset, fields, include_sizes: bool) -> list:
+    """
+    Build photo summaries for `queryset` from values() rows.
+
+    `fields` are the selected PhotoSummarySerializer fields, in output order.
+    Related rows are read with one query per relation, like the prefetches the
+    serializer path uses, but no model instances or serializer fields are built.
+    """
+    rows = list(queryset.prefetch_related(None).values(*PHOTO_COLUMNS))
+    photo_ids = [row["id"] for row in rows]
+
+    sizes = _public_sizes(photo_ids) if "sizes" in fields and include_sizes else {}
+    albums = _albums(photo_ids) if "albums" in fields else {}
+    tags = _tags(photo_ids) if "tags" in fields else {}
+
+    builders = {
+        "uuid": lambda row: str(row["uuid"]),
+        "title": lambda row: row["title"],
+        "slug": lambda row: row["slug"],
+        "publish_date": lambda row: _datetime_field.to_representation(row["publish_date"]),
+        "blurhash": lambda row: row["blurhash"],
+        "dominant_color": lambda row: row["dominant_color"],
+        "sizes": lambda row: sizes.get(row["id"], []),
+        "albums": lambda row: albums.get(row["id"], []),
+        "tags": lambda row: tags.get(row["id"], []),
+        "location": _location,
+    }
+    columns = [(name, builders[name]) for name in fields]
+
+    return [{name: build(row) for name, build in columns} for row in rows]
+
+
+def model_summaries(queryset, fields) -> list:
+    """
+    Build summaries of plain model columns (album and tag summaries) from values() rows.
+    """
+    rows = list(queryset.values(*fields))
+    if "uuid" in fields:
+        for row in rows:
+            row["uuid"] = str(row["uuid"])
+    return rows
+
+
+def album_tree() -> list:
+    """
+    Every album as a nested album summary with `children`, siblings ordered by
+    title, built from a single query.
+    """
+    nodes = {}
+    links = []
+    for album in Album.objects.order_by("title").values("id", "parent_id", "uuid", "slug", "title", "short_description"):
+        nodes[album["id"]] = {
+            "uuid": str(album["uuid"]),
+            "slug": album["slug"],
+            "title": album["title"],
+            "short_description": album["short_description"],
+            "children": [],
+        }
+        links.append((album["id"], album["parent_id"]))
+
+    roots = []
+    for pk, parent_id in links:
+        siblings = nodes[parent_id]["children"] if parent_id in nodes else roots
+        siblings.append(nodes[pk])
+    return roots
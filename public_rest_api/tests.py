@@ -1,14 +1,41 @@
-from django.test import TestCase
+from django.test import TestCase, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
 from rest_framework.test import APIClient
 from rest_framework import status
 from django.core.files.uploadedfile import SimpleUploadedFile
 from core.models import *
+from core import tasks
 from api_key.models import APIKey
 import io
+import json
+import uuid
+import random
+import gzip
+import brotli
+import cbor2
+import msgpack
+import hashlib
+import tarfile
+import tempfile
+import os
+import time
 from PIL import Image
 from django.utils import timezone
 from datetime import timedelta
-from .filters import PhotoFilterAPI
+from unittest.mock import patch
+from decimal import Decimal
+from django.core.management import call_command
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from .filters import PhotoFilterAPI, CustomAttributeFilterBackend
+from .renderers import FastJSONRenderer
+from .cache import accepted_encoding
+from .sampling import sample_ids
+from core.rendering import render_photo
+from core.search import update_documents
+from drf_spectacular.generators import SchemaGenerator
+from .serializers import PhotoSummarySerializer, AlbumSummarySerializer, TagSummarySerializer, fast_summaries, AlbumTreeSerializer
 
 
 def create_test_image_file(filename="test.jpg"):
@@ -545,6 +572,33 @@ class APISizeDetailTestCase(TestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
     
+    def test_missing_size_generated_on_request(self):
+        # Sizes added after the photo was processed have no rendition yet
+        new_size = Size.objects.create(slug="late_size", max_dimension=50, public=True)
+        url = f"/api/photos/{self.photo.uuid}/sizes/{new_size.slug}/"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        image = Image.open(io.BytesIO(b"".join(response.streaming_content)))
+        self.assertEqual(image.size, (50, 50))
+        self.assertTrue(PhotoSize.objects.filter(photo=self.photo, size=new_size).exists())
+
+    def test_missing_private_or_unknown_size_not_generated(self):
+        private_size = Size.objects.create(slug="late_private", max_dimension=50, public=False)
+        for slug in (private_size.slug, "no_such_size"):
+            with self.subTest(slug=slug):
+                response = self.client.get(f"/api/photos/{self.photo.uuid}/sizes/{slug}/")
+                self.assertEqual(response.status_code, 404)
+        self.assertFalse(PhotoSize.objects.filter(size=private_size).exists())
+
+    @override_settings(PHOTO_SIZE_SYNC_MAX_PIXELS=100, PHOTO_SIZE_REQUEST_WAIT=0.1)
+    def test_missing_size_queued_for_large_raw(self):
+        new_size = Size.objects.create(slug="late_large", max_dimension=50, public=True)
+        with patch("core.tasks.generate_photo_size.apply_async") as apply_async:
+            response = self.client.get(f"/api/photos/{self.photo.uuid}/sizes/{new_size.slug}/")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+        apply_async.assert_called_once()
+
     def test_photo_size_detail_(self):
         # Create a new public size
         public_size = Size.objects.create(
@@ -971,6 +1025,49 @@ class PhotoLocationQueryTestCase(TestCase):
         self.assertIn(str(self.photo_nyc.uuid), photo_uuids)
         self.assertIn(str(self.photo_la.uuid), photo_uuids)
 
+    def test_near_radius_filter(self):
+        """Only photos within radius_km of the point are returned."""
+        # Philadelphia: NYC is ~130 km away, the hidden-location photo ~40 km
+        response = self.client.get("/api/photos/?near=39.9526,-75.1652&radius_km=150")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        photo_uuids = [p['uuid'] for p in response.json()]
+        self.assertEqual(photo_uuids, [str(self.photo_nyc.uuid)])
+
+        response = self.client.get("/api/photos/?near=39.9526,-75.1652&radius_km=100")
+        self.assertEqual(response.json(), [])
+
+    def test_near_radius_across_antimeridian(self):
+        photo = Photo.objects.create(
+            title="Fiji Photo",
+            raw_image=create_test_image_file("fiji.jpg"),
+            latitude=-17.7,
+            longitude=179.9,
+        )
+        photo.update_published(update_model=True)
+
+        response = self.client.get("/api/photos/?near=-17.7,-179.9&radius_km=50")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['uuid'] for p in response.json()], [str(photo.uuid)])
+
+        response = self.client.get("/api/photos/?latitude_min=-20&latitude_max=-15&longitude_min=179&longitude_max=-179")
+        self.assertEqual([p['uuid'] for p in response.json()], [str(photo.uuid)])
+
+    def test_near_radius_validation(self):
+        for query in (
+            "near=40,-74",
+            "radius_km=10",
+            "near=40&radius_km=10",
+            "near=abc,def&radius_km=10",
+            "near=91,0&radius_km=10",
+            "near=0,181&radius_km=10",
+            "near=40,-74&radius_km=0",
+            "near=40,-74&radius_km=abc",
+        ):
+            with self.subTest(query=query):
+                response = self.client.get(f"/api/photos/?{query}")
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn("error", response.json())
+
 
 class PhotoFilterTests(TestCase):
     
@@ -1047,6 +1144,8 @@ class PhotoFilterTests(TestCase):
         )
         self.photo4.assign_albums([self.album1, self.album3])
         PhotoTag.objects.create(photo=self.photo4, tag=self.tag_nature)
+        # The camera make filter goes through the search index
+        update_documents(Photo.objects.values_list("pk", flat=True))
 
     def test_filter_api_by_album_uuid(self):
         """Test API filtering by album UUIDs"""
@@ -1108,6 +1207,12 @@ class PhotoFilterTests(TestCase):
         f = PhotoFilterAPI(data={}, queryset=Photo.objects.all())
         self.assertEqual(f.qs.count(), 4)
     
+    def test_album_and_tag_filters_documented_as_uuids(self):
+        schema = SchemaGenerator().get_schema(request=None, public=True)
+        parameters = {parameter["name"]: parameter for parameter in schema["paths"]["/api/photos/"]["get"]["parameters"]}
+        for name in ("albums", "tags"):
+            self.assertEqual(parameters[name]["schema"], {"type": "array", "items": {"type": "string", "format": "uuid"}})
+
     def test_filter_with_no_results(self):
         """Test filters that match no photos"""
         
@@ -1122,3 +1227,1768 @@ class PhotoFilterTests(TestCase):
         # Non-existent camera make
         f = PhotoFilterAPI(data={'camera_make': 'NonExistentBrand'}, queryset=Photo.objects.all())
         self.assertEqual(f.qs.count(), 0)
+
+
+class CustomAttributeFilterTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.api_key = APIKey.create_key("attribute_key")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.api_key}")
+
+        attributes = [{"featured": True, "series": "coast"}, {"featured": False, "series": "coast"}, {"series": "city"}]
+        for index, value in enumerate(attributes):
+            photo = Photo.objects.create(
+                title=f"Attribute {index}", slug=f"attribute-{index}", raw_image=f"attribute{index}.jpg", custom_attributes=value
+            )
+            photo.update_published(update_model=True)
+        Album.objects.create(title="Featured Album", custom_attributes={"featured": True})
+        Album.objects.create(title="Plain Album")
+
+    def titles(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return sorted(item["title"] for item in response.json())
+
+    def test_photo_list(self):
+        self.assertEqual(self.titles("/api/photos/?attr.featured=true"), ["Attribute 0"])
+        self.assertEqual(self.titles("/api/photos/?attr.series=coast"), ["Attribute 0", "Attribute 1"])
+        self.assertEqual(self.titles("/api/photos/?attr.series=coast&attr.featured=false"), ["Attribute 1"])
+        self.assertEqual(self.titles("/api/photos/?attr.series=city&attr.series=coast"), ["Attribute 0", "Attribute 1", "Attribute 2"])
+        self.assertEqual(self.titles("/api/photos/?attr.series=%22city%22"), ["Attribute 2"])
+        self.assertEqual(self.titles("/api/photos/?attr.missing=1"), [])
+
+    def test_album_list(self):
+        self.assertEqual(self.titles("/api/albums/?attr.featured=true"), ["Featured Album"])
+
+    def test_facets(self):
+        response = self.client.get("/api/facets/?attr.series=coast")
+        self.assertEqual(response.json()["total"], 2)
+
+    def test_indexed_keys_documented(self):
+        with override_settings(INDEXED_CUSTOM_ATTRIBUTES=["featured"]):
+            parameters = CustomAttributeFilterBackend().get_schema_operation_parameters(None)
+        self.assertEqual([parameter["name"] for parameter in parameters], ["attr.featured"])
+
+
+class APIQueryCountTestCase(TestCase):
+    """
+    Ensure the photo list, album detail and tag detail endpoints run a fixed
+    number of queries regardless of how many photos they return.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.api_key = APIKey.create_key("query_count_key")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.api_key}")
+
+        self.public_size = Size.objects.create(slug="public_size", public=True, max_dimension=500)
+        self.private_size = Size.objects.create(slug="private_size", public=False, max_dimension=200)
+
+        self.album = Album.objects.create(title="Query Album")
+        self.child_album = Album.objects.create(title="Query Child Album", parent=self.album)
+        self.tag = Tag.objects.create(name="query")
+        self.photo_count = 0
+
+    def add_photos(self, count):
+        for _ in range(count):
+            self.photo_count += 1
+            photo = Photo.objects.create(
+                title=f"Query Photo {self.photo_count}",
+                slug=f"query-photo-{self.photo_count}",
+                raw_image=f"query{self.photo_count}.jpg",
+            )
+            photo.update_published(update_model=True)
+            PhotoMetadata.objects.create(photo=photo)
+            PhotoSize.objects.create(photo=photo, size=self.public_size, image=f"public{self.photo_count}.jpg")
+            PhotoSize.objects.create(photo=photo, size=self.private_size, image=f"private{self.photo_count}.jpg")
+            photo.assign_albums([self.album if self.photo_count % 2 else self.child_album])
+            PhotoTag.objects.create(photo=photo, tag=self.tag)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(ctx.captured_queries), response.json()
+
+    def assertConstantQueries(self, url, get_photos):
+        self.add_photos(2)
+        small_count, data = self.count_queries(url)
+        self.assertEqual(len(get_photos(data)), self.expected_photos(url))
+
+        self.add_photos(8)
+        large_count, data = self.count_queries(url)
+        self.assertEqual(len(get_photos(data)), self.expected_photos(url))
+
+        self.assertEqual(small_count, large_count)
+        return data
+
+    def expected_photos(self, url):
+        if "/albums/" in url and "recursive=true" not in url:
+            return (self.photo_count + 1) // 2
+        return self.photo_count
+
+    def test_photo_list_include_sizes(self):
+        data = self.assertConstantQueries("/api/photos/?include_sizes=true", lambda d: d)
+        for photo in data:
+            self.assertEqual([s["slug"] for s in photo["sizes"]], [self.public_size.slug])
+
+    def test_photo_list_without_sizes(self):
+        data = self.assertConstantQueries("/api/photos/", lambda d: d)
+        for photo in data:
+            self.assertEqual(photo["sizes"], [])
+
+    def test_album_detail_include_sizes(self):
+        data = self.assertConstantQueries(f"/api/albums/{self.album.uuid}/?include_sizes=true", lambda d: d["photos"])
+        for photo in data["photos"]:
+            self.assertEqual([s["slug"] for s in photo["sizes"]], [self.public_size.slug])
+
+    def test_album_detail_recursive_include_sizes(self):
+        self.assertConstantQueries(
+            f"/api/albums/{self.album.uuid}/?include_sizes=true&recursive=true",
+            lambda d: d["photos"],
+        )
+
+    def test_tag_detail_include_sizes(self):
+        data = self.assertConstantQueries(f"/api/tags/{self.tag.uuid}/?include_sizes=true", lambda d: d["photos"])
+        for photo in data["photos"]:
+            self.assertEqual([s["slug"] for s in photo["sizes"]], [self.public_size.slug])
+
+    def test_photo_detail_sizes_prefetched(self):
+        self.add_photos(1)
+        photo = Photo.objects.get(slug="query-photo-1")
+        PhotoSize.objects.create(
+            photo=photo,
+            size=Size.objects.create(slug="public_size_2", public=True, max_dimension=800),
+            image="public-extra.jpg",
+        )
+        query_count, data = self.count_queries(f"/api/photos/{photo.uuid}/")
+        self.assertEqual([s["slug"] for s in data["sizes"]], [self.public_size.slug, "public_size_2"])
+
+        PhotoSize.objects.create(
+            photo=photo,
+            size=Size.objects.create(slug="public_size_3", public=True, max_dimension=1200),
+            image="public-extra-2.jpg",
+        )
+        self.assertEqual(self.count_queries(f"/api/photos/{photo.uuid}/")[0], query_count)
+
+    def test_photo_batch(self):
+        def batch_queries():
+            uuids = [str(uuid) for uuid in Photo.objects.values_list("uuid", flat=True)]
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.post("/api/photos/batch/", {"uuids": uuids}, format="json")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(response.json()), self.photo_count)
+            return len(ctx.captured_queries)
+
+        self.add_photos(2)
+        small_count = batch_queries()
+        self.add_photos(8)
+        self.assertEqual(batch_queries(), small_count)
+
+
+class PhotoBatchTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.api_key = APIKey.create_key("batch_key")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.api_key}")
+
+        self.size = Size.objects.create(slug="batch_size", public=True, max_dimension=500)
+        self.photos = []
+        for index in range(3):
+            photo = Photo.objects.create(title=f"Batch {index}", slug=f"batch-{index}", raw_image=f"batch{index}.jpg")
+            photo.update_published(update_model=True)
+            PhotoSize.objects.create(photo=photo, size=self.size, image=f"batch{index}.jpg")
+            self.photos.append(photo)
+
+    def post(self, uuids, query=""):
+        return self.client.post(f"/api/photos/batch/{query}", {"uuids": [str(u) for u in uuids]}, format="json")
+
+    def test_full_details_in_requested_order(self):
+        order = [self.photos[2], self.photos[0], self.photos[1]]
+        response = self.post([photo.uuid for photo in order])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual([photo["uuid"] for photo in data], [str(photo.uuid) for photo in order])
+        detail = self.client.get(f"/api/photos/{self.photos[2].uuid}/").json()
+        self.assertEqual(data[0], detail)
+
+    def test_missing_and_duplicate_uuids(self):
+        hidden = Photo.objects.create(title="Hidden", slug="batch-hidden", raw_image="batch-hidden.jpg", hidden=True)
+        hidden.update_published(update_model=True)
+        response = self.post([self.photos[1].uuid, uuid.uuid4(), hidden.uuid, self.photos[1].uuid, self.photos[0].uuid])
+        self.assertEqual(
+            [photo["uuid"] for photo in response.json()],
+            [str(self.photos[1].uuid), str(self.photos[0].uuid)],
+        )
+
+    def test_fields(self):
+        response = self.post([self.photos[0].uuid], "?fields=uuid,title")
+        self.assertEqual(response.json(), [{"uuid": str(self.photos[0].uuid), "title": "Batch 0"}])
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.post([]).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.post(["not-a-uuid"]).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.post([uuid.uuid4() for _ in range(501)]).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_requires_api_key(self):
+        self.client.credentials()
+        self.assertEqual(self.post([self.photos[0].uuid]).status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class SparseFieldsTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.api_key = APIKey.create_key("sparse_fields_key")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.api_key}")
+
+        self.public_size = Size.objects.create(slug="sparse_public", public=True, max_dimension=500)
+        self.album = Album.objects.create(title="Sparse Album")
+        self.tag = Tag.objects.create(name="sparse")
+
+        self.photos = []
+        for index in range(3):
+            photo = Photo.objects.create(
+                title=f"Sparse Photo {index}",
+                slug=f"sparse-photo-{index}",
+                raw_image=f"sparse{index}.jpg",
+                latitude=10.0,
+                longitude=20.0,
+            )
+            photo.update_published(update_model=True)
+            PhotoMetadata.objects.create(photo=photo, camera_make="Sparse")
+            PhotoSize.objects.create(photo=photo, size=self.public_size, image=f"sparse-public{index}.jpg")
+            photo.assign_albums([self.album])
+            PhotoTag.objects.create(photo=photo, tag=self.tag)
+            self.photos.append(photo)
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(ctx.captured_queries), response.json()
+
+    def test_photo_list_default_fields_unchanged(self):
+        _, data = self.get("/api/photos/")
+        self.assertEqual(set(data[0]), {"uuid", "title", "slug", "publish_date", "blurhash", "dominant_color", "sizes"})
+
+    def test_photo_list_fields(self):
+        _, data = self.get("/api/photos/?fields=uuid,title")
+        self.assertEqual(len(data), 3)
+        for photo in data:
+            self.assertEqual(set(photo), {"uuid", "title"})
+
+    def test_photo_list_expand(self):
+        _, data = self.get("/api/photos/?expand=tags,metadata,location")
+        for photo in data:
+            self.assertEqual([t["name"] for t in photo["tags"]], ["sparse"])
+            self.assertEqual(photo["metadata"]["camera_make"], "Sparse")
+            self.assertEqual(photo["location"], {"latitude": 10.0, "longitude": 20.0})
+            self.assertNotIn("albums", photo)
+
+    def test_expand_sizes_matches_include_sizes(self):
+        _, expanded = self.get("/api/photos/?expand=sizes")
+        _, included = self.get("/api/photos/?include_sizes=true")
+        self.assertEqual(expanded, included)
+        self.assertEqual([s["slug"] for s in expanded[0]["sizes"]], [self.public_size.slug])
+
+    def test_photo_detail_fields(self):
+        _, data = self.get(f"/api/photos/{self.photos[0].uuid}/?fields=uuid,tags")
+        self.assertEqual(set(data), {"uuid", "tags"})
+        self.assertEqual(data["tags"][0]["name"], "sparse")
+
+    def test_unknown_fields_ignored(self):
+        _, data = self.get("/api/photos/?fields=uuid,nonexistent")
+        self.assertEqual(set(data[0]), {"uuid"})
+
+    def test_album_detail_nested_fields(self):
+        _, data = self.get(f"/api/albums/{self.album.uuid}/?fields=uuid,photos.uuid")
+        self.assertEqual(set(data), {"uuid", "photos"})
+        self.assertEqual(len(data["photos"]), 3)
+        for photo in data["photos"]:
+            self.assertEqual(set(photo), {"uuid"})
+
+    def test_album_detail_nested_expand(self):
+        _, data = self.get(f"/api/albums/{self.album.uuid}/?expand=photos.tags,photos.sizes")
+        for photo in data["photos"]:
+            self.assertEqual([t["name"] for t in photo["tags"]], ["sparse"])
+            self.assertEqual([s["slug"] for s in photo["sizes"]], [self.public_size.slug])
+
+    def test_tag_detail_nested_fields(self):
+        _, data = self.get(f"/api/tags/{self.tag.uuid}/?fields=name,photos.title")
+        self.assertEqual(data["name"], "sparse")
+        self.assertEqual(sorted(p["title"] for p in data["photos"]), [p.title for p in self.photos])
+
+    def test_album_fields_skip_photo_query(self):
+        full_count, _ = self.get(f"/api/albums/{self.album.uuid}/")
+        sparse_count, data = self.get(f"/api/albums/{self.album.uuid}/?fields=uuid,title")
+        self.assertEqual(set(data), {"uuid", "title"})
+        self.assertLess(sparse_count, full_count)
+
+    def test_unexpanded_relations_not_queried(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get("/api/photos/?fields=uuid")
+        sql = " ".join(q["sql"] for q in ctx.captured_queries)
+        self.assertNotIn("core_photometadata", sql)
+        self.assertNotIn("core_phototag", sql)
+        self.assertNotIn("core_photosize", sql)
+
+    def test_expanded_list_constant_queries(self):
+        count, _ = self.get("/api/photos/?expand=tags,albums,metadata,sizes")
+        photo = Photo.objects.create(title="Sparse Extra", slug="sparse-extra", raw_image="sparse-extra.jpg")
+        photo.update_published(update_model=True)
+        PhotoTag.objects.create(photo=photo, tag=self.tag)
+        photo.assign_albums([self.album])
+        self.assertEqual(self.get("/api/photos/?expand=tags,albums,metadata,sizes")[0], count)
+
+    def test_schema_documents_expandable_fields_as_optional(self):
+        schema = SchemaGenerator().get_schema(request=None, public=True)
+        summary = schema["components"]["schemas"]["PhotoSummary"]
+        self.assertLessEqual({"metadata", "albums", "tags", "location"}, set(summary["properties"]))
+        self.assertEqual(
+            set(summary["required"]), {"uuid", "title", "slug", "blurhash", "dominant_color", "sizes"}
+        )
+        self.assertNotIn("description", summary)
+
+
+class FastSummaryTestCase(TestCase):
+    """
+    The values()-based summary path must produce exactly what the serializers do.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.api_key = APIKey.create_key("fast_summary_key")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.api_key}")
+        self.factory = RequestFactory()
+
+        self.public_size = Size.objects.create(slug="fast_public", public=True, max_dimension=500)
+        self.large_size = Size.objects.create(slug="fast_large", public=True, max_dimension=1500)
+        self.private_size = Size.objects.create(slug="fast_private", public=False, max_dimension=200)
+        self.album = Album.objects.create(title="Fast Album", short_description="Fast")
+        self.other_album = Album.objects.create(title="Other Fast Album")
+        self.tags = [Tag.objects.create(name="zebra"), Tag.objects.create(name="aardvark")]
+
+        for index in range(4):
+            photo = Photo.objects.create(
+                title=f"Fast Photo {index}  ",
+                slug=f"fast-photo-{index}",
+                raw_image=f"fast{index}.jpg",
+                publish_date=timezone.now() - timedelta(days=index),
+                latitude=1.5 if index % 2 else None,
+                longitude=2.5 if index % 2 else None,
+                hide_location=index == 3,
+            )
+            photo.update_published(update_model=True)
+            if index % 2:
+                photo.save_placeholder("LEHV6nWB2yk8pyo0adR*.7kCMdnj", "#3a5f8c")
+            PhotoSize.objects.create(photo=photo, size=self.large_size, image=f"fast-large{index}.jpg", md5="a" * 32)
+            PhotoSize.objects.create(photo=photo, size=self.public_size, image=f"fast-public{index}.jpg", height=10, width=20)
+            PhotoSize.objects.create(photo=photo, size=self.private_size, image=f"fast-private{index}.jpg")
+            photo.assign_albums([self.album, self.other_album] if index % 2 else [self.album])
+            for tag in self.tags[:index]:
+                PhotoTag.objects.create(photo=photo, tag=tag)
+
+        hidden = Photo.objects.create(title="Hidden Fast Photo", slug="hidden-fast", raw_image="hidden.jpg", hidden=True)
+        hidden.update_published(update_model=True)
+        hidden.assign_albums([self.album])
+
+    def request(self, params=None):
+        return Request(self.factory.get("/api/", params or {}))
+
+    def assertMatchesSerializer(self, queryset, serializer_class, params=None, prefix=""):
+        request = self.request(params)
+        expected = serializer_class(queryset, many=True, context={"request": request}, field_prefix=prefix).data
+        actual = fast_summaries(queryset, serializer_class, request, prefix)
+        self.assertIsNotNone(actual)
+        self.assertEqual(json.dumps(actual), json.dumps(expected))
+
+    def test_photo_summaries_match(self):
+        photos = Photo.objects.filter(_published=True).order_by("id")
+        for params in (
+            {},
+            {"include_sizes": "true"},
+            {"expand": "albums,tags,location,sizes"},
+            {"fields": "uuid,location,tags"},
+            {"fields": "publish_date,albums"},
+            {"fields": "uuid,blurhash,dominant_color"},
+        ):
+            with self.subTest(params=params):
+                self.assertMatchesSerializer(photos, PhotoSummarySerializer, params)
+
+    def test_photo_placeholders_listed(self):
+        response = self.client.get("/api/photos/?fields=slug,blurhash,dominant_color")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        placeholders = {photo["slug"]: (photo["blurhash"], photo["dominant_color"]) for photo in response.json()}
+        self.assertEqual(placeholders["fast-photo-1"], ("LEHV6nWB2yk8pyo0adR*.7kCMdnj", "#3a5f8c"))
+        self.assertEqual(placeholders["fast-photo-0"], (None, None))
+
+    def test_nested_photo_summaries_match(self):
+        photos = self.album.get_ordered_photos(public_only=True)
+        self.assertMatchesSerializer(photos, PhotoSummarySerializer, {"expand": "photos.tags,photos.sizes"}, "photos.")
+
+    def test_album_and_tag_summaries_match(self):
+        self.assertMatchesSerializer(Album.objects.all(), AlbumSummarySerializer)
+        self.assertMatchesSerializer(Album.objects.all(), AlbumSummarySerializer, {"fields": "title"})
+        self.assertMatchesSerializer(Tag.objects.all(), TagSummarySerializer)
+
+    def test_metadata_falls_back_to_serializer(self):
+        request = self.request({"expand": "metadata"})
+        self.assertIsNone(fast_summaries(Photo.objects.all(), PhotoSummarySerializer, request))
+
+        response = self.client.get("/api/photos/?expand=metadata")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(all("metadata" in photo for photo in response.json()))
+
+    def test_album_detail_photo_order(self):
+        for sort_method in ("MANUAL", "PUBLISHED", "CREATED"):
+            response = self.client.get(f"/api/albums/{self.album.uuid}/?sort_method={sort_method}&sort_descending=false")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            expected = self.album.get_ordered_photos(
+                public_only=True, sort_method=Album.AlbumSortMethod(sort_method), sort_descending=False
+            )
+            self.assertEqual([p["uuid"] for p in response.json()["photos"]], [str(p.uuid) for p in expected])
+
+    def test_photo_list_query_count(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/photos/?expand=sizes,albums,tags")
+        self.assertEqual(len(response.json()), 4)
+        # API key, photos, then one query each for sizes, albums and tags
+        self.assertEqual(len(ctx.captured_queries), 5)
+
+    def test_renderer_matches_json_renderer(self):
+        data = {
+            "uuid": uuid.uuid4(),
+            "when": timezone.now(),
+            "price": Decimal("1.50"),
+            "text": "line separator é",
+            "nested": [{"a": 1, 2: None}],
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_renderer_indent_falls_back(self):
+        data = {"a": [1, 2]}
+        rendered = FastJSONRenderer().render(data, "application/json; indent=2", {})
+        self.assertEqual(rendered, JSONRenderer().render(data, "application/json; indent=2", {}))
+
+    def test_benchmark_command(self):
+        out = io.StringIO()
+        call_command("benchmark_serialization", iterations=1, include_sizes=True, stdout=out)
+        self.assertIn("photo list (4 photos)", out.getvalue())
+        self.assertIn("tag list (2 tags)", out.getvalue())
+
+
+class BinaryRendererTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.api_key = APIKey.create_key("binary_renderer_key")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.api_key}")
+
+        self.size = Size.objects.create(slug="binary_public", public=True, max_dimension=500)
+        self.photo = Photo.objects.create(title="Binary Photo", raw_image="binary.jpg")
+        self.photo.update_published(update_model=True)
+        PhotoMetadata.objects.create(photo=self.photo, capture_date=timezone.now() - timedelta(days=1), aperture=2.8)
+        PhotoSize.objects.create(photo=self.photo, size=self.size, image="binary-public.jpg", md5="b" * 32)
+        self.tag = Tag.objects.create(name="binary")
+        PhotoTag.objects.create(photo=self.photo, tag=self.tag)
+
+    def get(self, url, media_type):
+        response = self.client.get(url, HTTP_ACCEPT=media_type)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], media_type)
+        self.assertIn("Accept", response["Vary"])
+        return response
+
+    def test_json_is_default(self):
+        response = self.client.get("/api/photos/")
+        self.assertEqual(response["Content-Type"], "application/json")
+
+    def test_msgpack_photo_detail(self):
+        response = self.get(f"/api/photos/{self.photo.uuid}/", "application/msgpack")
+        data = msgpack.unpackb(response.content, timestamp=3)
+
+        self.assertEqual(data["uuid"], self.photo.uuid.bytes)
+        self.assertEqual(data["title"], "Binary Photo")
+        self.assertEqual(data["publish_date"], self.photo.publish_date)
+        self.assertEqual(data["metadata"]["capture_date"], self.photo.metadata.capture_date)
+        self.assertEqual(data["metadata"]["aperture"], 2.8)
+        self.assertEqual(data["sizes"][0]["uuid"], self.size.uuid.bytes)
+        self.assertEqual(data["tags"][0]["uuid"], self.tag.uuid.bytes)
+
+    def test_custom_attributes_unchanged(self):
+        attributes = {
+            "uuid": "12345678-1234-5678-1234-567812345678",
+            "nested": [{"created_at": "2024-01-01T00:00:00+00:00"}],
+        }
+        self.photo.custom_attributes = attributes
+        self.photo.save()
+
+        response = self.get(f"/api/photos/{self.photo.uuid}/", "application/msgpack")
+        data = msgpack.unpackb(response.content, timestamp=3)
+        self.assertEqual(data["custom_attributes"], attributes)
+        self.assertEqual(data["uuid"], self.photo.uuid.bytes)
+
+    def test_cbor_photo_list(self):
+        response = self.get("/api/photos/?include_sizes=true", "application/cbor")
+        data = cbor2.loads(response.content)
+
+        self.assertEqual(data[0]["uuid"], self.photo.uuid)
+        self.assertEqual(data[0]["publish_date"], self.photo.publish_date)
+        self.assertEqual(data[0]["sizes"][0]["md5"], "b" * 32)
+
+    def test_format_query_parameter(self):
+        response = self.client.get(f"/api/tags/{self.tag.uuid}/?format=msgpack")
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        self.assertEqual(msgpack.unpackb(response.content)["name"], "binary")
+
+    def test_binary_smaller_than_json(self):
+        json_size = len(self.client.get("/api/photos/?include_sizes=true").content)
+        for media_type in ("application/msgpack", "application/cbor"):
+            with self.subTest(media_type=media_type):
+                self.assertLess(len(self.get("/api/photos/?include_sizes=true", media_type).content), json_size)
+
+    def test_cached_per_media_type(self):
+        url = f"/api/photos/{self.photo.uuid}/"
+        first_json = self.client.get(url)
+        self.get(url, "application/msgpack")
+        cached_msgpack = self.get(url, "application/msgpack")
+        cached_json = self.client.get(url)
+
+        self.assertEqual(msgpack.unpackb(cached_msgpack.content, timestamp=3)["uuid"], self.photo.uuid.bytes)
+        self.assertEqual(cached_json.content, first_json.content)
+        self.assertNotEqual(cached_json["ETag"], cached_msgpack["ETag"])
+
+    @override_settings(CHANGE_FEED_SAFETY_LAG=0)
+    def test_change_feed_timestamps(self):
+        response = self.get("/api/changes/", "application/msgpack")
+        change = msgpack.unpackb(response.content, timestamp=3)["changes"][0]
+        self.assertEqual(change["timestamp"], CatalogChange.objects.get(id=change["cursor"]).timestamp)
+
+    def test_errors_use_negotiated_format(self):
+        response = self.client.get("/api/photos/?latitude_min=1", HTTP_ACCEPT="application/cbor")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("error", cbor2.loads(response.content))
+
+
+class RandomPhotoTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.api_key = APIKey.create_key("random_photo_key")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.api_key}")
+
+        self.album = Album.objects.create(title="Random Album", sort_method=Album.AlbumSortMethod.RANDOM)
+        self.photos = []
+        for index in range(12):
+            photo = Photo.objects.create(title=f"Random Photo {index}", slug=f"random-photo-{index}", raw_image=f"random{index}.jpg")
+            photo.update_published(update_model=True)
+            photo.assign_albums([self.album])
+            self.photos.append(photo)
+
+        hidden = Photo.objects.create(title="Hidden Random", slug="hidden-random", raw_image="hidden-random.jpg", hidden=True)
+        hidden.update_published(update_model=True)
+        self.hidden_uuid = str(hidden.uuid)
+
+    def uuids(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [photo["uuid"] for photo in response.json()]
+
+    def test_random_photos(self):
+        picked = self.uuids(self.client.get("/api/photos/random/?count=5"))
+        self.assertEqual(len(picked), 5)
+        self.assertEqual(len(set(picked)), 5)
+        self.assertNotIn(self.hidden_uuid, picked)
+
+    def test_default_count(self):
+        self.assertEqual(len(self.uuids(self.client.get("/api/photos/random/"))), 1)
+
+    def test_count_larger_than_catalog(self):
+        picked = self.uuids(self.client.get("/api/photos/random/?count=100"))
+        self.assertCountEqual(picked, [str(p.uuid) for p in self.photos])
+
+    def test_seed_is_repeatable_and_cached(self):
+        url = "/api/photos/random/?count=4&seed=99"
+        first = self.client.get(url)
+        with CaptureQueriesContext(connection) as ctx:
+            second = self.client.get(url)
+        self.assertEqual(self.uuids(first), self.uuids(second))
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertIn("ETag", second)
+
+    def test_unseeded_not_cached(self):
+        response = self.client.get("/api/photos/random/?count=3")
+        self.assertNotIn("ETag", response)
+
+    def test_filters_apply(self):
+        other = Album.objects.create(title="Other Random Album")
+        self.photos[0].assign_albums([other])
+        picked = self.uuids(self.client.get(f"/api/photos/random/?count=5&albums={other.uuid}"))
+        self.assertEqual(picked, [str(self.photos[0].uuid)])
+
+    def test_summary_fields(self):
+        response = self.client.get("/api/photos/random/?fields=uuid,title")
+        self.assertEqual(set(response.json()[0]), {"uuid", "title"})
+
+    def test_invalid_parameters(self):
+        for query in ("count=0", "count=101", "count=abc", "seed=abc"):
+            with self.subTest(query=query):
+                response = self.client.get(f"/api/photos/random/?{query}")
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn("error", response.json())
+
+    def test_sample_ids_probes_large_ranges(self):
+        queryset = Photo.objects.filter(_published=True)
+        with patch("public_rest_api.sampling.MIN_PROBE_SPAN", 1):
+            picked = sample_ids(queryset, 5, random.Random(1))
+            self.assertEqual(picked, sample_ids(queryset, 5, random.Random(1)))
+        self.assertEqual(len(set(picked)), 5)
+        self.assertTrue(set(picked) <= set(queryset.values_list("pk", flat=True)))
+
+    def test_album_seeded_random_order(self):
+        url = f"/api/albums/{self.album.uuid}/?seed=5"
+        first = [p["uuid"] for p in self.client.get(url).json()["photos"]]
+        with CaptureQueriesContext(connection) as ctx:
+            second = [p["uuid"] for p in self.client.get(url).json()["photos"]]
+        self.assertEqual(first, second)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertCountEqual(first, [str(p.uuid) for p in self.photos])
+
+        other_seed = [p["uuid"] for p in self.client.get(f"/api/albums/{self.album.uuid}/?seed=6").json()["photos"]]
+        self.assertNotEqual(first, other_seed)
+
+    def test_album_invalid_seed(self):
+        response = self.client.get(f"/api/albums/{self.album.uuid}/?seed=abc")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PhotoClusterTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.api_key = APIKey.create_key("cluster_key")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.api_key}")
+
+        locations = [(40.71, -74.00), (40.73, -73.99), (40.75, -73.98), (51.50, -0.12), (-17.7, 179.9)]
+        self.photos = []
+        for index, (latitude, longitude) in enumerate(locations):
+            photo = Photo.objects.create(
+                title=f"Cluster Photo {index}", slug=f"cluster-photo-{index}", raw_image=f"cluster{index}.jpg",
+                latitude=latitude, longitude=longitude,
+            )
+            photo.update_published(update_model=True)
+            self.photos.append(photo)
+
+        hidden_location = Photo.objects.create(
+            title="Hidden Location", slug="hidden-location", raw_image="hidden-location.jpg",
+            latitude=40.72, longitude=-74.01, hide_location=True,
+        )
+        hidden_location.update_published(update_model=True)
+        unpublished = Photo.objects.create(
+            title="Unpublished", slug="unpublished", raw_image="unpublished.jpg",
+            latitude=40.72, longitude=-74.01, hidden=True,
+        )
+        unpublished.update_published(update_model=True)
+
+    def clusters(self, query):
+        response = self.client.get(f"/api/photos/clusters/?{query}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def test_world_clusters(self):
+        clusters = self.clusters("bbox=-180,-90,180,90&zoom=0")
+        self.assertEqual(sum(cluster["count"] for cluster in clusters), 5)
+
+        nyc = next(cluster for cluster in clusters if cluster["count"] == 3)
+        self.assertAlmostEqual(nyc["latitude"], 40.73)
+        self.assertAlmostEqual(nyc["longitude"], -73.99)
+        self.assertEqual(nyc["photo"], str(self.photos[2].uuid))
+
+    def test_zooming_in_splits_clusters(self):
+        clusters = self.clusters("bbox=-74.1,40.6,-73.9,40.8&zoom=11")
+        self.assertEqual(sorted(cluster["count"] for cluster in clusters), [1, 1, 1])
+
+    def test_bbox_across_antimeridian(self):
+        clusters = self.clusters("bbox=179,-20,-179,-15&zoom=6")
+        self.assertEqual([cluster["photo"] for cluster in clusters], [str(self.photos[4].uuid)])
+
+    def test_tiles_are_cached(self):
+        self.clusters("bbox=-180,-90,180,90&zoom=2")
+        with CaptureQueriesContext(connection) as ctx:
+            # A smaller box at the same zoom only needs tiles already cached
+            clusters = self.clusters("bbox=-80,30,-70,44&zoom=2")
+        self.assertEqual(sum(cluster["count"] for cluster in clusters), 3)
+        self.assertFalse(any("core_photo" in query["sql"] for query in ctx.captured_queries))
+
+    def test_response_revalidated_with_etag(self):
+        url = "/api/photos/clusters/?bbox=-180,-90,180,90&zoom=0"
+        response = self.client.get(url)
+        self.assertIn("ETag", response)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_cache_invalidated_by_catalog_change(self):
+        self.assertEqual(len(self.clusters("bbox=-10,40,10,60&zoom=3")), 1)
+        photo = Photo.objects.create(title="Paris", slug="paris", raw_image="paris.jpg", latitude=48.85, longitude=2.35)
+        photo.update_published(update_model=True)
+        clusters = self.clusters("bbox=-10,40,10,60&zoom=3")
+        self.assertEqual(sum(cluster["count"] for cluster in clusters), 2)
+
+    def test_invalid_parameters(self):
+        for query in (
+            "",
+            "bbox=-180,-90,180,90",
+            "zoom=3",
+            "bbox=1,2,3&zoom=3",
+            "bbox=-180,-90,180,90&zoom=abc",
+            "bbox=-180,-90,180,90&zoom=-1",
+            "bbox=-180,10,180,-10&zoom=3",
+            "bbox=-200,-90,180,90&zoom=3",
+            "bbox=-180,-90,180,90&zoom=10",
+        ):
+            with self.subTest(query=query):
+                response = self.client.get(f"/api/photos/clusters/?{query}")
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn("error", response.json())
+
+
+class SearchAPITestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.api_key = APIKey.create_key("search_key")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.api_key}")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.mountain = Photo.objects.create(title="Mountain Sunset", slug="mountain-sunset", raw_image="mountain.jpg")
+            self.harbor = Photo.objects.create(
+                title="Harbor", slug="harbor", raw_image="harbor.jpg", description="Boats at sunset"
+            )
+            self.hidden = Photo.objects.create(title="Hidden Sunset", slug="hidden-sunset", raw_image="hidden.jpg", hidden=True)
+            for photo in (self.mountain, self.harbor, self.hidden):
+                photo.update_published(update_model=True)
+            tag = Tag.objects.create(name="coast")
+            PhotoTag.objects.create(photo=self.harbor, tag=tag)
+            # Ranking needs terms to be rare across the collection
+            for index in range(4):
+                Photo.objects.create(title=f"Other {index}", slug=f"other-{index}", raw_image=f"other{index}.jpg")
+
+    def uuids(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [photo["uuid"] for photo in response.json()]
+
+    def test_ranked_results(self):
+        response = self.client.get("/api/search/?q=sunset")
+        self.assertEqual(self.uuids(response), [str(self.mountain.uuid), str(self.harbor.uuid)])
+
+    def test_matches_tags(self):
+        self.assertEqual(self.uuids(self.client.get("/api/search/?q=coa")), [str(self.harbor.uuid)])
+
+    def test_limit(self):
+        self.assertEqual(len(self.uuids(self.client.get("/api/search/?q=sunset&limit=1"))), 1)
+
+    def test_sparse_fields(self):
+        response = self.client.get("/api/search/?q=harbor&fields=uuid,title")
+        self.assertEqual(response.json(), [{"uuid": str(self.harbor.uuid), "title": "Harbor"}])
+
+    def test_results_cached_until_catalog_changes(self):
+        self.assertEqual(self.uuids(self.client.get("/api/search/?q=lighthouse")), [])
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get("/api/search/?q=lighthouse")
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.harbor.title = "Lighthouse"
+            self.harbor.save()
+        self.assertEqual(self.uuids(self.client.get("/api/search/?q=lighthouse")), [str(self.harbor.uuid)])
+
+    def test_invalid_parameters(self):
+        for query in ("", "q=", "q=%20-", "q=sunset&limit=abc", "q=sunset&limit=0"):
+            with self.subTest(query=query):
+                response = self.client.get(f"/api/search/?{query}")
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_photo_list_search_filter(self):
+        response = self.client.get("/api/photos/?search=boats")
+        self.assertEqual(self.uuids(response), [str(self.harbor.uuid)])
+
+
+class FacetsTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.api_key = APIKey.create_key("facets_key")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.api_key}")
+
+        self.tag = Tag.objects.create(name="mountains")
+        self.album = Album.objects.create(title="Alps")
+        cameras = [
+            ("X100V", "XF 23mm", 2023),
+            ("X100V", "XF 23mm", 2024),
+            ("EOS R5", "RF 50mm", 2024),
+            ("", None, None),
+        ]
+        self.photos = []
+        for index, (camera, lens, year) in enumerate(cameras):
+            photo = Photo.objects.create(title=f"Facet {index}", slug=f"facet-{index}", raw_image=f"facet{index}.jpg")
+            photo.update_published(update_model=True)
+            PhotoMetadata.objects.create(
+                photo=photo,
+                camera_model=camera,
+                lens_model=lens,
+                capture_date=timezone.datetime(year, 6, 1, tzinfo=timezone.UTC) if year else None,
+            )
+            self.photos.append(photo)
+        for photo in self.photos[:2]:
+            PhotoTag.objects.create(photo=photo, tag=self.tag)
+        self.photos[0].assign_albums([self.album])
+
+        hidden = Photo.objects.create(title="Hidden Facet", slug="hidden-facet", raw_image="hidden-facet.jpg", hidden=True)
+        hidden.update_published(update_model=True)
+        PhotoMetadata.objects.create(photo=hidden, camera_model="X100V")
+        PhotoTag.objects.create(photo=hidden, tag=self.tag)
+
+    def test_facet_counts(self):
+        response = self.client.get("/api/facets/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {
+            "total": 4,
+            "cameras": [{"value": "X100V", "count": 2}, {"value": "EOS R5", "count": 1}],
+            "lenses": [{"value": "XF 23mm", "count": 2}, {"value": "RF 50mm", "count": 1}],
+            "tags": [{"uuid": str(self.tag.uuid), "name": "mountains", "count": 2}],
+            "albums": [{"uuid": str(self.album.uuid), "title": "Alps", "count": 1}],
+            "years": [{"value": 2024, "count": 2}, {"value": 2023, "count": 1}],
+        })
+
+    def test_filtered_facets(self):
+        response = self.client.get(f"/api/facets/?tags={self.tag.uuid}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data["total"], 2)
+        self.assertEqual(data["cameras"], [{"value": "X100V", "count": 2}])
+        self.assertEqual(data["years"], [{"value": 2024, "count": 1}, {"value": 2023, "count": 1}])
+        self.assertNotIn("ETag", response)
+
+    def test_unfiltered_facets_cached(self):
+        first = self.client.get("/api/facets/")
+        with CaptureQueriesContext(connection) as ctx:
+            second = self.client.get("/api/facets/")
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+        PhotoMetadata.objects.filter(photo=self.photos[3]).update(camera_model="EOS R5")
+        Photo.objects.get(pk=self.photos[3].pk).save()
+        cameras = self.client.get("/api/facets/").json()["cameras"]
+        self.assertEqual(cameras, [{"value": "EOS R5", "count": 2}, {"value": "X100V", "count": 2}])
+
+    def test_invalid_filter(self):
+        response = self.client.get("/api/facets/?tags=not-a-uuid")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TimelineTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.api_key = APIKey.create_key("timeline_key")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.api_key}")
+
+        self.photos = []
+        for index, day in enumerate([1, 2, 15]):
+            photo = Photo.objects.create(
+                title=f"Timeline {index}", slug=f"timeline-{index}", raw_image=f"timeline{index}.jpg",
+                publish_date=timezone.datetime(2024, 5, day, tzinfo=timezone.UTC),
+            )
+            photo.update_published(update_model=True)
+            self.photos.append(photo)
+        PhotoMetadata.objects.create(photo=self.photos[2], capture_date=timezone.datetime(2019, 8, 3, tzinfo=timezone.UTC))
+
+        hidden = Photo.objects.create(
+            title="Hidden Timeline", slug="hidden-timeline", raw_image="hidden-timeline.jpg",
+            publish_date=timezone.datetime(2024, 5, 1, tzinfo=timezone.UTC), hidden=True,
+        )
+        hidden.update_published(update_model=True)
+
+    def test_default_monthly_buckets(self):
+        response = self.client.get("/api/timeline/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), [{"date": "2024-05-01", "count": 3}])
+
+    def test_daily_buckets_with_photos(self):
+        response = self.client.get("/api/timeline/?granularity=day&photos=1")
+        self.assertEqual(response.json(), [
+            {"date": "2024-05-01", "count": 1, "photos": [str(self.photos[0].uuid)]},
+            {"date": "2024-05-02", "count": 1, "photos": [str(self.photos[1].uuid)]},
+            {"date": "2024-05-15", "count": 1, "photos": [str(self.photos[2].uuid)]},
+        ])
+
+    def test_capture_date_years(self):
+        response = self.client.get("/api/timeline/?field=capture_date&granularity=year")
+        self.assertEqual(response.json(), [{"date": "2019-01-01", "count": 1}])
+
+    def test_cached(self):
+        self.client.get("/api/timeline/?granularity=year")
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/timeline/?granularity=year")
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertIn("ETag", response)
+
+    def test_invalid_parameters(self):
+        for query in ("field=slug", "granularity=week", "photos=abc", "photos=-1", "photos=21"):
+            with self.subTest(query=query):
+                response = self.client.get(f"/api/timeline/?{query}")
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AlbumTreeTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.api_key = APIKey.create_key("album_tree_key")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.api_key}")
+
+        self.root = Album.objects.create(title="Tree Root", short_description="Top")
+        self.child_b = Album.objects.create(title="Tree B", parent=self.root)
+        self.child_a = Album.objects.create(title="Tree A", parent=self.root)
+        self.grandchild = Album.objects.create(title="Tree Grandchild", parent=self.child_b)
+        self.other_root = Album.objects.create(title="Another Root")
+
+    def test_tree(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/albums/tree/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # API key and albums
+        self.assertEqual(len(ctx.captured_queries), 2)
+
+        tree = response.json()
+        self.assertEqual([node["title"] for node in tree], ["Another Root", "Tree Root"])
+        root = tree[1]
+        self.assertEqual(root["uuid"], str(self.root.uuid))
+        self.assertEqual(root["short_description"], "Top")
+        self.assertEqual([node["title"] for node in root["children"]], ["Tree A", "Tree B"])
+        self.assertEqual(root["children"][1]["children"][0]["uuid"], str(self.grandchild.uuid))
+        self.assertEqual(root["children"][1]["children"][0]["children"], [])
+
+    def test_serializer_matches_tree(self):
+        roots = Album.objects.filter(parent=None).order_by("title")
+        self.assertEqual(AlbumTreeSerializer(roots, many=True).data, self.client.get("/api/albums/tree/").json())
+
+    def test_tree_follows_moves(self):
+        self.client.get("/api/albums/tree/")
+        self.child_b.parent = self.other_root
+        self.child_b.save()
+
+        tree = self.client.get("/api/albums/tree/").json()
+        self.assertEqual([node["title"] for node in tree[0]["children"]], ["Tree B"])
+        self.assertEqual([node["title"] for node in tree[0]["children"][0]["children"]], ["Tree Grandchild"])
+
+    def test_recursive_album_detail_query_count_independent_of_depth(self):
+        def recursive_queries():
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(f"/api/albums/{self.root.uuid}/?recursive=true&fields=uuid,photos")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return len(ctx.captured_queries)
+
+        shallow = recursive_queries()
+        parent = self.grandchild
+        for depth in range(5):
+            parent = Album.objects.create(title=f"Deep {depth}", parent=parent)
+        photo = Photo.objects.create(title="Deep Photo", raw_image="deep.jpg")
+        photo.update_published(update_model=True)
+        photo.assign_albums([parent])
+
+        self.assertEqual(recursive_queries(), shallow)
+        response = self.client.get(f"/api/albums/{self.root.uuid}/?recursive=true")
+        self.assertEqual([p["uuid"] for p in response.json()["photos"]], [str(photo.uuid)])
+
+
+class AlbumNeighborsTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.api_key = APIKey.create_key("neighbors_key")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.api_key}")
+
+        self.album = Album.objects.create(title="Neighbor Album", sort_method=Album.AlbumSortMethod.MANUAL)
+        self.photos = []
+        for index in range(3):
+            photo = Photo.objects.create(title=f"Neighbor {index}", slug=f"neighbor-{index}", raw_image=f"neighbor{index}.jpg")
+            photo.update_published(update_model=True)
+            PhotoInAlbum.objects.create(album=self.album, photo=photo, order=index)
+            self.photos.append(photo)
+
+        hidden = Photo.objects.create(title="Hidden Neighbor", slug="hidden-neighbor", raw_image="hidden-neighbor.jpg", hidden=True)
+        hidden.update_published(update_model=True)
+        PhotoInAlbum.objects.create(album=self.album, photo=hidden, order=1)
+        self.hidden = hidden
+
+    def url(self, photo, query=""):
+        return f"/api/albums/{self.album.uuid}/photos/{photo.uuid}/neighbors/{query}"
+
+    def test_neighbors(self):
+        response = self.client.get(self.url(self.photos[1]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        # The unpublished photo between them is skipped
+        self.assertEqual(data["previous"]["uuid"], str(self.photos[0].uuid))
+        self.assertEqual(data["next"]["uuid"], str(self.photos[2].uuid))
+        self.assertEqual(data["next"]["title"], "Neighbor 2")
+
+    def test_ends_of_album(self):
+        data = self.client.get(self.url(self.photos[0])).json()
+        self.assertIsNone(data["previous"])
+        self.assertEqual(data["next"]["uuid"], str(self.photos[1].uuid))
+        data = self.client.get(self.url(self.photos[2])).json()
+        self.assertEqual(data["previous"]["uuid"], str(self.photos[1].uuid))
+        self.assertIsNone(data["next"])
+
+    def test_sort_overrides_and_fields(self):
+        data = self.client.get(self.url(self.photos[2], "?sort_method=PUBLISHED&sort_descending=true&fields=title")).json()
+        self.assertEqual(data, {"previous": None, "next": {"title": "Neighbor 1"}})
+
+    def test_cached(self):
+        url = self.url(self.photos[1])
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertIn("ETag", response)
+
+    def test_random_requires_seed(self):
+        response = self.client.get(self.url(self.photos[1], "?sort_method=RANDOM"))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.url(self.photos[1], "?sort_method=RANDOM&seed=3"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_photo_not_found(self):
+        outside = Photo.objects.create(title="Outside", slug="outside", raw_image="outside.jpg")
+        outside.update_published(update_model=True)
+        for photo in (outside, self.hidden):
+            with self.subTest(photo=photo.title):
+                self.assertEqual(self.client.get(self.url(photo)).status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(f"/api/albums/{self.album.uuid}/photos/not-a-uuid/neighbors/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ResponseCacheTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.api_key = APIKey.create_key("response_cache_key")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.api_key}")
+
+        self.photo = Photo.objects.create(title="Cached Photo", raw_image="cached.jpg")
+        self.photo.update_published(update_model=True)
+        self.album = Album.objects.create(title="Cached Album", sort_method="PUBLISHED")
+        self.photo.assign_albums([self.album])
+
+    def get_with_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, len(ctx.captured_queries)
+
+    def test_repeat_request_served_from_cache(self):
+        url = f"/api/albums/{self.album.uuid}/"
+        first, first_queries = self.get_with_queries(url)
+        second, second_queries = self.get_with_queries(url)
+
+        self.assertEqual(first.json(), second.json())
+        # Only the API key lookup runs on a cache hit
+        self.assertEqual(second_queries, 1)
+        self.assertGreater(first_queries, second_queries)
+
+    def test_save_invalidates_cache(self):
+        url = f"/api/photos/{self.photo.uuid}/"
+        self.assertEqual(self.client.get(url).json()["title"], "Cached Photo")
+
+        self.photo.title = "Renamed Photo"
+        self.photo.save()
+        self.assertEqual(self.client.get(url).json()["title"], "Renamed Photo")
+
+    def test_delete_invalidates_cache(self):
+        url = f"/api/albums/{self.album.uuid}/"
+        self.assertEqual(len(self.client.get(url).json()["photos"]), 1)
+
+        PhotoInAlbum.objects.filter(album=self.album, photo=self.photo).delete()
+        self.assertEqual(len(self.client.get(url).json()["photos"]), 0)
+
+    def test_query_parameters_are_part_of_key(self):
+        size = Size.objects.create(slug="cache_size", public=True, max_dimension=300)
+        PhotoSize.objects.create(photo=self.photo, size=size, image="cache_size.jpg")
+
+        self.assertEqual(self.client.get("/api/photos/").json()[0]["sizes"], [])
+        with_sizes = self.client.get("/api/photos/?include_sizes=true").json()
+        self.assertEqual([s["slug"] for s in with_sizes[0]["sizes"]], ["cache_size"])
+
+    def test_random_album_not_cached(self):
+        url = f"/api/albums/{self.album.uuid}/?sort_method=RANDOM"
+        self.get_with_queries(url)
+        _, second_queries = self.get_with_queries(url)
+        self.assertGreater(second_queries, 1)
+
+    def test_cache_hit_still_requires_api_key(self):
+        url = f"/api/photos/{self.photo.uuid}/"
+        self.client.get(url)
+
+        self.client.credentials()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_cache_disabled(self):
+        url = f"/api/albums/{self.album.uuid}/"
+        with self.settings(PUBLIC_API_CACHE_TIMEOUT=0):
+            _, first_queries = self.get_with_queries(url)
+            _, second_queries = self.get_with_queries(url)
+        self.assertEqual(first_queries, second_queries)
+
+
+class CompressedResponseTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.api_key = APIKey.create_key("compression_key")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.api_key}")
+
+        for index in range(40):
+            photo = Photo.objects.create(
+                title=f"Compressed Photo {index}",
+                slug=f"compressed-photo-{index}",
+                raw_image=f"compressed{index}.jpg",
+            )
+            photo.update_published(update_model=True)
+
+    def test_brotli_preferred(self):
+        plain = self.client.get("/api/photos/")
+        self.assertNotIn("Content-Encoding", plain)
+
+        response = self.client.get("/api/photos/", HTTP_ACCEPT_ENCODING="gzip, deflate, br")
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertLess(len(response.content), len(plain.content))
+        self.assertEqual(brotli.decompress(response.content), plain.content)
+
+    def test_gzip(self):
+        plain = self.client.get("/api/photos/")
+        response = self.client.get("/api/photos/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+    def test_quality_zero_refuses_encoding(self):
+        response = self.client.get("/api/photos/", HTTP_ACCEPT_ENCODING="br;q=0, gzip;q=0.5")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+
+        response = self.client.get("/api/photos/", HTTP_ACCEPT_ENCODING="*;q=0")
+        self.assertNotIn("Content-Encoding", response)
+
+    def test_compressed_on_miss_and_hit(self):
+        with CaptureQueriesContext(connection) as ctx:
+            miss = self.client.get("/api/photos/", HTTP_ACCEPT_ENCODING="br")
+        miss_queries = len(ctx.captured_queries)
+        with CaptureQueriesContext(connection) as ctx:
+            hit = self.client.get("/api/photos/", HTTP_ACCEPT_ENCODING="br")
+
+        self.assertLess(len(ctx.captured_queries), miss_queries)
+        self.assertEqual(miss["Content-Encoding"], "br")
+        self.assertEqual(hit["Content-Encoding"], "br")
+        self.assertEqual(hit.content, miss.content)
+
+    def test_small_responses_not_compressed(self):
+        tag = Tag.objects.create(name="tiny")
+        response = self.client.get(f"/api/tags/{tag.uuid}/", HTTP_ACCEPT_ENCODING="br, gzip")
+        self.assertNotIn("Content-Encoding", response)
+        self.assertEqual(response.json()["name"], "tiny")
+
+    def test_threshold_setting(self):
+        with self.settings(PUBLIC_API_COMPRESSION_MIN_SIZE=10 ** 9):
+            response = self.client.get("/api/photos/", HTTP_ACCEPT_ENCODING="br, gzip")
+        self.assertNotIn("Content-Encoding", response)
+
+    def test_snapshot_cached_compressed(self):
+        streamed = self.client.get("/api/snapshot/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertTrue(streamed.streaming)
+        body = b"".join(streamed.streaming_content)
+        self.assertIn("Accept-Encoding", streamed["Vary"])
+
+        cached = self.client.get("/api/snapshot/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(cached["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(cached.content), body)
+
+    def test_accepted_encoding(self):
+        factory = RequestFactory()
+        encodings = {"br": b"", "gzip": b""}
+        for header, expected in (
+            ("", None),
+            ("identity", None),
+            ("gzip", "gzip"),
+            ("GZIP;q=0.8, br;q=0.1", "br"),
+            ("*", "br"),
+            ("br;q=0, *", "gzip"),
+            ("gzip;q=bogus", None),
+        ):
+            with self.subTest(header=header):
+                request = factory.get("/", HTTP_ACCEPT_ENCODING=header)
+                self.assertEqual(accepted_encoding(request, encodings), expected)
+        self.assertIsNone(accepted_encoding(factory.get("/", HTTP_ACCEPT_ENCODING="br"), {"gzip": b""}))
+
+
+class ETagTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.api_key = APIKey.create_key("etag_key")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.api_key}")
+
+        self.photo = Photo.objects.create(title="ETag Photo", raw_image="etag.jpg")
+        self.photo.update_published(update_model=True)
+        self.album = Album.objects.create(title="ETag Album")
+        self.photo.assign_albums([self.album])
+
+    def test_read_endpoints_send_etag(self):
+        for url in [
+            "/api/photos/",
+            f"/api/photos/{self.photo.uuid}/",
+            "/api/albums/",
+            f"/api/albums/{self.album.uuid}/",
+            "/api/tags/",
+            "/api/sizes/",
+            "/api/health/",
+        ]:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK, url)
+            self.assertTrue(response.has_header("ETag"), url)
+
+    def test_matching_etag_returns_304_without_serializing(self):
+        url = f"/api/albums/{self.album.uuid}/"
+        etag = self.client.get(url)["ETag"]
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(response.content, b"")
+        # Only the API key lookup runs
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+    def test_etag_changes_after_catalog_change(self):
+        url = f"/api/photos/{self.photo.uuid}/"
+        etag = self.client.get(url)["ETag"]
+
+        self.photo.title = "Changed ETag Photo"
+        self.photo.save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json()["title"], "Changed ETag Photo")
+
+    def test_etag_differs_by_query_parameters(self):
+        plain = self.client.get("/api/photos/")["ETag"]
+        with_sizes = self.client.get("/api/photos/?include_sizes=true")["ETag"]
+        self.assertNotEqual(plain, with_sizes)
+
+        response = self.client.get("/api/photos/?include_sizes=true", HTTP_IF_NONE_MATCH=plain)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_etag_list_and_strong_form_match(self):
+        url = "/api/photos/"
+        etag = self.client.get(url)["ETag"]
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=f'"nope", {etag.removeprefix("W/")}')
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_wildcard_etag_matches(self):
+        for _ in range(2):  # Rendered, then cached
+            response = self.client.get("/api/photos/", HTTP_IF_NONE_MATCH="*")
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertTrue(response.has_header("ETag"))
+            self.client.get("/api/photos/")
+
+    def test_wildcard_etag_on_missing_resource(self):
+        for url in (f"/api/photos/{uuid.uuid4()}/", f"/api/albums/{uuid.uuid4()}/"):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH="*")
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_etag_requires_api_key(self):
+        url = f"/api/photos/{self.photo.uuid}/"
+        etag = self.client.get(url)["ETag"]
+
+        self.client.credentials()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_image_etag_is_rendition_md5(self):
+        photo_size = PhotoSize.objects.create(
+            photo=self.photo,
+            size=Size.objects.create(slug="etag_size", public=True, max_dimension=100),
+            image=create_test_image_file("etag_size.jpg"),
+            md5="0123456789abcdef0123456789abcdef",
+        )
+        url = f"/api/photos/{self.photo.uuid}/sizes/etag_size/"
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["ETag"], f'"{photo_size.md5}"')
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=f'"{photo_size.md5}"')
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+@override_settings(CHANGE_FEED_SAFETY_LAG=0)
+class ChangeFeedTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.api_key = APIKey.create_key("change_feed_key")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.api_key}")
+
+        self.start = CatalogChange.objects.order_by("-id").values_list("id", flat=True).first() or 0
+
+    def test_changes_since_cursor(self):
+        photo = Photo.objects.create(title="Feed Photo", raw_image="feed.jpg")
+        photo.update_published(update_model=True)
+        album = Album.objects.create(title="Feed Album")
+
+        response = self.client.get(f"/api/changes/?since={self.start}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertFalse(data["has_more"])
+        self.assertEqual(
+            [(c["entity"], c["uuid"], c["action"]) for c in data["changes"]],
+            [("photo", str(photo.uuid), "updated"), ("album", str(album.uuid), "created")],
+        )
+        self.assertEqual(data["cursor"], data["changes"][-1]["cursor"])
+
+        # Nothing new after the returned cursor
+        data = self.client.get(f"/api/changes/?since={data['cursor']}").json()
+        self.assertEqual(data["changes"], [])
+
+    def test_deleted_entities_appear_as_tombstones(self):
+        tag = Tag.objects.create(name="feed")
+        tag_uuid = tag.uuid
+        tag.delete()
+
+        changes = self.client.get(f"/api/changes/?since={self.start}").json()["changes"]
+        self.assertEqual(changes[-1]["uuid"], str(tag_uuid))
+        self.assertEqual(changes[-1]["action"], "deleted")
+
+    def test_paging_with_limit(self):
+        for i in range(5):
+            Tag.objects.create(name=f"page-{i}")
+
+        seen = []
+        cursor = self.start
+        while True:
+            data = self.client.get(f"/api/changes/?since={cursor}&limit=2").json()
+            self.assertLessEqual(len(data["changes"]), 2)
+            seen += [c["cursor"] for c in data["changes"]]
+            cursor = data["cursor"]
+            if not data["has_more"]:
+                break
+
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(seen, sorted(seen))
+
+    def test_recent_changes_held_back(self):
+        settled = Tag.objects.create(name="settled")
+        CatalogChange.objects.update(timestamp=timezone.now() - timedelta(minutes=5))
+        Tag.objects.create(name="recent")
+
+        with override_settings(CHANGE_FEED_SAFETY_LAG=60):
+            response = self.client.get(f"/api/changes/?since={self.start}")
+            data = response.json()
+            self.assertEqual([c["uuid"] for c in data["changes"]], [str(settled.uuid)])
+            self.assertFalse(data["has_more"])
+            # The response changes once the held back change settles, so it isn't cached
+            self.assertNotIn("ETag", response)
+
+        data = self.client.get(f"/api/changes/?since={data['cursor']}").json()
+        self.assertEqual([c["action"] for c in data["changes"]], ["created"])
+
+    def test_invalid_parameters_return_400(self):
+        for query in ["since=abc", "since=-1", "limit=0", "limit=x"]:
+            response = self.client.get(f"/api/changes/?{query}")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, query)
+
+
+class SnapshotTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.api_key = APIKey.create_key("snapshot_key")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.api_key}")
+
+        self.public_size = Size.objects.create(slug="snapshot_public", public=True, max_dimension=400)
+        self.private_size = Size.objects.create(slug="snapshot_private", public=False, max_dimension=100)
+
+        self.album = Album.objects.create(title="Snapshot Album", sort_method="PUBLISHED", sort_descending=False)
+        self.child_album = Album.objects.create(title="Snapshot Child", parent=self.album, sort_method="MANUAL")
+        self.tag = Tag.objects.create(name="snapshot")
+
+        self.photos = []
+        for i in range(3):
+            photo = Photo.objects.create(
+                title=f"Snapshot Photo {i}",
+                raw_image=f"snapshot{i}.jpg",
+                publish_date=timezone.now() - timedelta(days=i),
+                latitude=10.0 + i,
+                longitude=20.0 + i,
+                hide_location=(i == 2),
+            )
+            photo.update_published(update_model=True)
+            PhotoMetadata.objects.create(photo=photo, camera_make="Canon", iso=100 * (i + 1))
+            PhotoSize.objects.create(photo=photo, size=self.public_size, image=f"snap-public{i}.jpg", md5=f"{i}" * 32)
+            PhotoSize.objects.create(photo=photo, size=self.private_size, image=f"snap-private{i}.jpg")
+            photo.assign_albums([self.album, self.child_album])
+            PhotoTag.objects.create(photo=photo, tag=self.tag)
+            self.photos.append(photo)
+
+        self.hidden_photo = Photo.objects.create(title="Hidden Snapshot Photo", raw_image="hidden.jpg", hidden=True)
+        self.hidden_photo.assign_albums([self.album])
+
+    def get_snapshot(self, **extra):
+        response = self.client.get("/api/snapshot/", **extra)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        if response.streaming:
+            return response, json.loads(b"".join(response.streaming_content))
+        return response, response.json()
+
+    @override_settings(CHANGE_FEED_SAFETY_LAG=0)
+    def test_snapshot_contents(self):
+        _, data = self.get_snapshot()
+
+        self.assertEqual([s["slug"] for s in data["sizes"]], [self.public_size.slug])
+        self.assertEqual(data["cursor"], CatalogChange.objects.order_by("-id").first().id)
+
+        photos = {p["uuid"]: p for p in data["photos"]}
+        self.assertEqual(set(photos), {str(p.uuid) for p in self.photos})
+        first = photos[str(self.photos[0].uuid)]
+        self.assertEqual([s["slug"] for s in first["sizes"]], [self.public_size.slug])
+        self.assertEqual(first["sizes"][0]["md5"], "0" * 32)
+        self.assertEqual(first["metadata"]["camera_make"], "Canon")
+        self.assertEqual(first["location"], {"latitude": 10.0, "longitude": 20.0})
+        self.assertIsNone(photos[str(self.photos[2].uuid)]["location"])
+
+        albums = {a["uuid"]: a for a in data["albums"]}
+        # PUBLISHED ascending: the oldest photo (highest index) first; hidden photo excluded
+        self.assertEqual(albums[str(self.album.uuid)]["photos"], [str(p.uuid) for p in reversed(self.photos)])
+        # MANUAL: assignment order
+        self.assertEqual(albums[str(self.child_album.uuid)]["photos"], [str(p.uuid) for p in self.photos])
+        self.assertEqual(albums[str(self.child_album.uuid)]["parent"], str(self.album.uuid))
+
+        self.assertEqual(data["tags"], [
+            {"uuid": str(self.tag.uuid), "name": "snapshot", "photos": [str(p.uuid) for p in self.photos]}
+        ])
+
+    def test_snapshot_matches_photo_detail(self):
+        _, data = self.get_snapshot()
+        detail = self.client.get(f"/api/photos/{self.photos[1].uuid}/").json()
+        snapshot_photo = next(p for p in data["photos"] if p["uuid"] == detail["uuid"])
+
+        self.assertEqual(snapshot_photo["sizes"], detail["sizes"])
+        self.assertEqual(snapshot_photo["location"], detail["location"])
+        self.assertEqual(set(snapshot_photo["metadata"]), set(detail["metadata"]))
+
+    def test_snapshot_query_count_is_constant(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.get_snapshot()
+        small_count = len(ctx.captured_queries)
+
+        for i in range(5):
+            photo = Photo.objects.create(title=f"More Snapshot {i}", raw_image=f"more{i}.jpg")
+            photo.update_published(update_model=True)
+            PhotoSize.objects.create(photo=photo, size=self.public_size, image=f"more{i}.jpg")
+            photo.assign_albums([self.album])
+
+        with CaptureQueriesContext(connection) as ctx:
+            _, data = self.get_snapshot()
+        self.assertEqual(len(data["photos"]), 8)
+        self.assertEqual(len(ctx.captured_queries), small_count)
+
+    def test_snapshot_cached_per_catalog_version(self):
+        _, first = self.get_snapshot()
+
+        with CaptureQueriesContext(connection) as ctx:
+            response, second = self.get_snapshot()
+        self.assertEqual(first, second)
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+        self.tag.name = "renamed"
+        self.tag.save()
+        _, third = self.get_snapshot()
+        self.assertEqual(third["tags"][0]["name"], "renamed")
+
+    def test_snapshot_etag(self):
+        response, _ = self.get_snapshot()
+        response = self.client.get("/api/snapshot/", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+class PhotoRenderTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.api_key = APIKey.create_key("render_key")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.api_key}")
+
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+        self.enterContext(override_settings(RENDER_CACHE_DIR=self.cache_dir.name))
+
+        self.photo = Photo.objects.create(title="Render Photo", slug="render-photo", raw_image="render.jpg")
+        self.photo.update_published(update_model=True)
+        size = Size.objects.create(slug="render_large", public=False, max_dimension=400)
+        file = io.BytesIO()
+        Image.new("RGB", (400, 200), color="blue").save(file, "JPEG")
+        PhotoSize.objects.create(
+            photo=self.photo, size=size, width=400, height=200, md5="render-md5",
+            image=SimpleUploadedFile("render-large.jpg", file.getvalue(), content_type="image/jpeg"),
+        )
+
+    def render_url(self, query):
+        response = self.client.get(f"/api/photos/{self.photo.uuid}/render/url/{query}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()["url"]
+
+    def render(self, url, **headers):
+        # Render URLs work without the API key
+        return APIClient().get(url, **headers)
+
+    def test_render(self):
+        url = self.render_url("?w=100&h=100&fit=cover")
+        self.assertTrue(url.startswith(f"http://testserver/api/photos/{self.photo.uuid}/render/?"))
+
+        response = self.render(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+        image = Image.open(io.BytesIO(b"".join(response.streaming_content)))
+        self.assertEqual(image.size, (100, 100))
+
+        image = Image.open(io.BytesIO(b"".join(self.render(self.render_url("?w=100")).streaming_content)))
+        self.assertEqual(image.size, (100, 50))
+
+    def test_renders_are_cached(self):
+        url = self.render_url("?w=120")
+        with patch("public_rest_api.views.render_photo", wraps=render_photo) as render:
+            first = self.render(url)
+            second = self.render(url)
+            self.assertEqual(b"".join(first.streaming_content), b"".join(second.streaming_content))
+        render.assert_called_once()
+        self.assertEqual(len(os.listdir(self.cache_dir.name)), 1)
+
+        not_modified = self.render(url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_signature_required(self):
+        url = self.render_url("?w=100")
+        self.assertEqual(self.render(url.replace("w=100", "w=101")).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.render(url.split("&sig=")[0]).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_signature_expires(self):
+        url = self.render_url("?w=100")
+        with override_settings(RENDER_URL_MAX_AGE=60):
+            with patch("django.core.signing.time.time", return_value=time.time() + 30):
+                self.assertEqual(self.render(url).status_code, status.HTTP_200_OK)
+            with patch("django.core.signing.time.time", return_value=time.time() + 120):
+                self.assertEqual(self.render(url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_invalid_dimensions(self):
+        for query in ("", "?fit=cover", "?w=0", "?w=5000", "?w=100&fit=stretch"):
+            with self.subTest(query=query):
+                response = self.client.get(f"/api/photos/{self.photo.uuid}/render/url/{query}")
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_unpublished_photo(self):
+        url = self.render_url("?w=100")
+        self.photo.hidden = True
+        self.photo.save()
+        self.photo.update_published(update_model=True)
+        self.assertEqual(self.render(url).status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(f"/api/photos/{self.photo.uuid}/render/url/?w=100")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_render_format_negotiated(self):
+        url = self.render_url("?w=100")
+        jpeg = self.render(url, HTTP_ACCEPT="image/*,*/*")
+        webp = self.render(url, HTTP_ACCEPT="image/webp,image/*,*/*")
+        self.assertEqual(jpeg["Content-Type"], "image/jpeg")
+        self.assertEqual(webp["Content-Type"], "image/webp")
+        self.assertIn("Accept", webp["Vary"])
+        self.assertNotEqual(jpeg["ETag"], webp["ETag"])
+        self.assertEqual(Image.open(io.BytesIO(b"".join(webp.streaming_content))).format, "WEBP")
+        self.assertEqual(len(os.listdir(self.cache_dir.name)), 2)
+
+
+class PhotoImageFormatTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.api_key = APIKey.create_key("image_format_key")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.api_key}")
+
+        file = io.BytesIO()
+        Image.new("RGB", (300, 200), color="orange").save(file, "JPEG")
+        self.photo = Photo.objects.create(
+            title="Format Photo", raw_image=SimpleUploadedFile("format.jpg", file.getvalue(), content_type="image/jpeg")
+        )
+        self.photo.update_published(update_model=True)
+        self.size = Size.objects.create(slug="format_size", max_dimension=150, formats=["webp", "avif"])
+        self.photo_size = tasks.gen_size(self.photo, self.size)
+        self.url = f"/api/photos/{self.photo.uuid}/sizes/{self.size.slug}/"
+
+    def test_accept_negotiation(self):
+        for accept, content_type in (
+            ("", "image/jpeg"),
+            ("*/*", "image/jpeg"),
+            ("image/webp,*/*", "image/webp"),
+            ("image/avif,image/webp,*/*", "image/avif"),
+            ("image/avif;q=0,image/webp,*/*", "image/webp"),
+            ("image/png", "image/jpeg"),
+        ):
+            with self.subTest(accept=accept):
+                response = self.client.get(self.url, HTTP_ACCEPT=accept)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(response["Content-Type"], content_type)
+                self.assertIn("Accept", response["Vary"])
+
+    def test_variant_etag(self):
+        response = self.client.get(self.url, HTTP_ACCEPT="image/webp")
+        content = b"".join(response.streaming_content)
+        self.assertEqual(response["ETag"], f'"{hashlib.md5(content).hexdigest()}"')
+        self.assertEqual(response["ETag"], f'"{self.photo_size.variants["webp"]["md5"]}"')
+
+        not_modified = self.client.get(self.url, HTTP_ACCEPT="image/webp", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertIn("Accept", not_modified["Vary"])
+        # The JPEG is a different representation
+        jpeg = self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(jpeg.status_code, status.HTTP_200_OK)
+
+    def test_only_produced_formats_served(self):
+        size = Size.objects.create(slug="jpeg_size", max_dimension=100)
+        tasks.gen_size(self.photo, size)
+        response = self.client.get(f"/api/photos/{self.photo.uuid}/sizes/{size.slug}/", HTTP_ACCEPT="image/avif")
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+
+    def test_variants_listed(self):
+        expected = [
+            {"format": "jpeg", "content_type": "image/jpeg", "md5": self.photo_size.md5, "file_size": self.photo_size.file_size},
+            *(
+                {"format": format, "content_type": f"image/{format}", **{
+                    key: self.photo_size.variants[format][key] for key in ("md5", "file_size")
+                }}
+                for format in ("webp", "avif")
+            ),
+        ]
+        detail = self.client.get(f"/api/photos/{self.photo.uuid}/").json()
+        summaries = self.client.get("/api/photos/?include_sizes=true").json()
+        for sizes in (detail["sizes"], summaries[0]["sizes"]):
+            self.assertEqual(next(size for size in sizes if size["slug"] == self.size.slug)["variants"], expected)
+
+        size = next(size for size in self.client.get("/api/sizes/").json() if size["slug"] == self.size.slug)
+        self.assertEqual(size["formats"], ["webp", "avif"])
+
+
+class RenditionSyncTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.api_key = APIKey.create_key("rendition_sync_key")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.api_key}")
+
+        self.public_size = Size.objects.create(slug="sync_public", public=True, max_dimension=400)
+        self.private_size = Size.objects.create(slug="sync_private", public=False, max_dimension=100)
+
+        self.photos = []
+        for i in range(2):
+            photo = Photo.objects.create(title=f"Sync Photo {i}", raw_image=f"sync{i}.jpg")
+            photo.update_published(update_model=True)
+            self.add_rendition(photo, self.public_size)
+            self.add_rendition(photo, self.private_size)
+            self.photos.append(photo)
+
+        self.hidden_photo = Photo.objects.create(title="Hidden Sync Photo", raw_image="sync-hidden.jpg", hidden=True)
+        self.add_rendition(self.hidden_photo, self.public_size)
+
+    def add_rendition(self, photo, size):
+        image = create_test_image_file(f"{photo.slug}-{size.slug}.jpg")
+        content = image.read()
+        image.seek(0)
+        return PhotoSize.objects.create(
+            photo=photo, size=size, image=image,
+            md5=hashlib.md5(content).hexdigest(), file_size=len(content),
+        )
+
+    def read_tar(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/x-tar")
+        archive = tarfile.open(fileobj=io.BytesIO(b"".join(response.streaming_content)))
+        return {member.name: archive.extractfile(member).read() for member in archive.getmembers()}
+
+    def test_manifest_lists_public_renditions(self):
+        response = self.client.get("/api/renditions/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = json.loads(b"".join(response.streaming_content))
+
+        self.assertEqual(data["fields"], ["photo", "size", "md5", "bytes", "format"])
+        expected = [
+            [str(photo.uuid), self.public_size.slug, ps.md5, ps.file_size, "jpeg"]
+            for photo in self.photos
+            for ps in [photo.sizes.get(size=self.public_size)]
+        ]
+        self.assertEqual(data["renditions"], expected)
+
+        # Served from cache with an ETag afterwards
+        cached = self.client.get("/api/renditions/")
+        self.assertEqual(json.loads(cached.content), data)
+        response = self.client.get("/api/renditions/", HTTP_IF_NONE_MATCH=cached["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_every_stored_format_synced(self):
+        file = io.BytesIO()
+        Image.new("RGB", (300, 200), color="teal").save(file, "JPEG")
+        photo = Photo.objects.create(
+            title="Sync WebP Photo", raw_image=SimpleUploadedFile("sync-webp.jpg", file.getvalue(), content_type="image/jpeg")
+        )
+        photo.update_published(update_model=True)
+        size = Size.objects.create(slug="sync_webp", public=True, max_dimension=150, formats=["webp"])
+        photo_size = tasks.gen_size(photo, size)
+        webp = photo_size.variants["webp"]
+
+        response = self.client.get("/api/renditions/")
+        rows = [row for row in json.loads(b"".join(response.streaming_content))["renditions"] if row[1] == size.slug]
+        self.assertEqual(rows, [
+            [str(photo.uuid), size.slug, photo_size.md5, photo_size.file_size, "jpeg"],
+            [str(photo.uuid), size.slug, webp["md5"], webp["file_size"], "webp"],
+        ])
+
+        files = self.read_tar(self.client.post("/api/renditions/archive/", {"renditions": [
+            {"photo": str(photo.uuid), "size": size.slug},
+        ]}, format="json"))
+        self.assertEqual(list(files), [f"{photo.uuid}/{size.slug}.jpg", f"{photo.uuid}/{size.slug}.webp"])
+        self.assertEqual(hashlib.md5(files[f"{photo.uuid}/{size.slug}.jpg"]).hexdigest(), photo_size.md5)
+        self.assertEqual(hashlib.md5(files[f"{photo.uuid}/{size.slug}.webp"]).hexdigest(), webp["md5"])
+
+    def test_archive_of_requested_renditions(self):
+        photo = self.photos[0]
+        response = self.client.post("/api/renditions/archive/", {"renditions": [
+            {"photo": str(photo.uuid), "size": self.public_size.slug},
+            {"photo": str(photo.uuid), "size": self.private_size.slug},
+            {"photo": str(self.hidden_photo.uuid), "size": self.public_size.slug},
+        ]}, format="json")
+        files = self.read_tar(response)
+
+        photo_size = photo.sizes.get(size=self.public_size)
+        self.assertEqual(list(files), [f"{photo.uuid}/{self.public_size.slug}.jpg"])
+        self.assertEqual(hashlib.md5(files[f"{photo.uuid}/{self.public_size.slug}.jpg"]).hexdigest(), photo_size.md5)
+
+    def test_archive_requires_renditions(self):
+        response = self.client.post("/api/renditions/archive/", {"renditions": []}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(CHANGE_FEED_SAFETY_LAG=0)
+    def test_archive_changed_since_cursor(self):
+        cursor = CatalogChange.objects.order_by("-id").first().id
+
+        photo = Photo.objects.create(title="New Sync Photo", raw_image="sync-new.jpg")
+        photo.update_published(update_model=True)
+        self.add_rendition(photo, self.public_size)
+
+        response = self.client.get(f"/api/renditions/archive/?since={cursor}")
+        files = self.read_tar(response)
+        self.assertEqual(list(files), [f"{photo.uuid}/{self.public_size.slug}.jpg"])
+        self.assertEqual(int(response["X-Catalog-Cursor"]), CatalogChange.objects.order_by("-id").first().id)
+
+        # Everything public since the beginning
+        files = self.read_tar(self.client.get("/api/renditions/archive/"))
+        self.assertEqual(len(files), 3)
+
+    def test_archive_skips_missing_files(self):
+        photo_size = self.photos[0].sizes.get(size=self.public_size)
+        photo_size.image.storage.delete(photo_size.image.name)
+
+        files = self.read_tar(self.client.get("/api/renditions/archive/"))
+        self.assertEqual(list(files), [f"{self.photos[1].uuid}/{self.public_size.slug}.jpg"])
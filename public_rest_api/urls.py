@@ -11,5 +11,14 @@ router.register(r'albums', AlbumViewSet, basename='album')
 urlpatterns = [
     path("", include((router.urls, "api"), namespace="api")),
     path("photos/<uuid:uuid>/sizes/<slug:size>/", PhotoImageAPIView.as_view(), name="photo-image"),
+    path("photos/<uuid:uuid>/render/", PhotoRenderAPIView.as_view(), name="photo-render"),
+    path("photos/<uuid:uuid>/render/url/", PhotoRenderURLAPIView.as_view(), name="photo-render-url"),
     path("health/", SiteHealthAPIView.as_view(), name="site-health"),
+    path("changes/", ChangeFeedAPIView.as_view(), name="change-feed"),
+    path("search/", SearchAPIView.as_view(), name="search"),
+    path("facets/", FacetsAPIView.as_view(), name="facets"),
+    path("timeline/", TimelineAPIView.as_view(), name="timeline"),
+    path("snapshot/", SnapshotAPIView.as_view(), name="snapshot"),
+    path("renditions/", RenditionManifestAPIView.as_view(), name="rendition-manifest"),
+    path("renditions/archive/", RenditionArchiveAPIView.as_view(), name="rendition-archive"),
 ]
@@ -1,16 +1,41 @@
+import math
+import random
 from rest_framework import viewsets
-from core.models import Photo, Size
-from .filters import PhotoFilterAPI
+from rest_framework.decorators import action
+from core.models import Photo, Size, CatalogChange
+from .filters import PhotoFilterAPI, CustomAttributeFilterBackend
+from django_filters.rest_framework import DjangoFilterBackend
 from .serializers import *
-from django.http import FileResponse, Http404
+from django.http import FileResponse, Http404, StreamingHttpResponse
 from rest_framework.generics import GenericAPIView
 from api_key.authentication import APIKeyAuthentication
 from api_key.permissions import HasAPIKey
 from rest_framework.response import Response
 from rest_framework import status
 from django.db.models import Q
-from drf_spectacular.utils import OpenApiParameter, OpenApiTypes, extend_schema
+from core.geo import cells_within, radius_bounds, distance_km, tiles_within
+from core.search import search_photos, search_terms
+from core.timeline import timeline, TIMELINE_FIELDS, GRANULARITIES
+from drf_spectacular.utils import OpenApiParameter, OpenApiTypes, extend_schema, extend_schema_view
 from .models import *
+from .cache import CachedResponseMixin, get_catalog_version, response_cache_key, response_etag, etag_matches, not_modified, cached_stream_response
+from .snapshot import stream_snapshot
+from .sampling import sample_ids, in_given_order
+from .clusters import photo_clusters, MAX_CLUSTER_ZOOM, MAX_CLUSTER_TILES
+from .facets import photo_facets
+from .renditions import stream_manifest, stream_tar, renditions_changed_since, requested_renditions, latest_change_cursor, accepted_format
+from .summaries import album_tree
+from django.utils.http import quote_etag
+from django.urls import reverse
+from urllib.parse import urlencode
+from rest_framework.permissions import AllowAny
+from core.rendering import render_source, render_key, render_photo, cached_render
+from core.tasks import request_photo_size
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from core.formats import CONTENT_TYPES, FORMAT_PREFERENCE
+from .renders import render_signature, valid_render_signature
+from .renderers import ImageContentNegotiation
 
 
 INCLUDE_SIZES_PARAM = OpenApiParameter(
@@ -21,8 +46,75 @@ INCLUDE_SIZES_PARAM = OpenApiParameter(
     required=False,
 )
 
+FIELDS_PARAM = OpenApiParameter(
+    name='fields',
+    type=OpenApiTypes.STR,
+    location=OpenApiParameter.QUERY,
+    description=FIELDS_PARAM_DESCRIPTION,
+    required=False,
+)
+
+UUID_PATTERN = '[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}'
+
+EXPAND_PARAM = OpenApiParameter(
+    name='expand',
+    type=OpenApiTypes.STR,
+    location=OpenApiParameter.QUERY,
+    description=EXPAND_PARAM_DESCRIPTION,
+    required=False,
+)
+
+
+ALBUM_ORDER_PARAMS = [
+    OpenApiParameter(
+        name='recursive',
+        type=OpenApiTypes.BOOL,
+        location=OpenApiParameter.QUERY,
+        description='Include photos from all descendant albums recursively (true/false). When enabled, MANUAL sort method falls back to PUBLISHED.',
+        required=False,
+        enum=[True, False],
+    ),
+    OpenApiParameter(
+        name='sort_method',
+        type=OpenApiTypes.STR,
+        location=OpenApiParameter.QUERY,
+        description='Override album sort method. One of: CREATED, PUBLISHED, MANUAL, RANDOM. Defaults to the album\'s configured sort method.',
+        required=False,
+        enum=['CREATED', 'PUBLISHED', 'MANUAL', 'RANDOM'],
+    ),
+    OpenApiParameter(
+        name='sort_descending',
+        type=OpenApiTypes.BOOL,
+        location=OpenApiParameter.QUERY,
+        description='Override album sort direction. Defaults to the album\'s configured sort direction.',
+        required=False,
+    ),
+    OpenApiParameter(
+        name='seed',
+        type=OpenApiTypes.INT,
+        location=OpenApiParameter.QUERY,
+        description='Seed for RANDOM sort. The same seed always gives the same order, and seeded responses are cached.',
+        required=False,
+    ),
+]
 
-class SizeViewSet(viewsets.ReadOnlyModelViewSet):
+
+class FastSummaryListMixin:
+    """
+    Build list responses with `fast_summaries` when it covers the request,
+    falling back to the serializer otherwise.
+    """
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        summaries = fast_summaries(queryset, self.get_serializer_class(), request)
+        if summaries is None:
+            return super().list(request, *args, **kwargs)
+        return Response(summaries)
+
+
+@extend_schema_view(list=extend_schema(parameters=[FIELDS_PARAM]), retrieve=extend_schema(parameters=[FIELDS_PARAM]))
+class SizeViewSet(CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     authentication_classes = [APIKeyAuthentication]
     permission_classes = [HasAPIKey]
     serializer_class = SizeSerializer
@@ -30,15 +122,17 @@ class SizeViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Size.objects.filter(public=True)
 
 
-class PhotoViewSet(viewsets.ReadOnlyModelViewSet):
+@extend_schema_view(retrieve=extend_schema(parameters=[FIELDS_PARAM]))
+class PhotoViewSet(CachedResponseMixin, FastSummaryListMixin, viewsets.ReadOnlyModelViewSet):
     authentication_classes = [APIKeyAuthentication]
     permission_classes = [HasAPIKey]
     lookup_field = 'uuid'
     queryset = Photo.objects.filter(_published=True)
     filterset_class = PhotoFilterAPI
+    filter_backends = [DjangoFilterBackend, CustomAttributeFilterBackend]
 
     def get_serializer_class(self):
-        if self.action == 'list':
+        if self.action in ('list', 'random_list'):
             return PhotoSummarySerializer
         return PhotoSerializer
     
@@ -47,7 +141,13 @@ class PhotoViewSet(viewsets.ReadOnlyModelViewSet):
         Filter photos by location bounds and other filters using PhotoFilterAPI.
         """
         queryset = super().get_queryset()
-        queryset = queryset.select_related('metadata').prefetch_related('albums', 'tags')
+        # Summaries only embed sizes when asked for; details always do
+        queryset = plan_photo_queryset(
+            queryset,
+            self.get_serializer_class(),
+            self.request,
+            sizes=self.action not in ('list', 'random_list') or include_sizes_requested(self.request),
+        )
         
         # Get location bound parameters
         lat_lower = self.request.query_params.get('latitude_min')
@@ -102,8 +202,50 @@ class PhotoViewSet(viewsets.ReadOnlyModelViewSet):
                     )
             except (ValueError, TypeError):
                 return queryset.none()  # Will trigger validation error in list()
-        
+
+        # Pick candidates through the geocell index; the bounds above refine them
+        if lat_lower is not None or lon_lower is not None:
+            south, north = (lat_lower, lat_upper) if lat_lower is not None else (-90.0, 90.0)
+            west, east = (lon_lower, lon_upper) if lon_lower is not None else (-180.0, 180.0)
+            queryset = queryset.filter(cells_within(south, west, north, east))
+
+        try:
+            near = self.parse_near(self.request.query_params)
+        except ValueError:
+            return queryset.none()  # Will trigger validation error in list()
+        if near:
+            latitude, longitude, radius_km = near
+            queryset = (
+                queryset.filter(cells_within(*radius_bounds(latitude, longitude, radius_km)))
+                .alias(distance_km=distance_km(latitude, longitude))
+                .filter(distance_km__lte=radius_km)
+            )
+
         return queryset
+
+    @staticmethod
+    def parse_near(query_params):
+        """
+        Parse `near=lat,lon` and `radius_km=`, returning None when neither is
+        given. Raises ValueError with a message for invalid input.
+        """
+        near = query_params.get('near')
+        radius = query_params.get('radius_km')
+        if near is None and radius is None:
+            return None
+        if near is None or radius is None:
+            raise ValueError("Both near and radius_km must be provided together.")
+
+        try:
+            latitude, longitude = (float(part) for part in near.split(','))
+            radius_km = float(radius)
+        except ValueError:
+            raise ValueError("near must be 'latitude,longitude' and radius_km a number.")
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise ValueError("near must be a valid latitude and longitude.")
+        if not radius_km > 0:
+            raise ValueError("radius_km must be greater than 0.")
+        return latitude, longitude, radius_km
     
     @extend_schema(
         parameters=[
@@ -124,6 +266,8 @@ class PhotoViewSet(viewsets.ReadOnlyModelViewSet):
                 many=True,
             ),
             INCLUDE_SIZES_PARAM,
+            FIELDS_PARAM,
+            EXPAND_PARAM,
             OpenApiParameter(
                 name='latitude_min',
                 type=OpenApiTypes.FLOAT,
@@ -152,6 +296,20 @@ class PhotoViewSet(viewsets.ReadOnlyModelViewSet):
                 description='Maximum longitude for location filter (requires longitude_min)',
                 required=False,
             ),
+            OpenApiParameter(
+                name='near',
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                description='Center point as `latitude,longitude` for a radius filter (requires radius_km)',
+                required=False,
+            ),
+            OpenApiParameter(
+                name='radius_km',
+                type=OpenApiTypes.FLOAT,
+                location=OpenApiParameter.QUERY,
+                description='Radius in kilometres around `near` (requires near)',
+                required=False,
+            ),
         ],
         responses={200: PhotoSummarySerializer},
     )
@@ -159,7 +317,9 @@ class PhotoViewSet(viewsets.ReadOnlyModelViewSet):
         """
         List public photos.
         Optionally include sizes with ?include_sizes=true.
-        Optionally filter by location bounds (both lower and upper bounds required for each dimension).
+        Optionally filter by location bounds (both lower and upper bounds required for each dimension),
+        or by distance with ?near=lat,lon&radius_km=.
+        Optionally filter by custom attributes with ?attr.<key>=<value>.
         """
         # Validate location parameters
         lat_lower = request.query_params.get('latitude_min')
@@ -194,13 +354,146 @@ class PhotoViewSet(viewsets.ReadOnlyModelViewSet):
                 {"error": "Location bounds must be valid numeric values."},
                 status=status.HTTP_400_BAD_REQUEST
             )
+
+        try:
+            self.parse_near(request.query_params)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         return super().list(request, *args, **kwargs)
 
+    RANDOM_DEFAULT_COUNT = 1
+    RANDOM_MAX_COUNT = 100
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name='count',
+                type=OpenApiTypes.INT,
+                location=OpenApiParameter.QUERY,
+                description=f'Number of photos to return (default: {RANDOM_DEFAULT_COUNT}, max: {RANDOM_MAX_COUNT}).',
+                required=False,
+            ),
+            OpenApiParameter(
+                name='seed',
+                type=OpenApiTypes.INT,
+                location=OpenApiParameter.QUERY,
+                description='Seed for a repeatable (and cacheable) pick. Omit for a fresh pick on every request.',
+                required=False,
+            ),
+            INCLUDE_SIZES_PARAM,
+            FIELDS_PARAM,
+            EXPAND_PARAM,
+        ],
+        responses={200: PhotoSummarySerializer(many=True)},
+    )
+    @action(detail=False, methods=['get'], url_path='random', url_name='random')
+    def random_list(self, request, *args, **kwargs):
+        """
+        Pick random public photos. Accepts the same filters as the photo list.
+        """
+        try:
+            count = int(request.query_params.get('count', self.RANDOM_DEFAULT_COUNT))
+            seed = request.query_params.get('seed')
+            seed = int(seed) if seed is not None else None
+        except ValueError:
+            return Response({"error": "count and seed must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= count <= self.RANDOM_MAX_COUNT:
+            return Response(
+                {"error": f"count must be between 1 and {self.RANDOM_MAX_COUNT}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if seed is None:
+            return self.random_photos(request, count, seed)
+        return self.cached_response(self.random_photos, request, count, seed)
+
+    def random_photos(self, request, count, seed):
+        queryset = self.filter_queryset(self.get_queryset())
+        pks = sample_ids(queryset, count, random.Random(seed))
+        if not pks:
+            return Response([])
+
+        photos = in_given_order(queryset, pks)
+        summaries = fast_summaries(photos, PhotoSummarySerializer, request)
+        if summaries is None:
+            summaries = self.get_serializer(photos, many=True).data
+        return Response(summaries)
+
+    @extend_schema(
+        parameters=[FIELDS_PARAM],
+        request=PhotoBatchRequestSerializer,
+        responses={200: PhotoSerializer(many=True)},
+    )
+    @action(detail=False, methods=['post'], filter_backends=[])
+    def batch(self, request, *args, **kwargs):
+        """
+        Get full details of many public photos by UUID, in the order requested.
+        Unknown or unpublished photos are left out.
+        """
+        serializer = PhotoBatchRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        uuids = list(dict.fromkeys(serializer.validated_data["uuids"]))
+        position = {uuid: index for index, uuid in enumerate(uuids)}
+        photos = sorted(self.get_queryset().filter(uuid__in=uuids), key=lambda photo: position[photo.uuid])
+        return Response(self.get_serializer(photos, many=True).data)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name='bbox',
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                description='Bounding box as `west,south,east,north`. West may exceed east to cross the antimeridian.',
+                required=True,
+            ),
+            OpenApiParameter(
+                name='zoom',
+                type=OpenApiTypes.INT,
+                location=OpenApiParameter.QUERY,
+                description=f'Map zoom level (0-{MAX_CLUSTER_ZOOM}). Each level halves the cluster grid spacing.',
+                required=True,
+            ),
+        ],
+        responses={200: PhotoClusterSerializer(many=True)},
+    )
+    @action(detail=False, methods=['get'], filter_backends=[])
+    def clusters(self, request, *args, **kwargs):
+        """
+        Aggregate geotagged public photos into map clusters.
+        Clusters cover every tile overlapping the bounding box, so some may lie just outside it.
+        """
+        return self.cached_response(self.map_clusters, request)
+
+    def map_clusters(self, request):
+        try:
+            west, south, east, north = (float(part) for part in request.query_params.get('bbox', '').split(','))
+            zoom = int(request.query_params.get('zoom', ''))
+        except ValueError:
+            return Response(
+                {"error": "bbox must be 'west,south,east,north' and zoom an integer."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not (-90 <= south <= north <= 90 and -180 <= west <= 180 and -180 <= east <= 180):
+            return Response({"error": "bbox must be a valid bounding box."}, status=status.HTTP_400_BAD_REQUEST)
+        if not 0 <= zoom <= MAX_CLUSTER_ZOOM:
+            return Response(
+                {"error": f"zoom must be between 0 and {MAX_CLUSTER_ZOOM}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            tiles = tiles_within(south, west, north, east, zoom, MAX_CLUSTER_TILES)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(photo_clusters(tiles, zoom))
+
 
 class PhotoImageAPIView(GenericAPIView):
     authentication_classes = [APIKeyAuthentication]
     permission_classes = [HasAPIKey]
+    content_negotiation_class = ImageContentNegotiation
     queryset = Photo.objects.filter(_published=True)
     lookup_field = "uuid"
 
@@ -208,13 +501,117 @@ class PhotoImageAPIView(GenericAPIView):
         photo = self.get_object()  # GenericAPIView uses queryset + lookup_field
         photo_size = photo.get_size(size)
 
+        if photo_size is None:
+            # Sizes added since the photo was processed are generated on first request
+            missing_size = Size.objects.filter(slug=size, public=True).first()
+            if missing_size is None:
+                raise Http404("Requested size not found.")
+            try:
+                photo_size = request_photo_size(photo, missing_size)
+            except FileNotFoundError:
+                raise Http404("Requested size not found.")
+            if photo_size is None:
+                response = Response(
+                    {"error": "The requested size is being generated; try again shortly."},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                )
+                response["Retry-After"] = str(max(1, math.ceil(settings.PHOTO_SIZE_REQUEST_WAIT)))
+                return response
+
         if not photo_size or not hasattr(photo_size.image, "open") or not photo_size.size.public:
             raise Http404("Requested size not found.")
 
-        return FileResponse(photo_size.image.open("rb"), content_type="image/jpeg")
+        format = accepted_format(request, photo_size.formats)
+        variant = photo_size.variants.get(format)
+        md5 = variant["md5"] if variant else photo_size.md5
 
+        # The rendition's md5 identifies its exact bytes, so each format has its own ETag
+        etag = quote_etag(md5) if md5 else None
+        if etag and etag_matches(request, etag):
+            response = not_modified(etag)
+        else:
+            response = FileResponse(photo_size.get_file(format).open("rb"), content_type=CONTENT_TYPES[format])
+            if etag:
+                response["ETag"] = etag
+        patch_vary_headers(response, ["Accept"])
+        return response
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+
+class PhotoRenderURLAPIView(GenericAPIView):
+    authentication_classes = [APIKeyAuthentication]
+    permission_classes = [HasAPIKey]
+    queryset = Photo.objects.filter(_published=True)
+    serializer_class = RenderURLSerializer
+
+    @extend_schema(
+        parameters=[RenderRequestSerializer],
+        responses={200: RenderURLSerializer},
+        description="Get a signed URL rendering the photo at dimensions that aren't a configured size.",
+    )
+    def get(self, request, uuid, *args, **kwargs):
+        params = RenderRequestSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        if not self.get_queryset().filter(uuid=uuid).exists():
+            raise Http404("Photo not found.")
+
+        width, height, fit = (params.validated_data.get(name) for name in ("w", "h", "fit"))
+        query = {name: value for name, value in (("w", width), ("h", height)) if value is not None}
+        query.update(fit=fit, sig=render_signature(uuid, width, height, fit))
+        path = reverse("photo-render", kwargs={"uuid": uuid})
+        return Response({"url": request.build_absolute_uri(f"{path}?{urlencode(query)}")})
+
+
+class PhotoRenderAPIView(GenericAPIView):
+    # The signature stands in for the API key, so render URLs work in <img> tags
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    content_negotiation_class = ImageContentNegotiation
+    queryset = Photo.objects.filter(_published=True)
+    lookup_field = "uuid"
+
+    @extend_schema(
+        parameters=[
+            RenderRequestSerializer,
+            OpenApiParameter(
+                name='sig',
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                description='Signature from the render URL endpoint.',
+                required=True,
+            ),
+        ],
+        responses={(200, CONTENT_TYPES[format]): OpenApiTypes.BINARY for format in FORMAT_PREFERENCE},
+        auth=[],
+        description=(
+            "Render a photo to fit `w` x `h` from the nearest larger existing size. "
+            "Renders are cached on disk; photos are never upscaled. AVIF or WebP is "
+            "sent to clients that list it in `Accept`, JPEG otherwise."
+        ),
+    )
+    def get(self, request, uuid, *args, **kwargs):
+        params = RenderRequestSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        width, height, fit = (params.validated_data.get(name) for name in ("w", "h", "fit"))
+        if not valid_render_signature(request.query_params.get("sig", ""), uuid, width, height, fit):
+            return Response({"error": "Invalid signature."}, status=status.HTTP_403_FORBIDDEN)
+
+        photo = self.get_object()
+        source = render_source(photo, width, height, fit)
+        format = accepted_format(request, FORMAT_PREFERENCE)
+        key = render_key(photo, source, width, height, fit, format)
+        etag = quote_etag(key)
+        if etag_matches(request, etag):
+            response = not_modified(etag)
+        else:
+            file = cached_render(key, lambda: render_photo(photo, source, width, height, fit, format))
+            response = FileResponse(file, content_type=CONTENT_TYPES[format])
+            response["ETag"] = etag
+        patch_vary_headers(response, ["Accept"])
+        return response
+
+
+@extend_schema_view(list=extend_schema(parameters=[FIELDS_PARAM]))
+class TagViewSet(CachedResponseMixin, FastSummaryListMixin, viewsets.ReadOnlyModelViewSet):
     authentication_classes = [APIKeyAuthentication]
     permission_classes = [HasAPIKey]
     lookup_field = 'uuid'
@@ -226,7 +623,7 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
         return TagSerializer
 
     @extend_schema(
-        parameters=[INCLUDE_SIZES_PARAM],
+        parameters=[INCLUDE_SIZES_PARAM, FIELDS_PARAM, EXPAND_PARAM],
         responses={200: TagSerializer},
         description="Retrieve a tag and its associated photos."
     )
@@ -237,43 +634,50 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
         return super().retrieve(request, *args, **kwargs)
 
 
-class AlbumViewSet(viewsets.ReadOnlyModelViewSet):
+@extend_schema_view(list=extend_schema(parameters=[FIELDS_PARAM]))
+class AlbumViewSet(CachedResponseMixin, FastSummaryListMixin, viewsets.ReadOnlyModelViewSet):
     authentication_classes = [APIKeyAuthentication]
     permission_classes = [HasAPIKey]
     lookup_field = 'uuid'
     queryset = Album.objects.all()
+    filter_backends = [CustomAttributeFilterBackend]
 
     def get_serializer_class(self):
         if self.action == 'list':
             return AlbumSummarySerializer
+        if self.action == 'tree':
+            return AlbumTreeSerializer
         return AlbumSerializer
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action != 'list':
+            fields = AlbumSerializer.selected_fields(self.request)
+            if 'parent' in fields:
+                queryset = queryset.select_related('parent')
+            if 'children' in fields:
+                queryset = queryset.prefetch_related('children')
+        return queryset
+
+    def is_response_cacheable(self, request, response):
+        if not super().is_response_cacheable(request, response):
+            return False
+        # RANDOM order is reshuffled on every request unless seeded, so it can't be cached
+        if self.action == 'retrieve' and 'photos' in response.data and 'seed' not in request.query_params:
+            sort_method = (
+                request.query_params.get('sort_method')
+                or response.data.get('sort_method')
+                or self.get_object().sort_method
+            )
+            return sort_method.upper() != Album.AlbumSortMethod.RANDOM
+        return True
+
     @extend_schema(
         parameters=[
             INCLUDE_SIZES_PARAM,
-            OpenApiParameter(
-                name='recursive',
-                type=OpenApiTypes.BOOL,
-                location=OpenApiParameter.QUERY,
-                description='Include photos from all descendant albums recursively (true/false). When enabled, MANUAL sort method falls back to PUBLISHED.',
-                required=False,
-                enum=[True, False],
-            ),
-            OpenApiParameter(
-                name='sort_method',
-                type=OpenApiTypes.STR,
-                location=OpenApiParameter.QUERY,
-                description='Override album sort method. One of: CREATED, PUBLISHED, MANUAL, RANDOM. Defaults to the album\'s configured sort method.',
-                required=False,
-                enum=['CREATED', 'PUBLISHED', 'MANUAL', 'RANDOM'],
-            ),
-            OpenApiParameter(
-                name='sort_descending',
-                type=OpenApiTypes.BOOL,
-                location=OpenApiParameter.QUERY,
-                description='Override album sort direction. Defaults to the album\'s configured sort direction.',
-                required=False,
-            )
+            FIELDS_PARAM,
+            EXPAND_PARAM,
+            *ALBUM_ORDER_PARAMS,
         ],
         responses={200: AlbumSerializer},
         description="Retrieve an album including metadata, children, and photos."
@@ -284,6 +688,60 @@ class AlbumViewSet(viewsets.ReadOnlyModelViewSet):
         """
         return super().retrieve(request, *args, **kwargs)
 
+    @extend_schema(
+        responses={200: AlbumTreeSerializer(many=True)},
+        description="Every album as a nested tree of album summaries, siblings ordered by title.",
+    )
+    @action(detail=False, methods=['get'], filter_backends=[])
+    def tree(self, request, *args, **kwargs):
+        """
+        Get the whole album hierarchy.
+        """
+        return self.cached_response(self.album_tree, request)
+
+    def album_tree(self, request):
+        return Response(album_tree())
+
+    @extend_schema(
+        parameters=[INCLUDE_SIZES_PARAM, FIELDS_PARAM, EXPAND_PARAM, *ALBUM_ORDER_PARAMS],
+        responses={200: PhotoNeighborsSerializer},
+        description="The photos before and after a photo in the album's order, null at either end. RANDOM order requires a seed.",
+    )
+    @action(detail=True, methods=['get'], url_path=f'photos/(?P<photo_uuid>{UUID_PATTERN})/neighbors')
+    def neighbors(self, request, *args, **kwargs):
+        """
+        Get the previous and next photo in an album.
+        """
+        return self.cached_response(self.photo_neighbors, request, *args, **kwargs)
+
+    def photo_neighbors(self, request, *args, photo_uuid=None, **kwargs):
+        album = self.get_object()
+        options = album_order_options(request)
+        if (options["sort_method"] or album.sort_method) == Album.AlbumSortMethod.RANDOM and options["seed"] is None:
+            return Response(
+                {"seed": "A seed is required to find neighbors in RANDOM order."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        photo = Photo.objects.filter(uuid=photo_uuid, _published=True).only("pk").first()
+        if photo is None:
+            raise Http404("Photo not found.")
+        try:
+            neighbors = album.get_neighbors(photo, public_only=True, **options)
+        except Photo.DoesNotExist:
+            raise Http404("Photo not found in this album.")
+
+        found = [neighbor.pk for neighbor in neighbors if neighbor is not None]
+        photos = in_given_order(Photo.objects.all(), found)
+        summaries = fast_summaries(photos, PhotoSummarySerializer, request)
+        if summaries is None:
+            photos = plan_photo_queryset(photos, PhotoSummarySerializer, request, sizes=include_sizes_requested(request))
+            summaries = PhotoSummarySerializer(photos, many=True, context=self.get_serializer_context()).data
+
+        summaries = iter(summaries)
+        previous, following = [next(summaries) if neighbor is not None else None for neighbor in neighbors]
+        return Response({"previous": previous, "next": following})
+
 
 class SiteHealthAPIView(GenericAPIView):
     authentication_classes = [APIKeyAuthentication]
@@ -293,6 +751,10 @@ class SiteHealthAPIView(GenericAPIView):
     def get(self, request, *args, **kwargs):
         from core.models import Photo, PhotoSize
 
+        etag = response_etag(response_cache_key(request))
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
         total_photos = Photo.objects.count()
         total_sizes = Size.objects.count()
 
@@ -317,4 +779,341 @@ class SiteHealthAPIView(GenericAPIView):
         )
 
         serializer = SiteHealthSerializer(site_health)
-        return Response(serializer.data)
+        return Response(serializer.data, headers={"ETag": etag})
+
+
+class ChangeFeedAPIView(CachedResponseMixin, GenericAPIView):
+    authentication_classes = [APIKeyAuthentication]
+    permission_classes = [HasAPIKey]
+    serializer_class = ChangeFeedSerializer
+
+    DEFAULT_LIMIT = 500
+    MAX_LIMIT = 1000
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name='since',
+                type=OpenApiTypes.INT,
+                location=OpenApiParameter.QUERY,
+                description='Return changes after this cursor. Use 0 (default) for the full history.',
+                required=False,
+            ),
+            OpenApiParameter(
+                name='limit',
+                type=OpenApiTypes.INT,
+                location=OpenApiParameter.QUERY,
+                description=f'Maximum number of changes to return (default: {DEFAULT_LIMIT}, max: {MAX_LIMIT}).',
+                required=False,
+            ),
+        ],
+        responses={200: ChangeFeedSerializer},
+    )
+    def get(self, request, *args, **kwargs):
+        """
+        List created, updated and deleted photos, albums, tags and sizes in order.
+        Deletions, and photos or sizes leaving the public API, appear as `deleted` tombstones.
+        Changes are listed once they are a few seconds old, so none is missed by a cursor.
+        """
+        return self.cached_response(self.list_changes, request, *args, **kwargs)
+
+    def list_changes(self, request, *args, **kwargs):
+        try:
+            since = int(request.query_params.get('since', 0))
+            limit = int(request.query_params.get('limit', self.DEFAULT_LIMIT))
+        except (ValueError, TypeError):
+            return Response(
+                {"error": "since and limit must be integers."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if since < 0 or limit < 1:
+            return Response(
+                {"error": "since must be non-negative and limit must be positive."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        limit = min(limit, self.MAX_LIMIT)
+
+        settled = CatalogChange.settled_cursor()
+        changes = list(CatalogChange.objects.filter(id__gt=since, id__lte=settled)[:limit + 1])
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+        cursor = changes[-1].id if changes else since
+
+        serializer = ChangeFeedSerializer(ChangeFeed(changes=changes, cursor=cursor, has_more=has_more))
+        response = Response(serializer.data)
+        # Held back changes settle without a catalog version bump
+        response.changes_pending = CatalogChange.objects.filter(id__gt=max(since, settled)).exists()
+        return response
+
+    def is_response_cacheable(self, request, response):
+        return super().is_response_cacheable(request, response) and not getattr(response, "changes_pending", False)
+
+
+class SearchAPIView(CachedResponseMixin, GenericAPIView):
+    authentication_classes = [APIKeyAuthentication]
+    permission_classes = [HasAPIKey]
+    queryset = Photo.objects.filter(_published=True)
+    serializer_class = PhotoSummarySerializer
+
+    DEFAULT_LIMIT = 50
+    MAX_LIMIT = 200
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name='q',
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                description='Search text. Every word must match, as a prefix, the title, description, tags, albums, camera or lens.',
+                required=True,
+            ),
+            OpenApiParameter(
+                name='limit',
+                type=OpenApiTypes.INT,
+                location=OpenApiParameter.QUERY,
+                description=f'Maximum number of photos to return (default: {DEFAULT_LIMIT}, max: {MAX_LIMIT}).',
+                required=False,
+            ),
+            INCLUDE_SIZES_PARAM,
+            FIELDS_PARAM,
+            EXPAND_PARAM,
+        ],
+        responses={200: PhotoSummarySerializer(many=True)},
+    )
+    def get(self, request, *args, **kwargs):
+        """
+        Search public photos, best matches first.
+        Title matches rank above tag, album, camera and lens matches, which rank above description matches.
+        """
+        return self.cached_response(self.search, request, *args, **kwargs)
+
+    def search(self, request, *args, **kwargs):
+        text = request.query_params.get('q', '')
+        try:
+            limit = int(request.query_params.get('limit', self.DEFAULT_LIMIT))
+        except ValueError:
+            return Response({"error": "limit must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        if not search_terms(text):
+            return Response({"error": "q must contain at least one word."}, status=status.HTTP_400_BAD_REQUEST)
+        if limit < 1:
+            return Response({"error": "limit must be positive."}, status=status.HTTP_400_BAD_REQUEST)
+        limit = min(limit, self.MAX_LIMIT)
+
+        queryset = plan_photo_queryset(
+            self.get_queryset(),
+            PhotoSummarySerializer,
+            request,
+            sizes=include_sizes_requested(request),
+        )
+        photos = search_photos(queryset, text).order_by('-search_rank', '-publish_date')[:limit]
+        summaries = fast_summaries(photos, PhotoSummarySerializer, request)
+        if summaries is None:
+            summaries = self.get_serializer(photos, many=True).data
+        return Response(summaries)
+
+
+class FacetsAPIView(CachedResponseMixin, GenericAPIView):
+    authentication_classes = [APIKeyAuthentication]
+    permission_classes = [HasAPIKey]
+    queryset = Photo.objects.filter(_published=True)
+    serializer_class = FacetsSerializer
+    filterset_class = PhotoFilterAPI
+    filter_backends = [DjangoFilterBackend, CustomAttributeFilterBackend]
+
+    @extend_schema(filters=True, responses={200: FacetsSerializer})
+    def get(self, request, *args, **kwargs):
+        """
+        Count public photos per camera model, lens, tag, album and capture year.
+        Accepts the same filters as the photo list to count only matching photos.
+        """
+        # Filter combinations rarely repeat, so only the unfiltered counts are cached
+        if request.query_params:
+            return self.facets(request)
+        return self.cached_response(self.facets, request)
+
+    def facets(self, request):
+        return Response(photo_facets(self.filter_queryset(self.get_queryset())))
+
+
+class TimelineAPIView(CachedResponseMixin, GenericAPIView):
+    authentication_classes = [APIKeyAuthentication]
+    permission_classes = [HasAPIKey]
+    queryset = Photo.objects.filter(_published=True)
+    serializer_class = TimelineBucketSerializer
+
+    MAX_PHOTOS = 20
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name='field',
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                description='Date to bucket photos by (default: publish_date).',
+                enum=list(TIMELINE_FIELDS),
+                required=False,
+            ),
+            OpenApiParameter(
+                name='granularity',
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                description='Bucket size (default: month).',
+                enum=list(GRANULARITIES),
+                required=False,
+            ),
+            OpenApiParameter(
+                name='photos',
+                type=OpenApiTypes.INT,
+                location=OpenApiParameter.QUERY,
+                description=f'Include the uuids of up to this many of the earliest photos in each bucket (default: 0, max: {MAX_PHOTOS}).',
+                required=False,
+            ),
+        ],
+        responses={200: TimelineBucketSerializer(many=True)},
+    )
+    def get(self, request, *args, **kwargs):
+        """
+        Count public photos per year, month or day, oldest first. Photos without the date are left out.
+        """
+        return self.cached_response(self.timeline, request, *args, **kwargs)
+
+    def timeline(self, request, *args, **kwargs):
+        field = request.query_params.get('field', 'publish_date')
+        granularity = request.query_params.get('granularity', 'month')
+        if field not in TIMELINE_FIELDS or granularity not in GRANULARITIES:
+            return Response(
+                {"error": f"field must be one of {', '.join(TIMELINE_FIELDS)} and granularity one of {', '.join(GRANULARITIES)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            photos = int(request.query_params.get('photos', 0))
+        except ValueError:
+            return Response({"error": "photos must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        if not 0 <= photos <= self.MAX_PHOTOS:
+            return Response(
+                {"error": f"photos must be between 0 and {self.MAX_PHOTOS}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        buckets = timeline(self.get_queryset(), field, granularity, photos_per_bucket=photos)
+        for bucket in buckets:
+            if "photos" in bucket:
+                bucket["photos"] = [photo["uuid"] for photo in bucket["photos"]]
+        return Response(TimelineBucketSerializer(buckets, many=True).data)
+
+
+class SnapshotAPIView(GenericAPIView):
+    authentication_classes = [APIKeyAuthentication]
+    permission_classes = [HasAPIKey]
+
+    @extend_schema(
+        responses={200: OpenApiTypes.OBJECT},
+        description=(
+            "Stream the whole published catalog as one JSON document: `sizes`, `photos` (with public sizes, "
+            "metadata and location), `albums` (with ordered photo uuids) and `tags` (with photo uuids). "
+            "`cursor` is the change feed position the snapshot was taken at."
+        ),
+    )
+    def get(self, request, *args, **kwargs):
+        """
+        Get a snapshot of the whole published catalog.
+        """
+        version = get_catalog_version()
+        key = response_cache_key(request, version)
+        etag = response_etag(key)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+        response = cached_stream_response(request, key, stream_snapshot(version), "application/json")
+        response["ETag"] = etag
+        return response
+
+
+class RenditionManifestAPIView(GenericAPIView):
+    authentication_classes = [APIKeyAuthentication]
+    permission_classes = [HasAPIKey]
+
+    @extend_schema(
+        responses={200: OpenApiTypes.OBJECT},
+        description=(
+            "List every public rendition file as a compact `[photo uuid, size slug, md5, bytes, format]` row, "
+            "one per format the rendition is stored in. "
+            "`cursor` is the change feed position the manifest was taken at."
+        ),
+    )
+    def get(self, request, *args, **kwargs):
+        """
+        Get the manifest of all public renditions.
+        """
+        version = get_catalog_version()
+        key = response_cache_key(request, version)
+        etag = response_etag(key)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+        response = cached_stream_response(request, key, stream_manifest(), "application/json")
+        response["ETag"] = etag
+        return response
+
+
+class RenditionArchiveAPIView(GenericAPIView):
+    authentication_classes = [APIKeyAuthentication]
+    permission_classes = [HasAPIKey]
+    serializer_class = RenditionArchiveRequestSerializer
+
+    def tar_response(self, photo_sizes, cursor):
+        response = StreamingHttpResponse(stream_tar(photo_sizes), content_type="application/x-tar")
+        response["Content-Disposition"] = 'attachment; filename="renditions.tar"'
+        response["X-Catalog-Cursor"] = str(cursor)
+        return response
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name='since',
+                type=OpenApiTypes.INT,
+                location=OpenApiParameter.QUERY,
+                description='Change feed cursor. Only renditions of photos or sizes changed after it are included (default: 0, everything).',
+                required=False,
+            ),
+        ],
+        responses={(200, "application/x-tar"): OpenApiTypes.BINARY},
+        description=(
+            "Stream a tar archive of public renditions changed since a cursor, as `<photo uuid>/<size slug>.<ext>` "
+            "for each stored format. "
+            "The `X-Catalog-Cursor` header holds the cursor to pass next time."
+        ),
+    )
+    def get(self, request, *args, **kwargs):
+        """
+        Download renditions changed since a cursor.
+        """
+        try:
+            since = int(request.query_params.get('since', 0))
+        except (ValueError, TypeError):
+            return Response({"error": "since must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Read the cursor first so anything changing mid-stream is picked up next time
+        cursor = latest_change_cursor()
+        photo_sizes = renditions_changed_since(since).select_related('photo', 'size').iterator()
+        return self.tar_response(photo_sizes, cursor)
+
+    @extend_schema(
+        request=RenditionArchiveRequestSerializer,
+        responses={(200, "application/x-tar"): OpenApiTypes.BINARY},
+        description=(
+            "Stream a tar archive of the requested public renditions, as `<photo uuid>/<size slug>.<ext>` "
+            "for each stored format."
+        ),
+    )
+    def post(self, request, *args, **kwargs):
+        """
+        Download specific renditions.
+        """
+        serializer = RenditionArchiveRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        cursor = latest_change_cursor()
+        pairs = [(r["photo"], r["size"]) for r in serializer.validated_data["renditions"]]
+        return self.tar_response(requested_renditions(pairs), cursor)